@@ -0,0 +1,75 @@
+import os
+import importlib
+import streamlit as st
+import metrics
+
+# ---------- Lazy imports ----------
+# lazy_import("pandas") returns a stand-in that imports the module on first
+# attribute access, so a page only pays for a heavy library on the rerun that
+# actually uses it.
+
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+# ---------- Supabase client ----------
+# Created on first use, once per process: load_dotenv(), importing supabase and
+# create_client() no longer run when a module merely imports `supabase`.
+
+_client_override = None
+
+
+@st.cache_resource(show_spinner=False)
+def _create_client():
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv()
+    return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+
+
+_instrumented = (None, None)  # (client, its metrics wrapper)
+
+
+def get_supabase():
+    global _instrumented
+    client = _client_override if _client_override is not None else _create_client()
+    if not metrics.ENABLED:
+        return client
+    if _instrumented[0] is not client:
+        _instrumented = (client, metrics.InstrumentedClient(client))
+    return _instrumented[1]
+
+
+def set_supabase(client):
+    # Routes every query to `client` (e.g. tools/fake_supabase.FakeSupabase);
+    # None restores the real client
+    global _client_override
+    _client_override = client
+
+
+class _LazyClient:
+    def __getattr__(self, name):
+        return getattr(get_supabase(), name)
+
+
+supabase = _LazyClient()
@@ -0,0 +1,271 @@
+import os
+import re
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+import data_access
+
+# ---------- Bank statement import ----------
+# A statement CSV is parsed in chunks of CHUNKSIZE rows and reduced to
+# (row, date, description, amount) for the debits only. Rows are mapped to the
+# user's budget categories by keyword rules, checked against the remaining
+# budget of their month in one vectorized pass (same rule as
+# calculate_remaining in pages/expenses.py: allocated % of income minus what
+# is already spent), and written as multi-row inserts of BATCH_SIZE rows.
+# The database trigger (sql/006) keeps the rollup in step with each insert;
+# savings are recomputed once per month the statement touched, after the
+# last batch.
+
+CHUNKSIZE = 5000
+BATCH_SIZE = int(os.getenv("FINPILOT_IMPORT_BATCH", "200"))
+NOTE_LENGTH = 200
+
+DATE_COLUMNS = ["date", "transaction date", "txn date", "tran date", "value date", "posting date"]
+DESCRIPTION_COLUMNS = ["description", "narration", "details", "transaction details", "particulars", "remarks", "memo"]
+AMOUNT_COLUMNS = ["amount", "transaction amount", "amount inr"]
+DEBIT_COLUMNS = ["debit", "debit amount", "withdrawal", "withdrawal amt", "withdrawal amount", "dr"]
+
+# Keywords for common budget category names; a budget category's own name is
+# always one of its keywords as well
+CATEGORY_KEYWORDS = {
+    "food": ["swiggy", "zomato", "restaurant", "cafe", "coffee", "pizza", "dominos", "kfc", "mcdonald",
+             "grocery", "grocer", "bigbasket", "blinkit", "zepto", "dmart", "supermarket", "bakery"],
+    "rent": ["rent", "landlord", "house rent", "pg ", "maintenance"],
+    "transport": ["uber", "ola", "rapido", "metro", "irctc", "railway", "fuel", "petrol", "diesel", "fastag",
+                  "parking", "bus", "cab", "indigo", "airlines"],
+    "entertainment": ["netflix", "spotify", "prime video", "hotstar", "bookmyshow", "pvr", "inox", "movie",
+                      "youtube", "steam", "playstation"],
+    "utilities": ["electricity", "bescom", "tneb", "water", "gas", "lpg", "broadband", "wifi", "internet",
+                  "jio", "airtel", "vodafone", " vi ", "bsnl", "recharge", "dth"],
+    "shopping": ["amazon", "flipkart", "myntra", "ajio", "meesho", "nykaa", "mall", "store"],
+    "health": ["pharmacy", "apollo", "medplus", "hospital", "clinic", "doctor", "1mg", "pharmeasy", "lab"],
+    "education": ["school", "college", "tuition", "course", "udemy", "coursera", "books"],
+    "insurance": ["insurance", "premium", "lic"],
+}
+
+STATUSES = ["ok", "over_budget", "uncategorized", "invalid_date"]
+
+
+def _norm(name):
+    return re.sub(r"[^a-z]+", " ", str(name).lower()).strip()
+
+
+def detect_columns(columns):
+    # {"date": col, "description": col or None, "amount" or "debit": col}
+    by_norm = {_norm(c): c for c in columns}
+
+    def find(candidates):
+        return next((by_norm[c] for c in candidates if c in by_norm), None)
+
+    found = {"date": find(DATE_COLUMNS), "description": find(DESCRIPTION_COLUMNS)}
+    debit = find(DEBIT_COLUMNS)
+    if debit is not None:
+        found["debit"] = debit
+    else:
+        found["amount"] = find(AMOUNT_COLUMNS)
+    if found["date"] is None or (debit is None and found["amount"] is None):
+        raise ValueError(f"Could not find a date and an amount/debit column in: {', '.join(map(str, columns))}")
+    return found
+
+
+def _to_number(values):
+    # "₹1,234.50", "1234.50 Dr", "(12.00)" -> float; blanks -> NaN
+    text = values.fillna("").astype(str).str.strip()
+    negative = text.str.startswith("-") | text.str.startswith("(")
+    number = pd.to_numeric(text.str.replace(r"[^\d.]", "", regex=True), errors="coerce")
+    return number.where(~negative, -number)
+
+
+def iter_statement(source, chunksize=CHUNKSIZE, dayfirst=True):
+    # Yields one normalized frame per chunk: row (line number in the file),
+    # date, description, amount (> 0, debits only), month. With a single
+    # signed amount column, debits are the negative amounts if the first chunk
+    # has any, otherwise every row.
+    columns = None
+    sign = None
+    offset = 0
+    for chunk in pd.read_csv(source, chunksize=chunksize, dtype=str, skipinitialspace=True):
+        if columns is None:
+            columns = detect_columns(chunk.columns)
+        if "debit" in columns:
+            amount = _to_number(chunk[columns["debit"]]).abs()
+        else:
+            amount = _to_number(chunk[columns["amount"]])
+            if sign is None:
+                sign = -1 if (amount < 0).any() else 1
+            amount = amount * sign
+        frame = pd.DataFrame({
+            "row": np.arange(offset, offset + len(chunk)) + 2,  # header is line 1
+            "date": pd.to_datetime(chunk[columns["date"]], errors="coerce", dayfirst=dayfirst, format="mixed"),
+            "description": chunk[columns["description"]].fillna("").str.strip() if columns["description"] else "",
+            "amount": amount.round(2).to_numpy(),
+        })
+        offset += len(chunk)
+        frame = frame[frame["amount"] > 0]
+        frame["month"] = frame["date"].dt.strftime("%Y-%m")
+        yield frame
+
+
+def read_statement(source, chunksize=CHUNKSIZE, dayfirst=True):
+    frames = list(iter_statement(source, chunksize, dayfirst))
+    if not frames:
+        return pd.DataFrame(columns=["row", "date", "description", "amount", "month"])
+    return pd.concat(frames, ignore_index=True)
+
+
+# ---------- Categories ----------
+
+def parse_rules(text):
+    # "keyword = Category" per line -> [(keyword, Category)]
+    rules = []
+    for line in (text or "").splitlines():
+        if "=" in line:
+            keyword, category = (part.strip() for part in line.split("=", 1))
+            if keyword and category:
+                rules.append((keyword.lower(), category))
+    return rules
+
+
+def build_rules(categories, extra_rules=()):
+    # [(category, regex)] in matching order: user rules first, then each
+    # category's name and CATEGORY_KEYWORDS entry in budget order
+    rules = [(category, re.escape(keyword)) for keyword, category in extra_rules if category in categories]
+    for category in categories:
+        keywords = [category.lower()] + CATEGORY_KEYWORDS.get(_norm(category), [])
+        rules.append((category, "|".join(re.escape(k) for k in keywords)))
+    return rules
+
+
+def categorize(descriptions, rules, default=None):
+    # First matching rule wins; unmatched rows get `default` (None: uncategorized)
+    lower = descriptions.fillna("").str.lower()
+    result = pd.Series(default, index=descriptions.index, dtype=object)
+    unmatched = pd.Series(True, index=descriptions.index)
+    for category, pattern in rules:
+        hit = unmatched & lower.str.contains(pattern, regex=True)
+        result[hit] = category
+        unmatched &= ~hit
+    return result
+
+
+# ---------- Validation ----------
+
+def add_pending(totals, pending, month):
+    # Category totals for `month` plus the expenses still in the write queue,
+    # which the page counts against the budget before they are saved
+    totals = dict(totals)
+    for row in pending:
+        if row["created_at"][:7] == month:
+            totals[row["category"]] = totals.get(row["category"], 0.0) + row["amount"]
+    return totals
+
+
+def budget_limits(pairs, income, budget_for, totals_for):
+    # Remaining budget per (month, category) pair
+    rows = []
+    for month in sorted({m for m, _ in pairs}):
+        budget, totals = budget_for(month), totals_for(month)
+        for category in sorted(c for m, c in pairs if m == month):
+            allocated = budget.get(category, 0.0) / 100.0 * income if income > 0 else 0.0
+            rows.append({"month": month, "category": category, "allocated": allocated,
+                         "remaining": allocated - totals.get(category, 0.0)})
+    return pd.DataFrame(rows, columns=["month", "category", "allocated", "remaining"])
+
+
+def validate(frame, income, budget_for, totals_for):
+    # Adds status and remaining (budget left after this row, in date order)
+    frame = frame.copy()
+    frame["status"] = "ok"
+    frame.loc[frame["category"].isna(), "status"] = "uncategorized"
+    frame.loc[frame["date"].isna(), "status"] = "invalid_date"
+    frame["remaining"] = np.nan
+
+    ok = frame.loc[frame["status"] == "ok", ["row", "date", "month", "category", "amount"]].sort_values(["date", "row"])
+    if ok.empty:
+        return frame
+    pairs = set(zip(ok["month"], ok["category"]))
+    limits = budget_limits(pairs, income, budget_for, totals_for)
+    ok = ok.reset_index().merge(limits, on=["month", "category"], how="left").set_index("index")
+    spent = ok.groupby(["month", "category"], sort=False)["amount"].cumsum()
+    left = (ok["remaining"] - spent).round(2)
+    frame.loc[left.index, "remaining"] = left
+    frame.loc[left.index[left < 0], "status"] = "over_budget"
+    return frame
+
+
+def prepare(source, user_id, income, default_category=None, extra_rules=(), dayfirst=True,
+            pending=(), skip_rows=()):
+    # Parsed, categorized and validated statement rows for the preview.
+    # `pending`: queued expenses not saved yet (write_queue), counted like
+    # saved ones; `skip_rows`: statement lines already imported, left out.
+    budget = data_access.fetch_budget(user_id)
+    categories = [c for c in budget if c != "Savings"]
+    frame = read_statement(source, dayfirst=dayfirst)
+    frame = frame[~frame["row"].isin(skip_rows)].reset_index(drop=True)
+    frame["category"] = categorize(frame["description"], build_rules(categories, extra_rules), default_category)
+
+    def budget_for(month):
+        return data_access.fetch_budget(user_id, month) or budget
+
+    def totals_for(month):
+        return add_pending(data_access.fetch_category_totals(user_id, month), pending, month)
+    return validate(frame, income, budget_for, totals_for)
+
+
+# ---------- Writes ----------
+
+@dataclass
+class BatchFailure:
+    rows: list   # statement line numbers
+    error: str
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    failures: list = field(default_factory=list)   # BatchFailure
+    savings: dict = field(default_factory=dict)    # month -> recomputed savings
+
+    @property
+    def failed_rows(self):
+        return sum(len(f.rows) for f in self.failures)
+
+    def saved_lines(self, frame):
+        # Statement line numbers of `frame` (what was imported) that were saved
+        failed = {line for f in self.failures for line in f.rows}
+        return {line for line in frame["row"].tolist() if line not in failed}
+
+
+def to_records(frame):
+    return [
+        {"category": r.category, "amount": float(r.amount), "note": r.description[:NOTE_LENGTH],
+         "created_at": r.date.isoformat()}
+        for r in frame.itertuples(index=False)
+    ]
+
+
+def import_rows(user_id, frame, income, batch_size=BATCH_SIZE, progress=None):
+    # Inserts `frame` (rows from prepare()) in batches. A failed batch is
+    # recorded and the rest carry on; savings are recomputed once for each
+    # month that actually got rows.
+    result = ImportResult()
+    records = to_records(frame)
+    line_numbers = frame["row"].tolist()
+    months = set()
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        try:
+            inserted = data_access.insert_expenses(user_id, batch)
+        except Exception as e:
+            result.failures.append(BatchFailure(line_numbers[start:start + batch_size], str(e)))
+        else:
+            result.inserted += len(inserted)
+            months.update(r["created_at"][:7] for r in batch)
+        if progress:
+            progress(min(start + batch_size, len(records)) / len(records))
+
+    if result.inserted:
+        data_access.invalidate(user_id, "expenses")
+        for month in sorted(months):
+            result.savings[month] = data_access.update_monthly_savings(user_id, income, month=month)
+    return result
@@ -0,0 +1,82 @@
+import io
+import streamlit as st
+
+# ---------- Chart layer ----------
+# Figures are memoized on their input data: Streamlit hashes the arguments
+# (DataFrames by content), so a rerun with unchanged data reuses the figure
+# instead of rebuilding it. Plotly figures are cached as objects; matplotlib
+# charts are drawn on a standalone Figure (no pyplot state, nothing left open)
+# and cached as PNG bytes. Plotting libraries are imported on first use, so
+# only pages that actually draw a chart pay for them.
+
+MAX_ENTRIES = 256
+PNG_DPI = 200
+
+
+# ---- Plotly ----
+
+@st.cache_resource(max_entries=MAX_ENTRIES, show_spinner=False)
+def px_figure(kind, data, **kwargs):
+    import plotly.express as px
+    return getattr(px, kind)(data, **kwargs)
+
+
+@st.cache_resource(max_entries=MAX_ENTRIES, show_spinner=False)
+def go_figure(traces, **layout):
+    # traces: ((trace type, {trace kwargs}), ...)
+    import plotly.graph_objs as go
+    fig = go.Figure(data=[getattr(go, kind)(**trace) for kind, trace in traces])
+    if layout:
+        fig.update_layout(**layout)
+    return fig
+
+
+def px_chart(kind, data, **kwargs):
+    st.plotly_chart(px_figure(kind, data, **kwargs), use_container_width=True)
+
+
+def go_chart(traces, **layout):
+    st.plotly_chart(go_figure(traces, **layout), use_container_width=True)
+
+
+# ---- Matplotlib ----
+
+def _draw(kind, x, y, style, labels):
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+    getattr(ax, kind)(x, y, **style)
+    ax.set_xlabel(labels.get("xlabel", ""))
+    ax.set_ylabel(labels.get("ylabel", ""))
+    ax.set_title(labels.get("title", ""))
+    if labels.get("grid"):
+        ax.grid(True)
+    if labels.get("xticks") is not None:
+        ax.set_xticks(labels["xticks"])
+    if kind == "scatter" and labels.get("identity_line"):
+        lo, hi = min(x), max(x)
+        ax.plot([lo, hi], [lo, hi], "r--")
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=PNG_DPI, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+@st.cache_data(max_entries=MAX_ENTRIES, show_spinner=False)
+def mpl_png(kind, x, y, style=None, **labels):
+    # kind: an Axes method ("plot", "bar", "scatter"); style: its kwargs;
+    # labels: xlabel, ylabel, title, grid, xticks, identity_line
+    return _draw(kind, x, y, style or {}, labels)
+
+
+def mpl_chart(kind, x, y, style=None, **labels):
+    st.image(mpl_png(kind, x, y, style, **labels), use_container_width=True)
+
+
+# ---- Lazy sections ----
+
+def visible_section(labels, key):
+    # Tab strip where only the selected section runs. st.tabs executes every
+    # tab's body on each rerun and only hides them in the browser; here the
+    # page renders just the returned label's content.
+    return st.radio("Section", labels, key=key, horizontal=True, label_visibility="collapsed")
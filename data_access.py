@@ -0,0 +1,433 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from dateutil.relativedelta import relativedelta
+from cachetools import TTLCache
+import metrics
+from bootstrap import lazy_import
+from supabase_client import supabase
+
+# Only looked up when an exception is being handled, by which point the
+# client (and postgrest with it) has been imported
+postgrest_exceptions = lazy_import("postgrest.exceptions")
+
+# ---------- Read cache ----------
+# Every Streamlit rerun used to hit Supabase for the same rows. Results are kept
+# per (table, user_id, args) for a short TTL; the least recently used entries are
+# evicted once MAXSIZE is reached, and writes drop the user's entries for the
+# tables they touch.
+
+CACHE_TTL = float(os.getenv("FINPILOT_CACHE_TTL", "60"))
+CACHE_MAXSIZE = int(os.getenv("FINPILOT_CACHE_MAXSIZE", "1024"))
+
+_cache = TTLCache(maxsize=CACHE_MAXSIZE, ttl=CACHE_TTL)
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+_versions = {}  # (user_id, table or None for all) -> number of invalidations
+
+
+def _version(user_id, table):
+    # Callers hold _cache_lock
+    return _versions.get((user_id, table), 0) + _versions.get((user_id, None), 0)
+
+
+def _cached(table, user_id, *args, loader):
+    key = (table, user_id) + args
+    with _cache_lock:
+        if key in _cache:
+            _stats["hits"] += 1
+            return _cache[key]
+        _stats["misses"] += 1
+        version = _version(user_id, table)
+    value = loader()
+    with _cache_lock:
+        # Not stored if the table was written while loading: the value may
+        # predate the write, and the next read loads it again
+        if _version(user_id, table) == version:
+            _cache[key] = value
+    return value
+
+
+def invalidate(user_id, *tables):
+    with _cache_lock:
+        stale = [k for k in list(_cache.keys()) if k[1] == user_id and (not tables or k[0] in tables)]
+        for key in stale:
+            _cache.pop(key, None)
+        _stats["invalidations"] += len(stale)
+        for table in tables or (None,):
+            _versions[(user_id, table)] = _versions.get((user_id, table), 0) + 1
+
+
+def data_version(user_id, table):
+    # Changes whenever the user's rows in `table` are written, so state kept
+    # outside this cache (e.g. loaded history pages in a session) can tell it is stale
+    with _cache_lock:
+        return _version(user_id, table)
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def cache_stats():
+    with _cache_lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_rate": _stats["hits"] / lookups if lookups else 0.0,
+            "size": len(_cache),
+            "maxsize": _cache.maxsize,
+            "ttl": _cache.ttl,
+        }
+
+
+# ---------- Helpers ----------
+
+def get_current_month():
+    return datetime.now().strftime("%Y-%m")
+
+
+def get_month_range(month=None):
+    # [first day of month, first day of next month) so the whole last day is included
+    start = datetime.strptime(month or get_current_month(), "%Y-%m")
+    end = start + relativedelta(months=1)
+    return start.isoformat(), end.isoformat()
+
+
+# ---------- Reads ----------
+
+def fetch_income_record(user_id):
+    def load():
+        resp = supabase.table("user_incomes").select("*").eq("user_id", user_id).limit(1).execute()
+        return resp.data[0] if resp.data else None
+    return _cached("user_incomes", user_id, loader=load)
+
+
+def fetch_income(user_id):
+    record = fetch_income_record(user_id)
+    return float(record["amount"]) if record else 0.0
+
+
+def fetch_budget_record(user_id, month=None):
+    # With no month, the latest saved budget is returned
+    def load():
+        query = supabase.table("user_budgets").select("*").eq("user_id", user_id)
+        if month:
+            query = query.eq("month", month)
+        resp = query.order("month", desc=True).limit(1).execute()
+        return resp.data[0] if resp.data else None
+    return _cached("user_budgets", user_id, month, loader=load)
+
+
+def fetch_budget(user_id, month=None):
+    record = fetch_budget_record(user_id, month)
+    if not record:
+        return {}
+    try:
+        return json.loads(record["budget_json"])
+    except (TypeError, ValueError):
+        return {}
+
+
+def fetch_expenses(user_id, month=None, month_only=True):
+    month = (month or get_current_month()) if month_only else None
+
+    def load():
+        query = supabase.table("expenses").select("id, category, amount, note, created_at").eq("user_id", user_id)
+        if month:
+            start, end = get_month_range(month)
+            query = query.gte("created_at", start).lt("created_at", end)
+        resp = query.order("created_at", desc=True).execute()
+        return resp.data if resp.data else []
+    return _cached("expenses", user_id, month, loader=load)
+
+
+HISTORY_PAGE_SIZE = int(os.getenv("FINPILOT_HISTORY_PAGE_SIZE", "50"))
+HISTORY_COLUMNS = "id, category, amount, note, created_at"
+
+
+def fetch_expense_page(user_id, after=None, limit=HISTORY_PAGE_SIZE):
+    # One page of the whole history, newest first by (created_at, id). `after`
+    # is the (created_at, id) of the last row of the previous page, so each
+    # page is an index range scan (sql/004) however far back it is, unlike an
+    # offset. -> (rows, cursor for the next page or None on the last page)
+    query = supabase.table("expenses").select(HISTORY_COLUMNS).eq("user_id", user_id)
+    if after:
+        created_at, expense_id = after
+        query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{expense_id})')
+    resp = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1).execute()
+    rows = resp.data or []
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, (rows[-1]["created_at"], rows[-1]["id"])
+
+
+def fetch_recent_expenses(user_id, limit=5, month=None):
+    month = month or get_current_month()
+
+    def load():
+        start, end = get_month_range(month)
+        resp = supabase.table("expenses") \
+            .select("category, amount, note, created_at") \
+            .eq("user_id", user_id) \
+            .gte("created_at", start) \
+            .lt("created_at", end) \
+            .order("created_at", desc=True) \
+            .limit(limit) \
+            .execute()
+        return resp.data if resp.data else []
+    return _cached("expenses", user_id, "recent", month, limit, loader=load)
+
+
+# Flipped to False once the database reports the rollup table or the RPC as
+# missing, so later calls go straight to the next source instead of failing first.
+_rollup_available = True
+_category_rpc_available = True
+
+MISSING_TABLE_CODES = ("PGRST205", "42P01")
+MISSING_FUNCTION_CODE = "PGRST202"
+
+
+def _aggregate_category_rows(rows):
+    summary = {}
+    for row in rows:
+        entry = summary.setdefault(row["category"], {"category": row["category"], "total": 0.0, "count": 0})
+        entry["total"] += float(row["amount"])
+        entry["count"] += 1
+    return list(summary.values())
+
+
+def _summary_rows(rows):
+    return [
+        {"category": r["category"], "total": float(r["total"]), "count": int(r["count"])}
+        for r in rows
+    ]
+
+
+def fetch_category_summary(user_id, month=None):
+    # [{"category", "total", "count"}, ...] for the month. Sources, cheapest first:
+    # the incrementally maintained rollup table, the aggregate RPC, then a
+    # category/amount projection summed here.
+    month = month or get_current_month()
+
+    def load():
+        global _rollup_available, _category_rpc_available
+        if _rollup_available:
+            try:
+                resp = supabase.table("expense_monthly_rollup") \
+                    .select("category, total, count") \
+                    .eq("user_id", user_id) \
+                    .eq("month", month) \
+                    .execute()
+                return _summary_rows(r for r in (resp.data or []) if r["count"] > 0)
+            except postgrest_exceptions.APIError as e:
+                if e.code in MISSING_TABLE_CODES:
+                    _rollup_available = False
+
+        if _category_rpc_available:
+            try:
+                resp = supabase.rpc("expense_category_totals", {"p_user_id": user_id, "p_month": month}).execute()
+                return _summary_rows(resp.data or [])
+            except postgrest_exceptions.APIError as e:
+                if e.code == MISSING_FUNCTION_CODE:
+                    _category_rpc_available = False
+
+        start, end = get_month_range(month)
+        resp = supabase.table("expenses") \
+            .select("category, amount") \
+            .eq("user_id", user_id) \
+            .gte("created_at", start) \
+            .lt("created_at", end) \
+            .execute()
+        return _aggregate_category_rows(resp.data or [])
+    return _cached("expenses", user_id, "totals", month, loader=load)
+
+
+def fetch_category_totals(user_id, month=None):
+    return {row["category"]: row["total"] for row in fetch_category_summary(user_id, month)}
+
+
+def fetch_savings(user_id, month=None):
+    month = month or get_current_month()
+
+    def load():
+        resp = supabase.table("monthly_savings").select("amount").eq("user_id", user_id).eq("month", month).limit(1).execute()
+        return resp.data[0]["amount"] if resp.data else 0.0
+    return _cached("monthly_savings", user_id, month, loader=load)
+
+
+def fetch_savings_history(user_id):
+    def load():
+        resp = supabase.table("monthly_savings").select("month, amount").eq("user_id", user_id).order("month", desc=False).execute()
+        return resp.data if resp.data else []
+    return _cached("monthly_savings", user_id, "history", loader=load)
+
+
+
+def fetch_total_savings(user_id):
+    return sum(float(r["amount"]) for r in fetch_savings_history(user_id))
+
+
+def fetch_year_savings(user_id, year):
+    # monthly_savings.month is "YYYY-MM", so the year filter runs in the database
+    def load():
+        resp = supabase.table("monthly_savings") \
+            .select("amount") \
+            .eq("user_id", user_id) \
+            .gte("month", f"{year}-01") \
+            .lte("month", f"{year}-12") \
+            .execute()
+        return sum(float(r["amount"]) for r in (resp.data or []))
+    return _cached("monthly_savings", user_id, "year", year, loader=load)
+
+
+def fetch_profile(user_id):
+    def load():
+        resp = supabase.table("user_profile").select("*").eq("user_id", user_id).limit(1).execute()
+        return resp.data[0] if resp.data else None
+    return _cached("user_profile", user_id, loader=load)
+
+
+# ---------- Concurrent page fetch ----------
+# The reads a page needs are independent, so they are issued together and the
+# page waits for the slowest one instead of the sum of all of them. Each call
+# gets its own threads, one per query: a shared pool would make concurrent
+# sessions queue behind each other, and a query that times out would keep
+# holding one of its workers.
+
+FETCH_TIMEOUT = float(os.getenv("FINPILOT_FETCH_TIMEOUT", "10"))
+
+PAGE_QUERIES = {
+    "income": lambda user_id, month: fetch_income(user_id),
+    "budget": lambda user_id, month: fetch_budget(user_id, month),
+    "latest_budget": lambda user_id, month: fetch_budget(user_id),
+    "category_totals": lambda user_id, month: fetch_category_totals(user_id, month),
+    "recent_expenses": lambda user_id, month: fetch_recent_expenses(user_id, 5, month),
+    "savings": lambda user_id, month: fetch_savings(user_id, month),
+    "savings_history": lambda user_id, month: fetch_savings_history(user_id),
+    "profile": lambda user_id, month: fetch_profile(user_id),
+}
+
+
+@dataclass
+class PageData:
+    month: str
+    income: float = 0.0
+    budget: dict = field(default_factory=dict)
+    latest_budget: dict = field(default_factory=dict)
+    category_totals: dict = field(default_factory=dict)
+    recent_expenses: list = field(default_factory=list)
+    savings: float = 0.0
+    savings_history: list = field(default_factory=list)
+    profile: dict = None
+    timings: dict = field(default_factory=dict)  # query name -> seconds from submit to result
+    errors: dict = field(default_factory=dict)   # query name -> exception, or TimeoutError if unfinished
+    wall_time: float = 0.0
+
+
+def fetch_page_data(user_id, queries, month=None, timeout=None):
+    # Runs the named PAGE_QUERIES in parallel. Fields for queries that fail or do
+    # not finish within `timeout` keep their defaults and are listed in `errors`.
+    month = month or get_current_month()
+    data = PageData(month=month)
+    timeout = FETCH_TIMEOUT if timeout is None else timeout
+    page = metrics.current_page()
+
+    def run(name):
+        # -> (value, error, finish time); never touches `data`, which may have
+        # been returned already if this query timed out
+        try:
+            with metrics.page_label(page):
+                return PAGE_QUERIES[name](user_id, month), None, time.perf_counter()
+        except Exception as e:
+            return None, e, time.perf_counter()
+
+    pool = ThreadPoolExecutor(max_workers=max(len(queries), 1), thread_name_prefix="finpilot-fetch")
+    started = time.perf_counter()
+    futures = {pool.submit(run, name): name for name in queries}
+    done, pending = wait(futures, timeout=timeout)
+    pool.shutdown(wait=False)  # timed-out queries finish (or fail) on their own threads
+    for future in done:
+        name = futures[future]
+        value, error, finished = future.result()
+        data.timings[name] = finished - started
+        if error is None:
+            setattr(data, name, value)
+        else:
+            data.errors[name] = error
+    for future in pending:
+        name = futures[future]
+        data.errors[name] = TimeoutError(f"{name} did not finish within {timeout}s")
+        data.timings[name] = time.perf_counter() - started
+    data.wall_time = time.perf_counter() - started
+    return data
+
+# ---------- Writes ----------
+
+def upsert_expenses(user_id, rows):
+    # Multi-row insert keyed on client_id (sql/005): rows whose client_id is
+    # already stored are skipped, so resending a batch whose response was lost
+    # saves nothing twice. -> only the rows actually inserted
+    resp = supabase.table("expenses") \
+        .upsert([{**row, "user_id": user_id} for row in rows], on_conflict="client_id", ignore_duplicates=True) \
+        .execute()
+    invalidate(user_id, "expenses")
+    return resp.data or []
+
+
+def insert_expenses(user_id, rows):
+    # One multi-row insert for bulk imports. The rollup is bumped by the insert
+    # trigger (sql/006).
+    resp = supabase.table("expenses").insert([{**row, "user_id": user_id} for row in rows]).execute()
+    invalidate(user_id, "expenses")
+    return resp.data or []
+
+
+def upsert_income(user_id, amount):
+    supabase.table("user_incomes") \
+        .upsert({"user_id": user_id, "amount": amount}, on_conflict="user_id") \
+        .execute()
+    invalidate(user_id, "user_incomes")
+
+
+def upsert_budget(user_id, budget, month=None):
+    supabase.table("user_budgets").upsert(
+        {
+            "user_id": user_id,
+            "budget_json": json.dumps(budget),
+            "month": month or get_current_month()
+        },
+        on_conflict="user_id,month"
+    ).execute()
+    invalidate(user_id, "user_budgets")
+
+
+def update_monthly_savings(user_id, income=None, expenses=None, month=None):
+    # Only called after an expense, income or budget write. Callers pass the
+    # income and the month's expenses they already hold to avoid refetching.
+    # `month` defaults to the current one.
+    month = month or get_current_month()
+    if income is None:
+        income = fetch_income(user_id)
+    if income == 0:
+        return None
+    if expenses is None:
+        total_spent = sum(fetch_category_totals(user_id, month).values())
+    else:
+        total_spent = sum(e["amount"] for e in expenses)
+
+    entry = {
+        "user_id": user_id,
+        "month": month,
+        "amount": round(income - total_spent, 2),
+        "recorded_on": datetime.now().date().isoformat()
+    }
+    supabase.table("monthly_savings").upsert(entry, on_conflict="user_id,month").execute()
+    invalidate(user_id, "monthly_savings")
+    return entry["amount"]
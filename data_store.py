@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import tempfile
+import argparse
+import threading
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+
+# ---------- Columnar cache for data/external CSVs ----------
+# Each CSV is converted once into an uncompressed Arrow IPC file under
+# data/cache/arrow/. Readers memory-map it, so selecting a handful of columns
+# reads only those columns' pages and the numeric ones reach pandas without a
+# copy. The cache is keyed by the CSV's sha256; a changed mtime or size
+# triggers a re-hash, and only a changed hash triggers a re-conversion.
+#
+# Dtypes are fixed at conversion: "True"/"False" one-hot columns become bool,
+# float64 columns become float32 when every value round-trips within
+# FLOAT32_RTOL, int64 columns that fit become int32, and low-cardinality
+# strings are dictionary encoded (pandas category).
+#
+#   python data_store.py convert data/external/processed/test_data.csv
+#   python data_store.py bench data/external/processed/test_data.csv --columns Income Disposable_Income
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(ROOT, "data", "cache", "arrow")
+FLOAT32_RTOL = 1e-6
+DICTIONARY_MAX_RATIO = 0.5  # encode strings when unique values <= half the rows
+
+_lock = threading.Lock()
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_stem(csv_path):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(CACHE_DIR, f"{name}-{hashlib.sha1(os.path.abspath(csv_path).encode()).hexdigest()[:10]}")
+
+
+def _read_meta(stem):
+    try:
+        with open(f"{stem}.json") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _replace_with(path, write):
+    # write(tmp) fills a temp file unique to this writer, in path's directory,
+    # which then replaces path; processes converting the same CSV at once
+    # never write into each other's temp file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _write_meta(stem, meta):
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=2)
+    _replace_with(f"{stem}.json", write)
+
+
+# ---------- Conversion ----------
+
+def _narrow(column):
+    if pa.types.is_float64(column.type):
+        values = column.to_numpy(zero_copy_only=False)
+        narrowed = values.astype(np.float32)
+        finite = np.isfinite(values)
+        if np.allclose(narrowed[finite], values[finite], rtol=FLOAT32_RTOL, atol=0):
+            return column.cast(pa.float32())
+    elif pa.types.is_int64(column.type):
+        info = np.iinfo(np.int32)
+        lo, hi = pc.min(column).as_py(), pc.max(column).as_py()
+        if lo is None or (info.min <= lo and hi <= info.max):
+            return column.cast(pa.int32())
+    elif pa.types.is_string(column.type) and len(column):
+        if pc.count_distinct(column).as_py() <= DICTIONARY_MAX_RATIO * len(column):
+            return pc.dictionary_encode(column)
+    return column
+
+
+def convert(csv_path, arrow_path):
+    # pyarrow's multithreaded CSV reader already parses True/False as bool
+    table = pa_csv.read_csv(csv_path)
+    table = pa.table({name: _narrow(table.column(name)) for name in table.column_names})
+
+    def write(tmp):
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    _replace_with(arrow_path, write)
+    return table.schema
+
+
+def ensure_cached(csv_path):
+    # Returns the Arrow file for csv_path, converting it if the CSV changed
+    stat = os.stat(csv_path)
+    stem = _cache_stem(csv_path)
+    meta = _read_meta(stem)
+    if meta and meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size \
+            and os.path.exists(meta["arrow_path"]):
+        return meta["arrow_path"]
+
+    with _lock:
+        meta = _read_meta(stem)
+        sha256 = file_sha256(csv_path)
+        if meta and meta["sha256"] == sha256 and os.path.exists(meta["arrow_path"]):
+            # Touched but unchanged: refresh the stat signature only
+            meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+            _write_meta(stem, meta)
+            return meta["arrow_path"]
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Content-addressed file name, so a reader that still has the old file
+        # mapped (which blocks replacing it on Windows) is never overwritten
+        arrow_path = f"{stem}-{sha256[:12]}.arrow"
+        started = time.perf_counter()
+        schema = convert(csv_path, arrow_path)
+        previous = meta["arrow_path"] if meta else None
+        _write_meta(stem, {
+            "csv_path": os.path.abspath(csv_path),
+            "arrow_path": arrow_path,
+            "sha256": sha256,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "schema": {field.name: str(field.type) for field in schema},
+            "converted_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "convert_seconds": round(time.perf_counter() - started, 3),
+        })
+        if previous and previous != arrow_path:
+            try:
+                os.remove(previous)
+            except OSError:
+                pass  # still mapped by another reader; left for the next conversion
+        return arrow_path
+
+
+# ---------- Reading ----------
+
+def read_table(csv_path, columns=None):
+    # Memory-mapped Arrow table; only the requested columns are touched.
+    # Raises KeyError if a requested column does not exist.
+    source = pa.memory_map(ensure_cached(csv_path), "r")
+    table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        missing = [c for c in columns if c not in table.column_names]
+        if missing:
+            raise KeyError(f"{os.path.basename(csv_path)} has no column(s) {missing}")
+        table = table.select(list(columns))
+    return table
+
+
+def read_frame(csv_path, columns=None):
+    # pandas view of read_table(); numeric columns without nulls share the
+    # mapped buffers instead of being copied (the arrays are read-only)
+    return read_table(csv_path, columns).to_pandas(split_blocks=True, self_destruct=True)
+
+
+# ---------- Benchmark ----------
+
+def benchmark(csv_path, columns=None, repeat=5):
+    import pandas as pd
+
+    def measure(fn):
+        times = []
+        for _ in range(repeat):
+            pool_before = pa.total_allocated_bytes()
+            start = time.perf_counter()
+            df = fn()
+            times.append(time.perf_counter() - start)
+            # Heap bytes the frame owns: pandas-owned blocks plus Arrow pool
+            # allocations; memory-mapped columns count as zero
+            owned = sum(
+                b.values.nbytes for b in df._mgr.blocks if getattr(b.values, "base", None) is None
+            ) + pa.total_allocated_bytes() - pool_before
+            del df
+        return float(np.median(times)) * 1e3, owned / 1024 / 1024
+
+    ensure_cached(csv_path)  # conversion is a one-off, not part of the read
+    csv_ms, csv_mb = measure(lambda: pd.read_csv(csv_path, usecols=columns))
+    arrow_ms, arrow_mb = measure(lambda: read_frame(csv_path, columns))
+    return {"csv_ms": csv_ms, "csv_mb": csv_mb, "arrow_ms": arrow_ms, "arrow_mb": arrow_mb}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar cache for CSV data files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="convert (or refresh) the cache for CSV files")
+    conv.add_argument("paths", nargs="+")
+    bench = sub.add_parser("bench", help="compare pd.read_csv with the cached read")
+    bench.add_argument("paths", nargs="+")
+    bench.add_argument("--columns", nargs="*")
+    bench.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        if args.command == "convert":
+            arrow_path = ensure_cached(path)
+            meta = _read_meta(_cache_stem(path))
+            print(f"{path} -> {arrow_path} ({os.path.getsize(arrow_path):,} bytes)")
+            for name, dtype in meta["schema"].items():
+                print(f"  {name}: {dtype}")
+        else:
+            r = benchmark(path, args.columns, args.repeat)
+            label = f"{len(args.columns)} columns" if args.columns else "all columns"
+            print(f"{path} ({label})")
+            print(f"  pd.read_csv: {r['csv_ms']:8.2f} ms  {r['csv_mb']:8.2f} MB")
+            print(f"  arrow cache: {r['arrow_ms']:8.2f} ms  {r['arrow_mb']:8.2f} MB "
+                  f"({r['csv_ms'] / r['arrow_ms']:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
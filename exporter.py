@@ -0,0 +1,113 @@
+import io
+import os
+import time
+import uuid
+import tempfile
+import numpy as np
+import pandas as pd
+
+# ---------- Chunked exports ----------
+# Exports are produced as a stream of byte chunks, each covering at most
+# CHUNKSIZE rows, so memory stays bounded by the chunk and not the export.
+# The same stream can be written to disk (atomically: temp file + rename) or
+# handed to anything that consumes bytes incrementally.
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+EXPORT_DIR = os.path.join(ROOT, "data", "exports")
+CHUNKSIZE = 50_000
+
+MIME_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+def iter_frames(columns, chunksize=CHUNKSIZE):
+    # columns: {name: 1-D array}, all the same length. Each frame is built
+    # from slices of the arrays, so only one chunk is materialised at a time.
+    n = len(next(iter(columns.values()))) if columns else 0
+    for start in range(0, n, chunksize):
+        yield pd.DataFrame({name: np.asarray(values[start:start + chunksize]) for name, values in columns.items()})
+
+
+def csv_chunks(frames):
+    header = True
+    for frame in frames:
+        yield frame.to_csv(index=False, header=header).encode()
+        header = False
+
+
+class _Drain(io.RawIOBase):
+    # Write-only sink whose contents are taken after every row group
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def parquet_chunks(frames):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _Drain()
+    writer = None
+    for frame in frames:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table)
+        yield sink.take()
+    if writer is not None:
+        writer.close()  # footer
+        yield sink.take()
+
+
+FORMATS = {"csv": csv_chunks, "parquet": parquet_chunks}
+
+
+def stream_export(columns, fmt="csv", chunksize=CHUNKSIZE):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'")
+    return FORMATS[fmt](iter_frames(columns, chunksize))
+
+
+def write_atomic(path, chunks):
+    # Readers see either the previous file or the complete new one
+    # A unique temp file in the same directory, so concurrent exports (other
+    # sessions, threads or processes) never write into each other's file
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return size
+
+
+def unique_name(stem, fmt):
+    # e.g. predicted_savings_filtered-20250101-120000-1a2b3c4d.csv, one per export
+    return f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.{fmt}"
+
+
+def export_columns(columns, file_name, fmt="csv", chunksize=CHUNKSIZE, export_dir=EXPORT_DIR):
+    # Writes the export to export_dir/file_name and returns (path, bytes written)
+    path = os.path.join(export_dir, file_name)
+    return path, write_atomic(path, stream_export(columns, fmt, chunksize))
+
+
+def mime_type(path):
+    return MIME_TYPES.get(os.path.splitext(path)[1].lstrip(".").lower(), "application/octet-stream")
@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from datetime import datetime
+import numpy as np
+
+# Deterministic retirement projection for the suggestions page. Replaces the
+# numbers the LLM used to invent: the age-by-age savings curve, the threat
+# level and the five-year savings targets are plain compound-interest
+# arithmetic over the profile and monthly_savings history.
+
+DEFAULT_RETURN_RATE = 0.08       # nominal annual return on savings
+DEFAULT_INFLATION = 0.06         # annual inflation, also used for contribution growth
+DEFAULT_RETIREMENT_AGE = 60
+DEFAULT_LIFE_EXPECTANCY = 85
+HISTORY_MONTHS = 12              # months of monthly_savings used for the contribution rate
+
+THREAT_LEVELS = ((1.0, "Low"), (0.6, "Moderate"))  # funded ratio thresholds, else "High"
+
+
+@dataclass
+class RetirementForecast:
+    ages: np.ndarray
+    balances: np.ndarray
+    target: float
+    funded_ratio: float
+    threat_level: str
+    annual_contribution: float
+    required_contribution: float
+    five_year_goal_plan: list
+
+    @property
+    def retirement_forecast(self):
+        # Same shape the LLM used to return: [[age, amount], ...]
+        return [[int(a), round(float(b), 2)] for a, b in zip(self.ages, self.balances)]
+
+
+def annual_contribution(savings_history, months=HISTORY_MONTHS):
+    # Average of the latest `months` monthly_savings rows, annualised
+    amounts = np.array([float(r["amount"]) for r in savings_history[-months:]], dtype=float)
+    return float(amounts.mean() * 12) if amounts.size else 0.0
+
+
+def project_balances(current_savings, contribution, years, return_rate, contribution_growth):
+    # balance[t] = P(1+r)^t + sum_{k<t} C(1+g)^k (1+r)^(t-1-k), for t = 0..years,
+    # computed with one cumulative sum instead of a year-by-year loop
+    t = np.arange(years + 1, dtype=float)
+    growth = (1 + return_rate) ** t
+    k = t[:-1]
+    discounted = contribution * (1 + contribution_growth) ** k / (1 + return_rate) ** (k + 1)
+    return growth * (current_savings + np.concatenate(([0.0], np.cumsum(discounted))))
+
+
+def retirement_target(annual_spending, years_to_retirement, retirement_years, return_rate, inflation):
+    # Corpus that funds today's spending, inflated to retirement, for
+    # `retirement_years` at the real rate of return
+    spending_at_retirement = annual_spending * (1 + inflation) ** years_to_retirement
+    real_rate = (1 + return_rate) / (1 + inflation) - 1
+    if abs(real_rate) < 1e-9:
+        return spending_at_retirement * retirement_years
+    return spending_at_retirement * (1 - (1 + real_rate) ** -retirement_years) / real_rate
+
+
+def threat_level(funded_ratio):
+    for threshold, label in THREAT_LEVELS:
+        if funded_ratio >= threshold:
+            return label
+    return "High"
+
+
+def forecast_retirement(profile, monthly_income, savings_history, return_rate=DEFAULT_RETURN_RATE,
+                        inflation=DEFAULT_INFLATION, life_expectancy=DEFAULT_LIFE_EXPECTANCY, today=None):
+    today = today or datetime.now()
+    age = int(profile.get("age") or 0)
+    retirement_age = int(profile.get("retirement_age") or DEFAULT_RETIREMENT_AGE)
+    years = max(retirement_age - age, 0)
+    current_savings = float(profile.get("total_savings") or 0)
+
+    contribution = annual_contribution(savings_history)
+    if contribution <= 0:
+        contribution = float(profile.get("savings_goal_per_year") or 0)
+
+    balances = project_balances(current_savings, contribution, years, return_rate, inflation)
+    annual_spending = max(monthly_income * 12 - contribution, 0.0)
+    target = retirement_target(annual_spending, years, max(life_expectancy - retirement_age, 1), return_rate, inflation)
+    funded_ratio = float(balances[-1] / target) if target > 0 else 1.0
+
+    # Starting contribution (growing with inflation) that reaches the target exactly
+    unit = project_balances(0.0, 1.0, years, return_rate, inflation)[-1]
+    shortfall = target - current_savings * (1 + return_rate) ** years
+    required = max(shortfall / unit, 0.0) if unit > 0 else 0.0
+    plan_base = max(required, contribution)
+    steps = (1 + inflation) ** np.arange(5)
+    five_year_goal_plan = [
+        {"year": today.year + i, "target_savings": round(float(plan_base * step), 2)}
+        for i, step in enumerate(steps)
+    ]
+
+    return RetirementForecast(
+        ages=np.arange(age, age + years + 1),
+        balances=balances,
+        target=float(target),
+        funded_ratio=funded_ratio,
+        threat_level=threat_level(funded_ratio),
+        annual_contribution=contribution,
+        required_contribution=float(required),
+        five_year_goal_plan=five_year_goal_plan,
+    )
@@ -0,0 +1,87 @@
+import re
+import json
+
+# Incremental parser for a single JSON object that arrives in pieces, e.g. a
+# streamed LLM completion. Each top-level member is returned as soon as its
+# value is complete, so callers can act on "suggested_budget" while the rest
+# of the object is still being generated. Text around the object (```json
+# fences, prose) is ignored.
+
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalObjectParser:
+    def __init__(self):
+        self.buffer = ""
+        self.pos = None  # index just inside the top-level "{", once found
+        self.done = False
+        self.members = {}
+        self._decoder = json.JSONDecoder()
+
+    def _skip(self, i, chars=_WHITESPACE):
+        while i < len(self.buffer) and self.buffer[i] in chars:
+            i += 1
+        return i
+
+    def _next_member(self):
+        # Returns (key, value, end) for the member starting at self.pos, or None
+        # if the buffer does not hold all of it yet.
+        buf = self.buffer
+        i = self._skip(self.pos, _WHITESPACE + ",")
+        if i >= len(buf):
+            return None
+        if buf[i] == "}":
+            self.done = True
+            return None
+        try:
+            key, i = self._decoder.raw_decode(buf, i)
+        except json.JSONDecodeError:
+            return None
+        i = self._skip(i)
+        if i >= len(buf) or buf[i] != ":":
+            return None
+        i = self._skip(i + 1)
+        try:
+            value, end = self._decoder.raw_decode(buf, i)
+        except json.JSONDecodeError:
+            return None
+        # A bare number could still be growing ("12" -> "125"), so only accept a
+        # value once the delimiter after it has arrived
+        after = self._skip(end)
+        if after >= len(buf) or buf[after] not in ",}":
+            return None
+        return key, value, end
+
+    def feed(self, chunk):
+        # Adds text and returns the list of (key, value) members completed by it
+        self.buffer += chunk
+        completed = []
+        if self.pos is None:
+            start = self.buffer.find("{")
+            if start < 0:
+                return completed
+            self.pos = start + 1
+        while not self.done:
+            member = self._next_member()
+            if member is None:
+                break
+            key, value, self.pos = member
+            self.members[key] = value
+            completed.append((key, value))
+        return completed
+
+    def close(self):
+        # Parses whatever the stream left behind in one go (e.g. a truncated
+        # tail the incremental path could not settle) and returns the members
+        # not reported yet. Raises ValueError if the text is not valid JSON.
+        if self.done:
+            return []
+        cleaned = re.sub(r"```json|```", "", self.buffer).strip()
+        start, end = cleaned.find("{"), cleaned.rfind("}")
+        if start < 0 or end < start:
+            raise ValueError("No JSON object found in response")
+        obj = json.loads(cleaned[start:end + 1])
+        self.done = True
+        remaining = [(k, v) for k, v in obj.items() if k not in self.members]
+        self.members.update(remaining)
+        return remaining
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import Future
+
+# Persistent cache for LLM completions, keyed by a hash of (model, prompt).
+# Stored in SQLite so answers survive restarts; entries expire after TTL seconds
+# and the least recently used ones are evicted past MAX_ENTRIES. Identical
+# requests that arrive while one is already in flight wait for that call
+# instead of sending their own.
+
+CACHE_PATH = os.getenv(
+    "FINPILOT_LLM_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache", "llm_cache.sqlite3"),
+)
+CACHE_TTL = float(os.getenv("FINPILOT_LLM_CACHE_TTL", str(24 * 3600)))
+MAX_ENTRIES = int(os.getenv("FINPILOT_LLM_CACHE_MAX", "500"))
+
+
+def cache_key(model, prompt):
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0  # callers that joined an in-flight request
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key, model, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, model, json.dumps(value), now, now),
+            )
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def get_or_call(self, model, prompt, call):
+        # Returns (value, from_cache). `call()` must return something JSON
+        # serialisable; if it raises, nothing is cached and every waiter sees the error.
+        key = cache_key(model, prompt)
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value, True
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.shared += 1
+        if not owner:
+            return future.result(), True
+
+        try:
+            value = call()
+            self.put(key, model, value)
+            future.set_result(value)
+            return value, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get_or_stream(self, model, prompt, stream):
+        # Streaming counterpart of get_or_call for results built from (key, value)
+        # pairs. `stream()` yields the pairs as they arrive; they are passed
+        # through as soon as they do and the assembled dict is cached at the end.
+        # Cache hits and callers joining an in-flight stream get all pairs at once.
+        key = cache_key(model, prompt)
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            yield from value.items()
+            return
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.shared += 1
+        if not owner:
+            yield from future.result().items()
+            return
+
+        result = {}
+        try:
+            for item_key, item_value in stream():
+                result[item_key] = item_value
+                yield item_key, item_value
+            self.put(key, model, result)
+            future.set_result(result)
+        except GeneratorExit:
+            # Consumer stopped early: fail the waiters rather than leave them hanging
+            future.set_exception(RuntimeError("Streaming request was abandoned"))
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_inflight": self.shared,
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache()
+        return _default_cache
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import random
+import threading
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+import metrics
+
+# Shared OpenRouter client for every LLM feature. One requests.Session keeps
+# TLS connections alive between calls, every request has connect/read
+# timeouts, 429 and 5xx answers are retried with exponential backoff, and a
+# semaphore caps how many calls are in flight from this process.
+
+load_dotenv()
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+CONNECT_TIMEOUT = float(os.getenv("FINPILOT_LLM_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("FINPILOT_LLM_READ_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("FINPILOT_LLM_MAX_RETRIES", "3"))
+MAX_CONCURRENCY = int(os.getenv("FINPILOT_LLM_MAX_CONCURRENCY", "4"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMClient:
+    def __init__(self, api_key=None, url=OPENROUTER_URL, connect_timeout=CONNECT_TIMEOUT,
+                 read_timeout=READ_TIMEOUT, max_retries=MAX_RETRIES, max_concurrency=MAX_CONCURRENCY,
+                 title="FinPilot"):
+        self.api_key = api_key if api_key is not None else os.getenv("OPENROUTER_API_KEY")
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.title = title
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        self._metrics_lock = threading.Lock()
+        self._latencies = deque(maxlen=500)
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://your-site.streamlit.app",
+            "X-Title": self.title,
+        }
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), BACKOFF_MAX)
+            except ValueError:
+                pass
+        return min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX) * random.uniform(0.5, 1.0)
+
+    def _record(self, started, ok):
+        elapsed = time.perf_counter() - started
+        with self._metrics_lock:
+            self.requests += 1
+            self._latencies.append(elapsed)
+            if not ok:
+                self.errors += 1
+        metrics.observe(metrics.LLM, "openrouter.chat", elapsed, error=not ok)
+
+    def _send(self, payload, stream):
+        # Returns the successful requests.Response; raises LLMError once retries
+        # are exhausted. Callers hold a concurrency slot around this.
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                with self._metrics_lock:
+                    self.retries += 1
+            started = time.perf_counter()
+            response = None
+            try:
+                response = self.session.post(
+                    self.url, headers=self._headers(), json=payload, timeout=self.timeout, stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+            else:
+                if response.status_code < 400:
+                    self._record(started, True)
+                    return response
+                last_error = LLMError(f"HTTP {response.status_code}: {response.text[:200]}")
+                response.close()
+                if response.status_code not in RETRY_STATUSES:
+                    self._record(started, False)
+                    raise last_error
+            self._record(started, False)
+            if attempt < self.max_retries:
+                time.sleep(self._backoff(attempt, response))
+        raise LLMError(f"OpenRouter request failed after {self.max_retries + 1} attempts: {last_error}")
+
+    def post(self, payload):
+        with self._slots:
+            return self._send(payload, stream=False)
+
+    def chat(self, messages, model, **options):
+        response = self.post({"model": model, "messages": messages, **options})
+        body = response.json()
+        if "error" in body:
+            raise LLMError(body["error"].get("message", str(body["error"])))
+        return body["choices"][0]["message"]["content"]
+
+    def stream_chat(self, messages, model, **options):
+        # Yields content deltas from a streamed (server-sent events) completion.
+        # The concurrency slot is held until the stream is exhausted or closed.
+        # Retries only cover the initial request, not a stream cut off midway.
+        with self._slots:
+            response = self._send({"model": model, "messages": messages, "stream": True, **options}, stream=True)
+            try:
+                # text/event-stream is UTF-8 by definition, but without a charset
+                # in Content-Type requests would decode it as ISO-8859-1
+                response.encoding = "utf-8"
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue  # keep-alive comments such as ": OPENROUTER PROCESSING"
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    if "error" in event:
+                        raise LLMError(event["error"].get("message", str(event["error"])))
+                    delta = event["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+            finally:
+                response.close()
+
+    def stats(self):
+        with self._metrics_lock:
+            latencies = sorted(self._latencies)
+            requests_, retries, errors = self.requests, self.retries, self.errors
+
+        def pct(p):
+            return latencies[min(int(p * len(latencies)), len(latencies) - 1)] if latencies else 0.0
+        return {
+            "requests": requests_,
+            "retries": retries,
+            "errors": errors,
+            "latency_p50": pct(0.50),
+            "latency_p95": pct(0.95),
+            "latency_max": latencies[-1] if latencies else 0.0,
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
@@ -1,8 +1,9 @@
 import streamlit as st
 from auth_helpers import require_auth, get_current_user
-from pages.profile import get_user_profile
-from supabase_client import supabase
+from data_access import fetch_profile
+import metrics
 
+metrics.page_start("main")
 require_auth()
 user = get_current_user()
 user_id = user["id"]
@@ -10,12 +11,7 @@ user_id = user["id"]
 
 def get_user_profile(user_id):
     try:
-        res = supabase.table("user_profile").select("*").eq("user_id", user_id).execute()
-        data = res.data
-        if data and len(data) > 0:
-            return data[0]
-        else:
-            return None
+        return fetch_profile(user_id)
     except Exception:
         st.write("excetion no profile data")
         return None
@@ -42,3 +38,5 @@ if st.button("Logout"):
     del st.session_state["user"]
     st.success("Logged out successfully")
     st.switch_page("pages/auth.py")
+
+metrics.page_end()
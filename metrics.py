@@ -0,0 +1,348 @@
+import os
+import time
+import bisect
+import threading
+import contextlib
+from collections import deque
+import profiler
+
+# Lightweight instrumentation for the hot paths: Supabase queries, model
+# predict/transform, OpenRouter calls and whole page reruns. Each series is a
+# latency histogram plus row and error counters, labelled by page and
+# operation. Off unless FINPILOT_METRICS=1; when off, every hook is a single
+# flag check and the Supabase client is not wrapped at all.
+#
+# Output, when enabled:
+#   FINPILOT_METRICS_FILE   Prometheus text written there (atomically) at most
+#                           every FINPILOT_METRICS_FLUSH seconds, e.g. for the
+#                           node_exporter textfile collector
+#   FINPILOT_METRICS_PORT   local endpoint on 127.0.0.1:<port>/metrics
+#   FINPILOT_METRICS_ADMINS comma-separated emails (or *) that see the
+#                           metrics panel in the sidebar
+
+ENABLED = os.getenv("FINPILOT_METRICS", "0") == "1"
+METRICS_FILE = os.getenv("FINPILOT_METRICS_FILE")
+METRICS_PORT = int(os.getenv("FINPILOT_METRICS_PORT", "0"))
+FLUSH_INTERVAL = float(os.getenv("FINPILOT_METRICS_FLUSH", "10"))
+ADMINS = {e.strip() for e in os.getenv("FINPILOT_METRICS_ADMINS", "").split(",") if e.strip()}
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RECENT_SAMPLES = 500  # kept per series for the panel's percentiles
+
+QUERY = "finpilot_supabase_query_seconds"
+MODEL = "finpilot_model_seconds"
+LLM = "finpilot_llm_request_seconds"
+RERUN = "finpilot_rerun_seconds"
+
+HELP = {
+    QUERY: "Supabase execute() round trip",
+    MODEL: "Model and scaler calls",
+    LLM: "OpenRouter request attempts",
+    RERUN: "Whole page reruns",
+}
+
+
+class Series:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)  # last one is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.rows = 0
+        self.errors = 0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def add(self, seconds, rows, error):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.rows += rows or 0
+        self.errors += bool(error)
+        self.recent.append(seconds)
+
+
+_series = {}  # (metric, page, op) -> Series
+_lock = threading.Lock()
+_local = threading.local()
+_last_flush = 0.0
+
+
+# ---------- Recording ----------
+
+def current_page():
+    return getattr(_local, "page", None)
+
+
+@contextlib.contextmanager
+def page_label(page):
+    # For work handed to other threads (e.g. data_access's fetch pool), which
+    # would otherwise lose the page of the rerun that submitted it
+    previous = current_page()
+    _local.page = page
+    try:
+        yield
+    finally:
+        _local.page = previous
+
+
+def observe(metric, op, seconds, rows=None, error=False):
+    if not ENABLED:
+        return
+    key = (metric, current_page() or "-", op)
+    with _lock:
+        series = _series.get(key)
+        if series is None:
+            series = _series[key] = Series()
+        series.add(seconds, rows, error)
+
+
+class _Span:
+    def __init__(self, metric, op, rows):
+        self.metric = metric
+        self.op = op
+        self.rows = rows
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.metric, self.op, time.perf_counter() - self.started, self.rows, exc_type is not None)
+        return False
+
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def track(op, rows=None, metric=MODEL):
+    # with metrics.track("savings_model.predict", rows=len(X)): ...
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(metric, op, rows)
+
+
+# ---------- Reruns ----------
+
+def page_start(page):
+    # Top of a page script: labels everything recorded during this rerun, and
+    # starts profiler.py's per-rerun profile when one is requested
+    if ENABLED:
+        _local.page = page
+        _local.rerun_started = time.perf_counter()
+    profiler.start(page)
+
+
+def page_end():
+    # Bottom of a page script. Reruns cut short by st.stop() are not recorded.
+    profiler.stop()
+    if not ENABLED:
+        return
+    started = getattr(_local, "rerun_started", None)
+    if started is not None:
+        observe(RERUN, "rerun", time.perf_counter() - started)
+        _local.rerun_started = None
+    flush()
+    _start_server()
+    render_panel()
+
+
+# ---------- Supabase ----------
+
+QUERY_OPS = {"select", "insert", "update", "upsert", "delete"}
+
+
+class _TimedQuery:
+    # Wraps a postgrest request builder; every builder method returns a wrapped
+    # builder, and execute() is timed under "<table>.<operation>"
+    def __init__(self, builder, table, op="select"):
+        self._builder = builder
+        self._table = table
+        self._op = op
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return _TimedQuery(result, self._table, name if name in QUERY_OPS else self._op)
+            return result
+        return call
+
+    def execute(self):
+        started = time.perf_counter()
+        op = f"{self._table}.{self._op}"
+        try:
+            resp = self._builder.execute()
+        except Exception:
+            observe(QUERY, op, time.perf_counter() - started, error=True)
+            raise
+        data = getattr(resp, "data", None)
+        observe(QUERY, op, time.perf_counter() - started, rows=len(data) if isinstance(data, list) else None)
+        return resp
+
+
+class InstrumentedClient:
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return _TimedQuery(self._client.table(name), name)
+
+    def from_(self, name):
+        return _TimedQuery(self._client.from_(name), name)
+
+    def rpc(self, name, params=None):
+        return _TimedQuery(self._client.rpc(name, params or {}), "rpc", name)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+# ---------- Export ----------
+
+def snapshot():
+    # [(metric, page, op, Series copy)], sorted
+    with _lock:
+        items = []
+        for (metric, page, op), series in sorted(_series.items()):
+            copy = Series()
+            copy.buckets = list(series.buckets)
+            copy.count, copy.total, copy.rows, copy.errors = series.count, series.total, series.rows, series.errors
+            copy.recent = deque(series.recent, maxlen=RECENT_SAMPLES)
+            items.append((metric, page, op, copy))
+        return items
+
+
+def reset():
+    with _lock:
+        _series.clear()
+
+
+def _labels(page, op, le=None):
+    labels = f'page="{page}",op="{op}"'
+    return labels + f',le="{le}"' if le is not None else labels
+
+
+def prometheus_text():
+    lines = []
+    items = snapshot()
+    for metric in sorted({m for m, _, _, _ in items}):
+        base = metric[:-len("_seconds")]
+        lines.append(f"# HELP {metric} {HELP.get(metric, metric)}")
+        lines.append(f"# TYPE {metric} histogram")
+        rows_lines, error_lines = [], []
+        for m, page, op, series in items:
+            if m != metric:
+                continue
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ("+Inf",), series.buckets):
+                cumulative += n
+                lines.append(f"{metric}_bucket{{{_labels(page, op, bound)}}} {cumulative}")
+            lines.append(f"{metric}_sum{{{_labels(page, op)}}} {series.total:.6f}")
+            lines.append(f"{metric}_count{{{_labels(page, op)}}} {series.count}")
+            rows_lines.append(f"{base}_rows_total{{{_labels(page, op)}}} {series.rows}")
+            error_lines.append(f"{base}_errors_total{{{_labels(page, op)}}} {series.errors}")
+        lines += [f"# TYPE {base}_rows_total counter"] + rows_lines
+        lines += [f"# TYPE {base}_errors_total counter"] + error_lines
+    return "\n".join(lines) + "\n"
+
+
+def flush(force=False):
+    # Writes METRICS_FILE if one is configured and FLUSH_INTERVAL has passed
+    global _last_flush
+    if not METRICS_FILE:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < FLUSH_INTERVAL:
+        return
+    _last_flush = now
+    os.makedirs(os.path.dirname(os.path.abspath(METRICS_FILE)), exist_ok=True)
+    tmp = f"{METRICS_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, METRICS_FILE)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def _start_server():
+    # Serves prometheus_text() on 127.0.0.1:METRICS_PORT, once per process
+    global _server
+    if not METRICS_PORT or _server is not None:
+        return
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _server_lock:
+        if _server is not None:
+            return
+        try:
+            _server = ThreadingHTTPServer(("127.0.0.1", METRICS_PORT), Handler)
+        except OSError as e:  # port taken, e.g. by another app process
+            print(f"Metrics endpoint not started on port {METRICS_PORT}: {e}")
+            _server = False
+            return
+        threading.Thread(target=_server.serve_forever, name="finpilot-metrics", daemon=True).start()
+
+
+# ---------- Admin panel ----------
+
+def _is_admin():
+    import streamlit as st
+    user = st.session_state.get("user") or {}
+    return "*" in ADMINS or user.get("email") in ADMINS
+
+
+def summary_rows():
+    rows = []
+    for metric, page, op, series in snapshot():
+        recent = sorted(series.recent)
+
+        def pct(p):
+            return recent[min(int(p * len(recent)), len(recent) - 1)] * 1e3 if recent else 0.0
+        rows.append({
+            "metric": metric.replace("finpilot_", "").replace("_seconds", ""),
+            "page": page,
+            "op": op,
+            "count": series.count,
+            "p50 ms": round(pct(0.50), 1),
+            "p95 ms": round(pct(0.95), 1),
+            "mean ms": round(series.total / series.count * 1e3, 1) if series.count else 0.0,
+            "rows": series.rows,
+            "errors": series.errors,
+        })
+    return rows
+
+
+def render_panel():
+    if not ENABLED or not ADMINS or not _is_admin():
+        return
+    import streamlit as st
+    with st.sidebar.expander("📈 Metrics (admin)"):
+        rows = summary_rows()
+        if not rows:
+            st.caption("Nothing recorded yet.")
+            return
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+        st.download_button("Download Prometheus text", prometheus_text(), file_name="finpilot_metrics.prom",
+                           mime="text/plain")
+        if st.button("Reset metrics"):
+            reset()
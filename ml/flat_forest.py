@@ -0,0 +1,184 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ml.registry import registry
+
+# Flattened RandomForestRegressor for fast inference.
+#
+# Every tree's nodes are concatenated into five flat arrays (feature,
+# threshold, left, right, value) with child indices made global, and leaves
+# pointing at themselves. Prediction walks all trees for all rows at once:
+# one vectorised NumPy step per tree level instead of sklearn's per-call input
+# validation, joblib dispatch and per-tree loop. Results match sklearn to
+# float tolerance because inputs are compared as float32, like sklearn does.
+#
+# Flat forests are published to the registry as "<name>_flat", where their
+# plain arrays are memory-mapped and shared between processes.
+#
+#   python ml/flat_forest.py export savings_model
+#   python ml/flat_forest.py export spending_model
+#   python ml/flat_forest.py bench savings_model [--rows 10000]
+
+FLAT_SUFFIX = "_flat"
+BATCH_ROWS = 4096  # bounds the (rows x trees) index matrix
+
+
+class FlatForest:
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            nodes = np.arange(n) + offset
+            is_leaf = tree.children_left == -1
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, nodes, tree.children_left + offset).astype(np.int32))
+            rights.append(np.where(is_leaf, nodes, tree.children_right + offset).astype(np.int32))
+            values.append(tree.value[:, 0, 0].astype(np.float64))
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n
+        return cls(
+            np.concatenate(features),
+            np.concatenate(thresholds),
+            np.concatenate(lefts),
+            np.concatenate(rights),
+            np.concatenate(values),
+            np.array(roots, dtype=np.int32),
+            max_depth,
+            forest.n_features_in_,
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def _predict_block(self, X):
+        # One (row, tree) cursor per pair, flattened; each pass advances the
+        # cursors that have not reached a leaf and drops the ones that have
+        n, n_trees = X.shape[0], len(self.roots)
+        flat_X = X.ravel()
+        node = np.tile(self.roots, n)
+        row_offset = np.repeat(np.arange(n) * X.shape[1], n_trees)
+        active = np.flatnonzero(self.left[node] != node)
+        while active.size:
+            current = node[active]
+            go_left = flat_X[row_offset[active] + self.feature[current]] <= self.threshold[current]
+            nxt = np.where(go_left, self.left[current], self.right[current])
+            node[active] = nxt
+            active = active[self.left[nxt] != nxt]
+        return self.value[node].reshape(n, n_trees).mean(axis=1)
+
+    def predict(self, X):
+        # float32 like sklearn's tree input, then widened so the comparison
+        # against the float64 thresholds is the same one sklearn makes
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float32), dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[0] <= BATCH_ROWS:
+            return self._predict_block(X)
+        return np.concatenate([
+            self._predict_block(X[i:i + BATCH_ROWS]) for i in range(0, X.shape[0], BATCH_ROWS)
+        ])
+
+
+def load_predictor(name):
+    # The published flat forest when it was exported from the current version
+    # of the model, else the model itself. Both expose predict(X).
+    model = registry.get(name)
+    try:
+        flat = registry.get(name + FLAT_SUFFIX)
+    except (FileNotFoundError, KeyError):
+        return model
+    if registry.version(name + FLAT_SUFFIX) != registry.version(name):
+        return model
+    return flat
+
+
+def export(name):
+    artifact = registry.get(name)
+    if isinstance(artifact, tuple):  # spending_model is (model, encoder, num_cols)
+        flat = (FlatForest.from_sklearn(artifact[0]),) + tuple(artifact[1:])
+    else:
+        flat = FlatForest.from_sklearn(artifact)
+    return registry.publish(name + FLAT_SUFFIX, flat, version=registry.version(name))
+
+
+def _timeit(fn, repeat):
+    fn()  # warm-up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def benchmark(forest, X, repeat=20):
+    flat = FlatForest.from_sklearn(forest)
+    row = X[:1]
+    results = {
+        "max_abs_diff": float(np.max(np.abs(flat.predict(X) - forest.predict(X)))),
+        "sklearn_single_ms": _timeit(lambda: forest.predict(row), repeat) * 1e3,
+        "flat_single_ms": _timeit(lambda: flat.predict(row), repeat) * 1e3,
+        "sklearn_batch_ms": _timeit(lambda: forest.predict(X), max(repeat // 4, 3)) * 1e3,
+        "flat_batch_ms": _timeit(lambda: flat.predict(X), max(repeat // 4, 3)) * 1e3,
+        "rows": len(X),
+        "trees": flat.n_estimators,
+        "max_depth": flat.max_depth,
+    }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or benchmark flattened forests")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="publish <name>_flat built from the registry's current <name>")
+    exp.add_argument("name")
+    bench = sub.add_parser("bench", help="compare flat and sklearn latency on random inputs")
+    bench.add_argument("name")
+    bench.add_argument("--rows", type=int, default=10_000)
+    bench.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        print(f"Published {args.name}{FLAT_SUFFIX} {export(args.name)}")
+        return
+
+    artifact = registry.get(args.name)
+    forest = artifact[0] if isinstance(artifact, tuple) else artifact
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(args.rows, forest.n_features_in_))
+    results = benchmark(forest, X, args.repeat)
+    print(f"{results['trees']} trees, max depth {results['max_depth']}, {results['rows']:,} rows")
+    print(f"max |flat - sklearn|: {results['max_abs_diff']:.3g}")
+    print(f"single row: sklearn {results['sklearn_single_ms']:.3f} ms, flat {results['flat_single_ms']:.3f} ms "
+          f"({results['sklearn_single_ms'] / results['flat_single_ms']:.1f}x)")
+    print(f"batch:      sklearn {results['sklearn_batch_ms']:.1f} ms, flat {results['flat_batch_ms']:.1f} ms "
+          f"({results['sklearn_batch_ms'] / results['flat_batch_ms']:.1f}x)")
+
+
+if __name__ == "__main__":
+    # Run through the importable module so pickled FlatForest objects refer to
+    # ml.flat_forest.FlatForest rather than __main__.FlatForest
+    from ml.flat_forest import main as module_main
+    sys.exit(module_main())
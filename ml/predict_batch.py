@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+import argparse
+import joblib
+import numpy as np
+import pandas as pd
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ml.registry import registry
+
+# Batch scoring for the savings Random Forest (registry savings_model + savings_scaler).
+# Input rows are streamed in chunks so memory stays bounded by the chunk size,
+# not the file size, and the forest predicts each chunk on all cores.
+#
+#   python ml/predict_batch.py customers.parquet scored.parquet --chunksize 200000
+#   python ml/predict_batch.py rows.csv scored.csv --passthrough Customer_ID
+
+FEATURES = ["Income", "Desired_Savings_Percentage", "Disposable_Income"]
+PREDICTION_COLUMN = "Predicted_Savings"
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def load_model_scaler(model_path=None, scaler_path=None):
+    # Explicit paths win; otherwise the registry's current versions
+    model = joblib.load(model_path) if model_path else registry.get("savings_model")
+    scaler = joblib.load(scaler_path) if scaler_path else registry.get("savings_scaler")
+    return model, scaler
+
+
+def predict_savings_batch(features, model, scaler, n_jobs=-1):
+    # features: DataFrame with the FEATURES columns (any order) or an
+    # (n, 3) array in FEATURES order. Returns a float64 array of predictions.
+    if isinstance(features, pd.DataFrame):
+        features = features[FEATURES]
+    else:
+        features = pd.DataFrame(np.asarray(features, dtype=float), columns=FEATURES)
+    if len(features) == 0:
+        return np.empty(0)
+
+    X = scaler.transform(features)
+    previous = getattr(model, "n_jobs", None)
+    model.n_jobs = n_jobs
+    try:
+        return model.predict(X)
+    finally:
+        model.n_jobs = previous
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in (".parquet", ".pq")
+
+
+def iter_chunks(path, columns, chunksize=DEFAULT_CHUNKSIZE):
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunksize)
+
+
+class _ChunkWriter:
+    # Appends scored chunks to CSV or Parquet; written to a temp file and renamed
+    # into place on close so readers never see a half-written output
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.parquet = _is_parquet(path)
+        self._writer = None
+        self._header = True
+
+    def write(self, frame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.tmp_path, table.schema)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.tmp_path, mode="w" if self._header else "a", header=self._header, index=False)
+            self._header = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self.tmp_path):
+            os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def score_file(input_path, output_path, chunksize=DEFAULT_CHUNKSIZE, passthrough=(), n_jobs=-1,
+               model=None, scaler=None, log=print):
+    if model is None or scaler is None:
+        model, scaler = load_model_scaler()
+    columns = list(dict.fromkeys(list(passthrough) + FEATURES))
+    writer = _ChunkWriter(output_path)
+    rows = 0
+    started = time.perf_counter()
+    try:
+        for chunk in iter_chunks(input_path, columns, chunksize):
+            chunk[PREDICTION_COLUMN] = predict_savings_batch(chunk, model, scaler, n_jobs=n_jobs)
+            writer.write(chunk)
+            rows += len(chunk)
+            if log:
+                elapsed = time.perf_counter() - started
+                log(f"{rows:,} rows scored ({rows / elapsed:,.0f} rows/s)")
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file with the savings model")
+    parser.add_argument("input", help="CSV or Parquet file with Income, Desired_Savings_Percentage, Disposable_Income")
+    parser.add_argument("output", help="output path; .parquet/.pq writes Parquet, anything else CSV")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk")
+    parser.add_argument("--passthrough", nargs="*", default=[], help="extra input columns copied to the output")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="cores used by the forest (-1 = all)")
+    parser.add_argument("--model", help="model file (default: registry's current savings_model)")
+    parser.add_argument("--scaler", help="scaler file (default: registry's current savings_scaler)")
+    args = parser.parse_args(argv)
+
+    model, scaler = load_model_scaler(args.model, args.scaler)
+    rows = score_file(args.input, args.output, args.chunksize, args.passthrough, args.n_jobs, model, scaler)
+    print(f"Wrote {rows:,} predictions to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import joblib
+
+# Versioned model registry.
+#
+# Published models live in ml/models/<name>/<version>.joblib, next to a
+# manifest.json that records every version's sha256, size and creation time
+# and which version is current. Models that were never published fall back
+# to the legacy files the training scripts write (ml/model_rf_savings.pkl, ...).
+#
+# get(name) loads a model lazily, once per process, with joblib mmap_mode="r":
+# NumPy arrays inside the artifact stay in the OS page cache and are shared
+# read-only by every Streamlit worker process instead of being copied into
+# each one. Each call stats the manifest, so publishing a new version swaps it
+# in on the next get() without a restart.
+#
+#   python ml/registry.py list
+#   python ml/registry.py publish savings_model path/to/model.pkl [--version v2]
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(ML_DIR, "models")
+
+LEGACY_FILES = {
+    "savings_model": "model_rf_savings.pkl",
+    "savings_scaler": "scaler.pkl",
+    "spending_model": "spending_model.pkl",
+}
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, root=MODELS_DIR, mmap_mode="r"):
+        self.root = root
+        self.mmap_mode = mmap_mode
+        self._lock = threading.Lock()
+        self._loaded = {}  # name -> {"signature", "version", "sha256", "path", "model", "loaded_at"}
+
+    # ---------- Manifest ----------
+
+    def _manifest_path(self, name):
+        return os.path.join(self.root, name, "manifest.json")
+
+    def _read_manifest(self, name):
+        try:
+            with open(self._manifest_path(name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"current": None, "versions": {}}
+
+    def _write_manifest(self, name, manifest):
+        path = self._manifest_path(name)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, path)
+
+    def _resolve(self, name):
+        # (path, version, sha256 or None, signature); signature changes whenever
+        # the current version does
+        manifest_path = self._manifest_path(name)
+        if os.path.exists(manifest_path):
+            manifest = self._read_manifest(name)
+            version = manifest["current"]
+            entry = manifest["versions"][version]
+            stat = os.stat(manifest_path)
+            return os.path.join(self.root, name, entry["file"]), version, entry["sha256"], (stat.st_mtime_ns, stat.st_size)
+        if name not in LEGACY_FILES:
+            raise KeyError(f"Unknown model '{name}'")
+        path = os.path.join(ML_DIR, LEGACY_FILES[name])
+        stat = os.stat(path)
+        return path, None, None, (stat.st_mtime_ns, stat.st_size)
+
+    # ---------- Loading ----------
+
+    def get(self, name):
+        path, version, sha256, signature = self._resolve(name)
+        entry = self._loaded.get(name)
+        if entry and entry["signature"] == signature:
+            return entry["model"]
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry and entry["signature"] == signature:
+                return entry["model"]
+            if sha256 is None:
+                sha256 = file_sha256(path)
+                version = f"legacy-{sha256[:12]}"
+            model = joblib.load(path, mmap_mode=self.mmap_mode)
+            self._loaded[name] = {
+                "signature": signature,
+                "version": version,
+                "sha256": sha256,
+                "path": path,
+                "model": model,
+                "loaded_at": time.time(),
+            }
+            return model
+
+    def info(self, name):
+        self.get(name)
+        return {k: v for k, v in self._loaded[name].items() if k != "model"}
+
+    def version(self, name):
+        return self.info(name)["version"]
+
+    # ---------- Publishing ----------
+
+    def publish(self, name, obj, version=None):
+        # Uncompressed joblib so the arrays can be memory-mapped on load
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        version = version or time.strftime("%Y%m%d-%H%M%S")
+        filename = f"{version}.joblib"
+        path = os.path.join(self.root, name, filename)
+        joblib.dump(obj, path)
+
+        manifest = self._read_manifest(name)
+        manifest["versions"][version] = {
+            "file": filename,
+            "sha256": file_sha256(path),
+            "size": os.path.getsize(path),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        manifest["current"] = version
+        self._write_manifest(name, manifest)
+        return version
+
+    def activate(self, name, version):
+        manifest = self._read_manifest(name)
+        if version not in manifest["versions"]:
+            raise KeyError(f"{name} has no version '{version}'")
+        manifest["current"] = version
+        self._write_manifest(name, manifest)
+
+    def list(self):
+        names = set(LEGACY_FILES)
+        if os.path.isdir(self.root):
+            names.update(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+        return {name: self._read_manifest(name) for name in sorted(names)}
+
+
+registry = ModelRegistry()
+
+
+def get_model(name):
+    return registry.get(name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage versioned model artifacts")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="show registered models and versions")
+    publish = sub.add_parser("publish", help="publish a pickled/joblib artifact as a new version")
+    publish.add_argument("name")
+    publish.add_argument("artifact")
+    publish.add_argument("--version")
+    activate = sub.add_parser("activate", help="make an existing version current")
+    activate.add_argument("name")
+    activate.add_argument("version")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name, manifest in registry.list().items():
+            current = manifest["current"] or f"(legacy file {LEGACY_FILES.get(name, '-')})"
+            print(f"{name}: current={current}")
+            for version, entry in manifest["versions"].items():
+                print(f"  {version}  sha256={entry['sha256'][:12]}  {entry['size']:,} bytes  {entry['created_at']}")
+    elif args.command == "publish":
+        version = registry.publish(args.name, joblib.load(args.artifact), args.version)
+        print(f"Published {args.name} {version}")
+    elif args.command == "activate":
+        registry.activate(args.name, args.version)
+        print(f"{args.name} now at {args.version}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
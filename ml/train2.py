@@ -1,93 +1,236 @@
 import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from contextlib import contextmanager
+import joblib
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
 from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import root_mean_squared_error, r2_score
 from sklearn.model_selection import train_test_split
 
-scaler = StandardScaler()
-
-print(os.getcwd()) 
-
-# Load and preprocess data
-df = pd.read_csv(r'data\external\data.csv')
-
-# One-Hot encode 'Occupation' and 'City_Tier'
-df = pd.get_dummies(df, columns=['Occupation', 'City_Tier'], drop_first=True)
-print(df.head())
-
-# Split features and target
-X = df.drop('Desired_Savings', axis=1)
-y = df['Desired_Savings']
-
-# Train-test split
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
-
-print(f"Training samples: {X_train.shape[0]}")
-print(f"Test samples: {X_test.shape[0]}")
-
-# Scale all features initially
-X_train_scaled_all = pd.DataFrame(scaler.fit_transform(X_train), columns=X_train.columns)
-X_test_scaled_all = pd.DataFrame(scaler.transform(X_test), columns=X_test.columns)
-
-# Initial model training for feature importance
-model_initial = RandomForestRegressor(random_state=42)
-model_initial.fit(X_train_scaled_all, y_train)
-
-# Extract feature importances
-importances = model_initial.feature_importances_
-feat_names = X_train.columns
-
-# Filter features above importance threshold
-threshold = 0.01
-filtered_indices = np.where(importances >= threshold)[0]
-sorted_filtered_indices = filtered_indices[np.argsort(importances[filtered_indices])[::-1]]
-selected_features = feat_names[sorted_filtered_indices]
-
-# Display selected features
-print("\nSelected important features:")
-for feat in selected_features:
-    print(f"{feat}: {importances[feat_names.get_loc(feat)]:.4f}")
-
-# Scale only selected features
-X_train_filtered = X_train[selected_features]
-X_test_filtered = X_test[selected_features]
-
-X_train_filtered_scaled = pd.DataFrame(scaler.fit_transform(X_train_filtered), columns=selected_features)
-X_test_filtered_scaled = pd.DataFrame(scaler.transform(X_test_filtered), columns=selected_features)
-
-# Retrain model on important features
-model_final = RandomForestRegressor(random_state=42)
-model_final.fit(X_train_filtered_scaled, y_train)
-
-# Evaluate model
-y_pred = model_final.predict(X_test_filtered_scaled)
-
-mse = root_mean_squared_error(y_test, y_pred)
-r2 = r2_score(y_test, y_pred)
-
-print(f"\nFinal Model Metrics (Important Features Only):")
-print(f"Mean Squared Error: {mse:.2f}")
-print(f"R2 Score: {r2:.2f}")
-
-# Plot feature importances (filtered only)
-sorted_importances = importances[sorted_filtered_indices]
-plt.figure(figsize=(10, 6))
-plt.title(f"Feature Importances (>{threshold})")
-plt.bar(range(len(selected_features)), sorted_importances, align='center')
-plt.xticks(range(len(selected_features)), selected_features, rotation=45, ha='right')
-plt.tight_layout()
-plt.show()
-
-import joblib
-
-joblib.dump(model_final, r"ml\model_rf_savings.pkl")
-joblib.dump(scaler, r"ml\scaler.pkl")
-
-# Optionally save test data for later use in visualization
-X_test["Desired_Savings"] = y_test
-X_test.to_csv(r"data\external\processed\test_data.csv", index=False)
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_store
+from ml.registry import registry, file_sha256
+
+# Training pipeline for the savings Random Forest.
+#
+#   load      read data.csv and one-hot encode it; the encoded matrix is cached
+#             as Parquet under data/cache/ keyed by the CSV's sha256
+#   split     train/test split
+#   select    importance forest on all features, keep those >= threshold;
+#             the selection is checkpointed so a rerun skips straight to fit
+#   fit       scaler + final forest on the selected features
+#   evaluate  RMSE / R2 on the test split
+#   save      publish savings_model + savings_scaler to the registry (same
+#             version), export the flat forest, write the test data CSV
+#
+# Forests use every core (n_jobs=-1). Settings come from DEFAULT_CONFIG,
+# overridden by an optional JSON file and then by command-line flags.
+#
+#   python ml/train2.py
+#   python ml/train2.py --config train.json --force select
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_CONFIG = {
+    "data_path": os.path.join("data", "external", "data.csv"),
+    "test_data_path": os.path.join("data", "external", "processed", "test_data.csv"),
+    "cache_dir": os.path.join("data", "cache", "train2"),
+    "target": "Desired_Savings",
+    "categorical": ["Occupation", "City_Tier"],
+    "test_size": 0.2,
+    "random_state": 42,
+    "importance_threshold": 0.01,
+    # The importance forest only ranks features, so it can be smaller than
+    # the final one without changing which features pass the threshold
+    "importance_forest": {"n_estimators": 100, "max_samples": None},
+    "final_forest": {"n_estimators": 100},
+    "n_jobs": -1,
+    "publish": True,
+    "export_flat": True,
+    "version": None,
+}
+
+STAGES = ["load", "select"]
+
+
+def load_config(path=None, overrides=None):
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if path:
+        with open(path) as f:
+            config.update(json.load(f))
+    config.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    return config
+
+
+def resolve(path):
+    return path if os.path.isabs(path) else os.path.join(ROOT, path)
+
+
+def config_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:16]
+
+
+@contextmanager
+def stage(name, timings):
+    print(f"[{name}] ...", flush=True)
+    started = time.perf_counter()
+    yield
+    timings[name] = time.perf_counter() - started
+    print(f"[{name}] {timings[name]:.2f}s", flush=True)
+
+
+# ---------- Stages ----------
+
+def load_features(config, force=False):
+    # Returns (encoded DataFrame, cache key). The key covers the source bytes
+    # and the encoding settings, so editing either rebuilds the cache.
+    data_path = resolve(config["data_path"])
+    key = config_key(file_sha256(data_path), config["categorical"])
+    cache_path = os.path.join(resolve(config["cache_dir"]), f"features-{key}.parquet")
+    if os.path.exists(cache_path) and not force:
+        print(f"  cached features {os.path.relpath(cache_path, ROOT)}")
+        return pd.read_parquet(cache_path), key
+
+    df = data_store.read_frame(data_path)
+    df = pd.get_dummies(df, columns=config["categorical"], drop_first=True)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp = f"{cache_path}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, cache_path)
+    print(f"  encoded {len(df):,} rows x {df.shape[1]} columns, cached to {os.path.relpath(cache_path, ROOT)}")
+    return df, key
+
+
+def select_features(X_train, y_train, config, data_key, force=False):
+    # Returns (selected feature names ordered by importance, importances dict),
+    # reusing the checkpoint when data and selection settings are unchanged
+    key = config_key(data_key, config["test_size"], config["random_state"],
+                     config["importance_threshold"], config["importance_forest"])
+    checkpoint = os.path.join(resolve(config["cache_dir"]), f"selection-{key}.json")
+    if os.path.exists(checkpoint) and not force:
+        with open(checkpoint) as f:
+            saved = json.load(f)
+        print(f"  resumed from checkpoint {os.path.relpath(checkpoint, ROOT)}")
+        return saved["selected"], saved["importances"]
+
+    # Scaling is monotonic per feature, so the forest is fit on the raw matrix
+    model = RandomForestRegressor(random_state=config["random_state"], n_jobs=config["n_jobs"],
+                                  **config["importance_forest"])
+    model.fit(X_train, y_train)
+    importances = dict(zip(X_train.columns, model.feature_importances_.tolist()))
+    selected = sorted((f for f, v in importances.items() if v >= config["importance_threshold"]),
+                      key=importances.get, reverse=True)
+
+    tmp = f"{checkpoint}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"selected": selected, "importances": importances}, f, indent=2)
+    os.replace(tmp, checkpoint)
+    return selected, importances
+
+
+def fit_final(X_train, y_train, selected, config):
+    scaler = StandardScaler()
+    X_scaled = pd.DataFrame(scaler.fit_transform(X_train[selected]), columns=selected)
+    model = RandomForestRegressor(random_state=config["random_state"], n_jobs=config["n_jobs"],
+                                  **config["final_forest"])
+    model.fit(X_scaled, y_train)
+    return model, scaler
+
+
+def evaluate(model, scaler, X_test, y_test, selected):
+    X_scaled = pd.DataFrame(scaler.transform(X_test[selected]), columns=selected)
+    y_pred = model.predict(X_scaled)
+    return {"rmse": root_mean_squared_error(y_test, y_pred), "r2": r2_score(y_test, y_pred)}
+
+
+def save_artifacts(model, scaler, X_test, y_test, config):
+    version = None
+    if config["publish"]:
+        version = config["version"] or time.strftime("%Y%m%d-%H%M%S")
+        registry.publish("savings_model", model, version)
+        registry.publish("savings_scaler", scaler, version)
+        print(f"  published savings_model / savings_scaler {version}")
+        if config["export_flat"]:
+            from ml.flat_forest import export
+            export("savings_model")
+            print(f"  exported savings_model_flat {version}")
+    else:
+        out_dir = resolve(config["cache_dir"])
+        joblib.dump(model, os.path.join(out_dir, "model_rf_savings.pkl"))
+        joblib.dump(scaler, os.path.join(out_dir, "scaler.pkl"))
+        print(f"  wrote model and scaler to {os.path.relpath(out_dir, ROOT)}")
+
+    # Test split for the visualisation on the Savings Predictor page
+    test_path = resolve(config["test_data_path"])
+    os.makedirs(os.path.dirname(test_path), exist_ok=True)
+    test_df = X_test.copy()
+    test_df[config["target"]] = y_test
+    test_df.to_csv(test_path, index=False)
+    return version
+
+
+def train(config, force_from=None):
+    # force_from: first stage ("load" or "select") to recompute even if
+    # a cache or checkpoint exists; None resumes wherever possible
+    forced = set(STAGES[STAGES.index(force_from):]) if force_from else set()
+    timings = {}
+
+    with stage("load", timings):
+        df, data_key = load_features(config, force="load" in forced)
+
+    with stage("split", timings):
+        X = df.drop(config["target"], axis=1)
+        y = df[config["target"]]
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=config["test_size"], random_state=config["random_state"]
+        )
+        print(f"  training samples: {X_train.shape[0]:,}, test samples: {X_test.shape[0]:,}")
+
+    with stage("select", timings):
+        selected, importances = select_features(X_train, y_train, config, data_key, force="select" in forced)
+        for feat in selected:
+            print(f"  {feat}: {importances[feat]:.4f}")
+
+    with stage("fit", timings):
+        model, scaler = fit_final(X_train, y_train, selected, config)
+
+    with stage("evaluate", timings):
+        metrics = evaluate(model, scaler, X_test, y_test, selected)
+        print(f"  RMSE: {metrics['rmse']:.2f}  R2: {metrics['r2']:.2f}")
+
+    with stage("save", timings):
+        version = save_artifacts(model, scaler, X_test, y_test, config)
+
+    print("\nStage timings: " + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items())
+          + f" (total {sum(timings.values()):.2f}s)")
+    return {"version": version, "selected": selected, "metrics": metrics, "timings": timings}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the savings Random Forest")
+    parser.add_argument("--config", help="JSON file overriding DEFAULT_CONFIG")
+    parser.add_argument("--data", dest="data_path", help="source CSV")
+    parser.add_argument("--n-jobs", type=int, help="cores for the forests (-1 = all)")
+    parser.add_argument("--version", help="registry version to publish (default: timestamp)")
+    parser.add_argument("--no-publish", dest="publish", action="store_const", const=False,
+                        help="write the model and scaler to the cache dir instead of the registry")
+    parser.add_argument("--force", choices=STAGES, help="recompute from this stage, ignoring caches")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config, {
+        "data_path": args.data_path,
+        "n_jobs": args.n_jobs,
+        "version": args.version,
+        "publish": args.publish,
+    })
+    train(config, args.force)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
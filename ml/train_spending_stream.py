@@ -0,0 +1,184 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.linear_model import SGDRegressor
+from sklearn.preprocessing import OneHotEncoder, PolynomialFeatures, StandardScaler
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ml.registry import registry
+
+# Out-of-core trainer for the spending model.
+#
+# The CSV is streamed in chunks and never held in memory whole:
+#
+#   scan   one pass collecting every category seen per categorical column and
+#          running mean/variance of the numeric features and target
+#   train  --epochs passes of SGDRegressor.partial_fit on sparse chunks: the
+#          one-hot block stays a CSR matrix, numeric features are scaled and
+#          expanded with their pairwise products
+#   eval   streaming RMSE / R2 over the held-out rows (every --test-every'th row)
+#
+# Memory is bounded by --chunksize, not the file size; peak RSS and rows/sec
+# are reported per pass. The artifact keeps the (model, encoder, num_cols)
+# format spending_pre.py expects, so it drops in as spending_model.
+#
+#   python ml/train_spending_stream.py data/external/customer_data.csv --epochs 5
+#   python ml/train_spending_stream.py transactions.csv --chunksize 500000 --no-publish
+
+CAT_COLS = ["gender", "education", "country"]
+NUM_COLS = ["age", "income", "purchase_frequency"]
+TARGET = "spending"
+DEFAULT_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "data", "external", "customer_data.csv")
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB elsewhere
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 1024 / 1024
+        except ImportError:
+            return None
+
+
+class StreamingSpendingModel:
+    # Wraps the fitted SGD regressor so predict() takes the same input as the
+    # forest it replaces: one-hot columns followed by the raw NUM_COLS values
+    def __init__(self, n_cat, poly, scaler, regressor, y_mean, y_std):
+        self.n_cat = n_cat
+        self.poly = poly
+        self.scaler = scaler
+        self.regressor = regressor
+        self.y_mean = y_mean
+        self.y_std = y_std
+
+    def features(self, X_cat, X_num):
+        num = self.scaler.transform(self.poly.transform(np.asarray(X_num, dtype=np.float64)))
+        return sp.hstack([sp.csr_matrix(X_cat), sp.csr_matrix(num)], format="csr")
+
+    def partial_fit(self, X_cat, X_num, y):
+        self.regressor.partial_fit(self.features(X_cat, X_num), (np.asarray(y) - self.y_mean) / self.y_std)
+
+    def predict(self, X):
+        X = X.tocsr() if sp.issparse(X) else np.asarray(X)
+        X_num = X[:, self.n_cat:]
+        X_num = X_num.toarray() if sp.issparse(X_num) else X_num
+        return self.regressor.predict(self.features(X[:, :self.n_cat], X_num)) * self.y_std + self.y_mean
+
+
+def iter_chunks(path, chunksize, test_every):
+    # Yields (chunk, is_test mask); every test_every'th row of the file is held out
+    offset = 0
+    for chunk in pd.read_csv(path, usecols=CAT_COLS + NUM_COLS + [TARGET], chunksize=chunksize):
+        index = np.arange(offset, offset + len(chunk))
+        offset += len(chunk)
+        chunk[CAT_COLS] = chunk[CAT_COLS].astype(str)
+        yield chunk, index % test_every == 0
+
+
+def _report(name, rows, started):
+    elapsed = time.perf_counter() - started
+    rss = peak_rss_mb()
+    rss_text = f", peak RSS {rss:,.0f} MB" if rss is not None else ""
+    print(f"[{name}] {rows:,} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s{rss_text})", flush=True)
+
+
+def scan(path, chunksize, test_every):
+    categories = {col: set() for col in CAT_COLS}
+    poly = PolynomialFeatures(degree=2, include_bias=False).fit(np.zeros((1, len(NUM_COLS))))
+    scaler = StandardScaler()
+    y_sum = y_sq = 0.0
+    n_train = 0
+    rows = 0
+    started = time.perf_counter()
+    for chunk, is_test in iter_chunks(path, chunksize, test_every):
+        for col in CAT_COLS:
+            categories[col].update(chunk[col].unique())
+        train = chunk[~is_test]
+        if len(train):
+            scaler.partial_fit(poly.transform(train[NUM_COLS].to_numpy(dtype=np.float64)))
+            y = train[TARGET].to_numpy(dtype=np.float64)
+            y_sum += y.sum()
+            y_sq += (y ** 2).sum()
+            n_train += len(train)
+        rows += len(chunk)
+    _report("scan", rows, started)
+
+    encoder = OneHotEncoder(categories=[sorted(categories[c]) for c in CAT_COLS],
+                            handle_unknown="ignore", sparse_output=True)
+    encoder.fit(pd.DataFrame({c: [sorted(categories[c])[0]] for c in CAT_COLS}))
+    y_mean = y_sum / n_train
+    y_std = np.sqrt(max(y_sq / n_train - y_mean ** 2, 1e-12))
+    n_cat = sum(len(c) for c in encoder.categories_)
+    print(f"  {n_train:,} training rows, {n_cat} one-hot columns")
+    return encoder, poly, scaler, y_mean, y_std
+
+
+def train(path, chunksize=100_000, epochs=5, test_every=5, alpha=1e-5, seed=42):
+    encoder, poly, scaler, y_mean, y_std = scan(path, chunksize, test_every)
+    n_cat = sum(len(c) for c in encoder.categories_)
+    regressor = SGDRegressor(alpha=alpha, learning_rate="invscaling", eta0=0.01, random_state=seed)
+    model = StreamingSpendingModel(n_cat, poly, scaler, regressor, y_mean, y_std)
+
+    for epoch in range(epochs):
+        rows = 0
+        started = time.perf_counter()
+        for chunk, is_test in iter_chunks(path, chunksize, test_every):
+            train_rows = chunk[~is_test]
+            if len(train_rows):
+                model.partial_fit(encoder.transform(train_rows[CAT_COLS]), train_rows[NUM_COLS], train_rows[TARGET])
+                rows += len(train_rows)
+        _report(f"epoch {epoch + 1}/{epochs}", rows, started)
+
+    # Streaming metrics over the held-out rows
+    n = 0
+    sse = y_sum = y_sq = 0.0
+    started = time.perf_counter()
+    for chunk, is_test in iter_chunks(path, chunksize, test_every):
+        test = chunk[is_test]
+        if not len(test):
+            continue
+        y = test[TARGET].to_numpy(dtype=np.float64)
+        X = sp.hstack([encoder.transform(test[CAT_COLS]), sp.csr_matrix(test[NUM_COLS].to_numpy(dtype=np.float64))])
+        sse += ((model.predict(X) - y) ** 2).sum()
+        y_sum += y.sum()
+        y_sq += (y ** 2).sum()
+        n += len(y)
+    _report("eval", n, started)
+    metrics = {"rmse": np.sqrt(sse / n), "r2": 1 - sse / (y_sq - y_sum ** 2 / n)} if n else {}
+    if metrics:
+        print(f"  RMSE: {metrics['rmse']:.2f}  R2: {metrics['r2']:.3f}")
+    return (model, encoder, NUM_COLS), metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream-train the spending model from a CSV")
+    parser.add_argument("data", nargs="?", default=DEFAULT_DATA)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--test-every", type=int, default=5, help="hold out every n-th row")
+    parser.add_argument("--alpha", type=float, default=1e-5, help="L2 regularisation")
+    parser.add_argument("--version", help="registry version to publish (default: timestamp)")
+    parser.add_argument("--no-publish", action="store_true", help="train and evaluate only")
+    args = parser.parse_args(argv)
+
+    artifact, _ = train(args.data, args.chunksize, args.epochs, args.test_every, args.alpha)
+    if not args.no_publish:
+        version = registry.publish("spending_model", artifact, args.version)
+        print(f"Published spending_model {version}")
+
+
+if __name__ == "__main__":
+    # Run through the importable module so the pickled model refers to
+    # ml.train_spending_stream.StreamingSpendingModel
+    from ml.train_spending_stream import main as module_main
+    sys.exit(module_main())
@@ -0,0 +1,221 @@
+import os
+import sys
+import time
+import argparse
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score, root_mean_squared_error
+from sklearn.model_selection import KFold, ParameterSampler, train_test_split
+from sklearn.preprocessing import OneHotEncoder
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_store
+from ml import train2
+from ml.flat_forest import FlatForest
+
+# Hyperparameter search for the savings and spending forests.
+#
+# Candidates (n_estimators, max_depth, min_samples_leaf) are sampled at random
+# and every (candidate, fold) pair runs as its own task in a process pool.
+# The training matrix is dumped once to an uncompressed joblib file and each
+# worker opens it with mmap_mode="r", so only the file path is pickled to the
+# workers and they all share one copy through the OS page cache.
+#
+# With --halving, candidates are first scored on a small row sample and only
+# the best 1/eta go on to a sample eta times larger (successive halving).
+#
+# Each candidate's CV score, fit time, model size and inference latency
+# (single row through sklearn and the flat forest, and per 1k rows in batch)
+# is printed and logged to data/cache/tune/<model>-<timestamp>.csv, and the
+# smallest forest within --tolerance of the best R2 is recommended.
+#
+#   python ml/tune.py savings --candidates 30 --halving
+#   python ml/tune.py spending --folds 5
+
+TUNE_DIR = os.path.join(train2.ROOT, "data", "cache", "tune")
+SPENDING_DATA = os.path.join(train2.ROOT, "data", "external", "customer_data.csv")
+
+PARAM_SPACE = {
+    "n_estimators": [25, 50, 100, 200, 300],
+    "max_depth": [None, 8, 12, 16, 24],
+    "min_samples_leaf": [1, 2, 5, 10, 20],
+}
+
+
+# ---------- Training matrices ----------
+
+def savings_matrix():
+    # train2's training split restricted to features selected on that split
+    # only, so neither the selection nor the search sees its test rows. The
+    # selection is checkpointed under TUNE_DIR, never over train2's own.
+    config = train2.load_config()
+    df, data_key = train2.load_features(config)
+    X = df.drop(config["target"], axis=1)
+    y = df[config["target"]]
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=config["test_size"],
+                                              random_state=config["random_state"])
+    selection_dir = os.path.join(TUNE_DIR, "selection")
+    os.makedirs(selection_dir, exist_ok=True)
+    selected, _ = train2.select_features(X_train, y_train, dict(config, cache_dir=selection_dir), data_key)
+    return X_train[selected].to_numpy(dtype=np.float64), y_train.to_numpy(dtype=np.float64)
+
+
+def spending_matrix():
+    cat_cols = ["gender", "education", "country"]
+    num_cols = ["age", "income", "purchase_frequency"]
+    df = data_store.read_frame(SPENDING_DATA, cat_cols + num_cols + ["spending"])
+    encoder = OneHotEncoder(handle_unknown="ignore", sparse_output=False)
+    X = np.hstack([encoder.fit_transform(df[cat_cols]), df[num_cols].to_numpy(dtype=np.float64)])
+    return X, df["spending"].to_numpy(dtype=np.float64)
+
+
+MATRICES = {"savings": savings_matrix, "spending": spending_matrix}
+
+
+def share_matrix(X, y, path, seed=0):
+    # Rows are shuffled once here so any prefix is a random sample, which the
+    # halving rounds use as their training subset
+    order = np.random.default_rng(seed).permutation(len(y))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump((np.ascontiguousarray(X[order]), np.ascontiguousarray(y[order])), path)
+    return path
+
+
+# ---------- Workers ----------
+
+def _latency_ms(fn, repeat=7):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1e3
+
+
+def evaluate_fold(matrix_path, n_rows, folds, fold, params, seed):
+    X, y = joblib.load(matrix_path, mmap_mode="r")
+    X, y = X[:n_rows], y[:n_rows]
+    train_idx, val_idx = list(KFold(folds, shuffle=True, random_state=seed).split(X))[fold]
+
+    model = RandomForestRegressor(random_state=seed, n_jobs=1, **params)
+    start = time.perf_counter()
+    model.fit(X[train_idx], y[train_idx])
+    fit_s = time.perf_counter() - start
+
+    X_val = np.asarray(X[val_idx])
+    start = time.perf_counter()
+    y_pred = model.predict(X_val)
+    batch_ms_per_1k = (time.perf_counter() - start) * 1e3 / len(val_idx) * 1000
+
+    row = X_val[:1]
+    flat = FlatForest.from_sklearn(model)
+    return {
+        "r2": r2_score(y[val_idx], y_pred),
+        "rmse": root_mean_squared_error(y[val_idx], y_pred),
+        "fit_s": fit_s,
+        "batch_ms_per_1k": batch_ms_per_1k,
+        "single_ms": _latency_ms(lambda: model.predict(row)),
+        "flat_single_ms": _latency_ms(lambda: flat.predict(row)),
+        "nodes": int(sum(e.tree_.node_count for e in model.estimators_)),
+    }
+
+
+# ---------- Search ----------
+
+def run_round(matrix_path, candidates, n_rows, folds, seed, n_jobs):
+    tasks = [(c, f) for c in range(len(candidates)) for f in range(folds)]
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(evaluate_fold)(matrix_path, n_rows, folds, f, candidates[c], seed) for c, f in tasks
+    )
+    rows = []
+    for c, params in enumerate(candidates):
+        fold_results = pd.DataFrame(results[c * folds:(c + 1) * folds])
+        row = dict(params)
+        row.update(fold_results.mean().to_dict())
+        row["r2_std"] = fold_results["r2"].std(ddof=0)
+        row["nodes"] = int(row["nodes"])
+        row["rows"] = n_rows
+        rows.append(row)
+    return pd.DataFrame(rows).sort_values("r2", ascending=False, ignore_index=True)
+
+
+def search(X, y, name, n_candidates=20, folds=3, halving=False, eta=3, min_rows=None,
+           seed=42, n_jobs=-1, log=print):
+    matrix_path = share_matrix(X, y, os.path.join(TUNE_DIR, f"{name}-matrix.joblib"), seed)
+    candidates = list(ParameterSampler(PARAM_SPACE, n_candidates, random_state=seed))
+    n_total = len(y)
+
+    rounds = []
+    if halving:
+        n_rows = max(min_rows or n_total // eta ** 2, folds * 10)
+        while True:
+            n_rows = min(n_rows, n_total)
+            log(f"Round {len(rounds) + 1}: {len(candidates)} candidates on {n_rows:,} rows")
+            result = run_round(matrix_path, candidates, n_rows, folds, seed, n_jobs)
+            rounds.append(result)
+            if n_rows >= n_total or len(candidates) <= 1:
+                break
+            keep = max(len(candidates) // eta, 1)
+            candidates = [{k: _param(r[k]) for k in PARAM_SPACE} for _, r in result.head(keep).iterrows()]
+            n_rows *= eta
+    else:
+        log(f"{len(candidates)} candidates x {folds} folds on {n_total:,} rows")
+        rounds.append(run_round(matrix_path, candidates, n_total, folds, seed, n_jobs))
+
+    os.remove(matrix_path)
+    return rounds[-1], pd.concat(rounds, ignore_index=True)
+
+
+def _param(value):
+    # Values come back from the DataFrame as floats/NaN
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return int(value)
+
+
+def recommend(result, tolerance=0.005):
+    # Cheapest forest to serve whose R2 is within `tolerance` of the best
+    close = result[result["r2"] >= result["r2"].max() - tolerance]
+    return close.sort_values(["flat_single_ms", "nodes"]).iloc[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Random / successive-halving search for the forests")
+    parser.add_argument("model", choices=sorted(MATRICES))
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--folds", type=int, default=3)
+    parser.add_argument("--halving", action="store_true", help="successive halving over row samples")
+    parser.add_argument("--eta", type=int, default=3, help="halving factor")
+    parser.add_argument("--min-rows", type=int, help="rows in the first halving round")
+    parser.add_argument("--tolerance", type=float, default=0.005, help="R2 slack for the recommendation")
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    X, y = MATRICES[args.model]()
+    final, log_df = search(X, y, args.model, args.candidates, args.folds, args.halving, args.eta,
+                           args.min_rows, args.seed, args.n_jobs)
+
+    columns = list(PARAM_SPACE) + ["r2", "r2_std", "rmse", "fit_s", "single_ms", "flat_single_ms",
+                                   "batch_ms_per_1k", "nodes"]
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(final[columns].round(4).to_string(index=False))
+
+    os.makedirs(TUNE_DIR, exist_ok=True)
+    log_path = os.path.join(TUNE_DIR, f"{args.model}-{time.strftime('%Y%m%d-%H%M%S')}.csv")
+    log_df.to_csv(log_path, index=False)
+    print(f"\nLogged {len(log_df)} evaluations to {log_path}")
+
+    best = recommend(final, args.tolerance)
+    params = {k: _param(best[k]) for k in PARAM_SPACE}
+    print(f"Recommended (R2 {best['r2']:.4f}, flat single-row {best['flat_single_ms']:.3f} ms): {params}")
+    if args.model == "savings":
+        print(f'train2 config: {{"final_forest": {params}}}'.replace("None", "null").replace("'", '"'))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,8 @@
 import streamlit as st
 from supabase_client import supabase
+import metrics
+
+metrics.page_start("auth")
 
 def login():
     st.subheader("🔐 Login")
@@ -39,3 +42,4 @@ def signup():
 
 auth_mode = st.radio("Choose an option", ["Login", "Sign Up"])
 login() if auth_mode == "Login" else signup()
+metrics.page_end()
@@ -1,100 +1,41 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
-from supabase_client import supabase
 from auth_helpers import require_auth, get_current_user
-import json
-
+from data_access import (
+    fetch_income,
+    fetch_budget,
+    fetch_expense_page,
+    fetch_category_totals,
+    data_version,
+    get_current_month,
+    HISTORY_PAGE_SIZE,
+)
+import bulk_import
+import write_queue
+import metrics
+
+metrics.page_start("expenses")
 require_auth()
 user = get_current_user()
 user_id = user["id"]
 
 st.title("🧾 Expense Tracker & Monthly Savings")
 
-# ---------- Helpers (existing ones here) ----------
-
-def get_current_month():
-    return datetime.now().strftime("%Y-%m")
-
-def get_month_range():
-    now = datetime.now()
-    start = now.replace(day=1)
-    end = (start + relativedelta(months=1)) - relativedelta(days=1)
-    return start.isoformat(), end.isoformat()
-
-# ... (other existing helpers like fetch_income(), fetch_budget(), fetch_expenses(), insert_expense(), update_monthly_savings(), calculate_remaining())
-
-# ---------- Main Logic (existing code) ----------
-def fetch_income():
-    resp = supabase.table("user_incomes").select("amount").eq("user_id", user_id).limit(1).execute()
-    return float(resp.data[0]["amount"]) if resp.data else 0.0
-
-def fetch_budget():
-    resp = supabase.table("user_budgets").select("budget_json").eq("user_id", user_id).limit(1).execute()
-    if not resp.data:
-        return {}
-    try:
-        return json.loads(resp.data[0]["budget_json"])
-    except:
-        return {}
-
-def fetch_expenses(month_only=True):
-    query = supabase.table("expenses").select("*").eq("user_id", user_id)
-    if month_only:
-        start, end = get_month_range()
-        query = query.gte("created_at", start).lte("created_at", end)
-    resp = query.order("created_at", desc=True).execute()
-    return resp.data if resp.data else []
-
-def insert_expense(category, amount, note):
-    supabase.table("expenses").insert({
-        "user_id": user_id,
-        "category": category,
-        "amount": amount,
-        "note": note,
-    }).execute()
-
-def update_monthly_savings():
-    expenses = fetch_expenses()
-    total_spent = sum(e["amount"] for e in expenses)
-    income = fetch_income()
-    savings = income - total_spent
-    if income == 0:
-        return
-
-    current_month = get_current_month()
-    entry = {
-        "user_id": user_id,
-        "month": current_month,
-        "amount": round(savings, 2),
-        "recorded_on": datetime.now().date().isoformat()
-    }
-
-    existing = supabase.table("monthly_savings") \
-        .select("*") \
-        .eq("user_id", user_id) \
-        .eq("month", current_month) \
-        .limit(1) \
-        .execute()
-
-    if existing.data:
-        supabase.table("monthly_savings").update(entry).eq("id", existing.data[0]["id"]).execute()
-    else:
-        supabase.table("monthly_savings").insert(entry).execute()
+# ---------- Helpers ----------
+# Queries and writes live in data_access.py, which caches reads per user/month.
 
-def calculate_remaining(budget, income, expenses_df, category):
+def calculate_remaining(budget, income, category_totals, category):
     if category not in budget or income <= 0:
         return 0.0, 0.0
     allocated = (budget[category] / 100.0) * income
-    used = expenses_df[expenses_df["category"] == category]["amount"].sum() if not expenses_df.empty else 0.0
+    used = category_totals.get(category, 0.0)
     remaining = allocated - used
     return allocated, remaining
 
 
 
-income = fetch_income()
-budget = fetch_budget()
+income = fetch_income(user_id)
+budget = fetch_budget(user_id)
 
 
 if not budget or income <= 0:
@@ -103,12 +44,44 @@ if not budget or income <= 0:
         st.switch_page("pages/income_budget.py")
     st.stop()
 
-expenses = fetch_expenses()
-
-df = pd.DataFrame(expenses) if expenses else pd.DataFrame(columns=["category", "amount", "note", "created_at"])
-
-# Update monthly savings based on current expenses and income
-update_monthly_savings()
+# New expenses go to the local write queue and are saved in the background;
+# until then they are shown from the queue and counted against the budget.
+# Rows the database refused are listed separately and not counted.
+queue = write_queue.get_queue()
+pending = queue.pending(user_id)
+failed = queue.failed(user_id)
+
+category_totals = bulk_import.add_pending(fetch_category_totals(user_id), pending, get_current_month())
+
+
+def sync_status():
+    stats = queue.stats(user_id)
+    if stats["depth"] < len(pending) or stats["failed"] != len(failed):
+        st.rerun()  # rows shown as pending were saved or failed since: redraw the page
+    if stats["depth"]:
+        line = f"⏳ {stats['depth']} expense(s) waiting to sync · oldest {stats['oldest_age']:.0f}s"
+        if stats["pending_error"]:
+            line += f" · retry {stats['attempts']}: {stats['pending_error'][:120]}"
+        st.caption(line)
+    elif stats["last_lag"] is not None:
+        st.caption(f"✅ All expenses synced · last write took {stats['last_lag']:.1f}s, "
+                   f"{stats['last_flush_age']:.0f}s ago")
+
+
+# Polls only while something is queued
+st.fragment(sync_status, run_every=2 if pending else None)()
+
+if failed:
+    with st.expander(f"🚫 {len(failed)} expense(s) could not be saved", expanded=True):
+        st.dataframe(pd.DataFrame(failed)[["created_at", "category", "amount", "note", "error"]],
+                     hide_index=True, use_container_width=True)
+        col1, col2 = st.columns(2)
+        if col1.button("Retry failed"):
+            queue.retry_failed(user_id)
+            st.rerun()
+        if col2.button("Discard failed"):
+            queue.discard_failed(user_id)
+            st.rerun()
 
 # ---------- Add New Expense ----------
 
@@ -117,26 +90,138 @@ with st.expander("➕ Add New Expense"):
     amount = st.number_input("Amount", min_value=0.01, step=0.01)
     note = st.text_area("Note (optional)")
 
-    allocated, remaining = calculate_remaining(budget, income, df, category)
+    allocated, remaining = calculate_remaining(budget, income, category_totals, category)
     st.info(f"💡 Remaining budget for '{category}': ₹{remaining:.2f} out of ₹{allocated:.2f} ({budget[category]}%)")
 
     if st.button("Add Expense"):
         if amount > remaining:
             st.error("🚫 This expense exceeds your budget allocation for this category!")
         else:
-            insert_expense(category, amount, note)
+            # Acknowledged as soon as it is on local disk; savings are
+            # recomputed by the queue once the batch is saved
+            queue.enqueue_expense(user_id, category, amount, note)
             st.success(f"✅ Added ₹{amount:.2f} to {category}.")
             st.rerun()
 
-# ---------- Display Expenses ----------
-
-st.subheader(f"📜 Expenses for {get_current_month()}")
-
-if not df.empty:
-    df["created_at"] = pd.to_datetime(df["created_at"], infer_datetime_format=True, errors='coerce')
-    df.rename(columns={"created_at": "date"}, inplace=True)
-    st.dataframe(df[["category", "amount", "note", "date"]].sort_values("date", ascending=False))
+# ---------- Import Bank Statement ----------
+# Parsed, categorized and checked against the budget up front; rows are then
+# written in batches and savings are recomputed once at the end.
+
+with st.expander("📥 Import Bank Statement (CSV)"):
+    last_import = st.session_state.pop("import_result", None)
+    if last_import:
+        st.success(f"✅ Imported {last_import.inserted} expenses.")
+        for failure in last_import.failures:
+            st.error(f"🚫 {len(failure.rows)} rows not saved (lines {failure.rows[0]}–{failure.rows[-1]}): {failure.error}")
+
+    uploaded = st.file_uploader("Statement CSV", type=["csv"])
+    col1, col2 = st.columns(2)
+    unmatched = col1.selectbox("Rows matching no category", ["Skip"] + [c for c in budget if c != "Savings"])
+    batch_size = col2.number_input("Rows per insert", min_value=10, max_value=1000, value=bulk_import.BATCH_SIZE, step=10)
+    rules_text = st.text_area("Extra rules, one `keyword = Category` per line (checked first)")
+    include_over = st.checkbox("Also import rows that go over budget")
+
+    if uploaded is not None:
+        # Lines of this file saved by earlier imports are left out, so after a
+        # partly failed import only the unsaved rows are offered again
+        imported = st.session_state.setdefault("imported_statements", {}).get(uploaded.file_id, set())
+        preview_key = (uploaded.file_id, unmatched, rules_text, len(imported),
+                       tuple(row["client_id"] for row in pending))
+        cached = st.session_state.get("statement_preview")
+        if cached is None or cached[0] != preview_key:
+            try:
+                uploaded.seek(0)
+                preview = bulk_import.prepare(uploaded, user_id, income,
+                                              None if unmatched == "Skip" else unmatched,
+                                              bulk_import.parse_rules(rules_text),
+                                              pending=pending, skip_rows=imported)
+            except (ValueError, pd.errors.ParserError) as e:
+                preview = None
+                st.error(f"🚫 Could not read this statement: {e}")
+            st.session_state["statement_preview"] = (preview_key, preview)
+        preview = st.session_state["statement_preview"][1]
+
+        if preview is not None:
+            counts = preview["status"].value_counts()
+            st.write(" · ".join(f"**{counts.get(s, 0)}** {s.replace('_', ' ')}" for s in bulk_import.STATUSES))
+            st.dataframe(preview[["row", "date", "description", "amount", "category", "status", "remaining"]],
+                         height=300, hide_index=True)
+            importable = preview[preview["status"].isin(["ok", "over_budget"] if include_over else ["ok"])]
+            if imported:
+                st.info(f"{len(imported)} rows of this file are already imported and not shown.")
+            if st.button(f"Import {len(importable)} expenses", disabled=importable.empty):
+                progress = st.progress(0.0)
+                result = bulk_import.import_rows(user_id, importable, income, int(batch_size), progress.progress)
+                st.session_state["imported_statements"][uploaded.file_id] = imported | result.saved_lines(importable)
+                st.session_state["import_result"] = result
+                st.session_state.pop("statement_preview", None)
+                st.rerun()
+
+# ---------- Expense History ----------
+# Pages of HISTORY_PAGE_SIZE rows are fetched newest first by keyset on
+# (created_at, id) and kept in the session, so moving between loaded pages
+# costs no query. Only the current page is turned into a table, and at most
+# MAX_CACHED_PAGES pages are held; evicted ones are fetched again from their
+# cursor. Any write to the user's expenses resets the cache.
+
+MAX_CACHED_PAGES = 10
+
+
+def history_state():
+    version = data_version(user_id, "expenses")
+    state = st.session_state.get("expense_history")
+    if state is None or state["user_id"] != user_id or state["version"] != version:
+        # cursors[i] is the cursor page i starts after; None past the last page
+        state = {"user_id": user_id, "version": version, "cursors": [None], "pages": {}, "last": None, "page": 0}
+        st.session_state["expense_history"] = state
+    return state
+
+
+def history_page(state, index):
+    pages = state["pages"]
+    if index not in pages:
+        rows, cursor = fetch_expense_page(user_id, state["cursors"][index])
+        if cursor is None:
+            state["last"] = index
+        elif len(state["cursors"]) == index + 1:
+            state["cursors"].append(cursor)
+        pages[index] = rows
+        while len(pages) > MAX_CACHED_PAGES:
+            pages.pop(next(k for k in pages if k != index))
+    else:
+        pages[index] = pages.pop(index)  # most recently used last
+    return pages[index]
+
+
+def move_history(step):
+    state = st.session_state["expense_history"]
+    state["page"] = max(0, state["page"] + step)
+
+
+st.subheader("📜 Expense History")
+
+history = history_state()
+saved = history_page(history, history["page"])
+rows = saved
+if history["page"] == 0 and pending:
+    rows = [{**row, "status": "⏳ syncing"} for row in pending] + [{**row, "status": "saved"} for row in saved]
+if rows:
+    columns = ["category", "amount", "note", "created_at"] + (["status"] if "status" in rows[0] else [])
+    page_df = pd.DataFrame(rows, columns=columns)
+    page_df["created_at"] = pd.to_datetime(page_df["created_at"], format="ISO8601", errors="coerce")
+    page_df.rename(columns={"created_at": "date"}, inplace=True)
+    st.dataframe(page_df, hide_index=True, use_container_width=True)
+
+    # The range counts saved expenses only; queued ones are listed separately
+    first = history["page"] * HISTORY_PAGE_SIZE + 1
+    shown = [f"expenses {first}–{first + len(saved) - 1}"] if saved else []
+    if len(rows) > len(saved):
+        shown.append(f"{len(rows) - len(saved)} syncing")
+    col1, col2, col3 = st.columns([1, 2, 1])
+    col1.button("◀ Newer", on_click=move_history, args=(-1,), disabled=history["page"] == 0)
+    col2.caption(" · ".join([f"Page {history['page'] + 1}"] + shown))
+    col3.button("Older ▶", on_click=move_history, args=(1,), disabled=history["last"] == history["page"])
 else:
-    st.info("No expenses found for this month.")
-
+    st.info("No expenses recorded yet.")
 
+metrics.page_end()
@@ -1,7 +1,11 @@
 import streamlit as st
 from supabase_client import supabase
 from auth_helpers import require_auth, get_current_user
+from data_access import fetch_total_savings, fetch_year_savings, invalidate
 from datetime import datetime
+import metrics
+
+metrics.page_start("profile")
 
 def get_user_profile(user_id):
     try:
@@ -16,13 +20,9 @@ def get_user_profile(user_id):
         return None
 
 def update_total_savings(user_id):
-    response = supabase.table("monthly_savings").select("amount").eq("user_id", user_id).execute()
-    if not response.data:
-        total = 0
-    else:
-        total = sum(item["amount"] for item in response.data)
-
+    total = fetch_total_savings(user_id)
     supabase.table("user_profile").update({"total_savings": total}).eq("user_id", user_id).execute()
+    invalidate(user_id, "user_profile")
     return total
 
 def create_user_profile(user_id):
@@ -35,6 +35,7 @@ def create_user_profile(user_id):
         "savings_goal_per_year": 0
     }
     res = supabase.table("user_profile").insert(default_profile).execute()
+    invalidate(user_id, "user_profile")
     data = res.data
     if data and len(data) > 0:
         return data[0]
@@ -49,6 +50,7 @@ def update_user_profile(user_id, name, age, country, savings_goal_per_year):
         "savings_goal_per_year": savings_goal_per_year,
         "total_savings": update_total_savings(user_id)
     }).eq("user_id", user_id).execute()
+    invalidate(user_id, "user_profile")
 
     data = res.data
     if data and len(data) > 0:
@@ -58,17 +60,7 @@ def update_user_profile(user_id, name, age, country, savings_goal_per_year):
 
 def get_current_year_savings_progress(user_id):
     current_year = datetime.now().year
-    response = supabase.table("monthly_savings").select("*").eq("user_id", user_id).execute()
-    if not response.data:
-        return 0, 0, 0
-
-    year_savings = 0
-    for entry in response.data:
-        timestamp = entry.get("created_at") or entry.get("date")
-        if timestamp:
-            entry_year = datetime.fromisoformat(timestamp[:10]).year
-            if entry_year == current_year:
-                year_savings += entry.get("amount", 0)
+    year_savings = fetch_year_savings(user_id, current_year)
 
     profile = get_user_profile(user_id)
     goal = profile.get("savings_goal_per_year", 0) if profile else 0
@@ -108,3 +100,4 @@ def main():
 
 if __name__ == "__main__":
     main()
+    metrics.page_end()
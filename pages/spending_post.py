@@ -1,34 +1,73 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import joblib
-import matplotlib.pyplot as plt
 import os
-from sklearn.metrics import r2_score
 st.set_page_config(page_title="Savings Predictor", layout="wide")
+import charts
+import metrics
+from bootstrap import lazy_import
+
+# Loaded on the rerun that first needs them, not on first paint
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+ml_registry = lazy_import("ml.registry")
+flat_forest = lazy_import("ml.flat_forest")
+data_store = lazy_import("data_store")
+exporter = lazy_import("exporter")
 # --- Load model and scaler ---
-@st.cache_resource
+# The registry loads each artifact once per process and swaps in new versions
 def load_model_scaler():
-    model_path = r"ml\model_rf_savings.pkl"
-    scaler_path = r"ml\scaler.pkl"
-    if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+    try:
+        return ml_registry.registry.get("savings_model"), ml_registry.registry.get("savings_scaler")
+    except (FileNotFoundError, KeyError):
         st.error("Model or Scaler file missing.")
         return None, None
-    return joblib.load(model_path), joblib.load(scaler_path)
+
+FEATURES = ["Income", "Desired_Savings_Percentage", "Disposable_Income"]
+TEST_DATA_PATH = os.path.join("data", "external", "processed", "test_data.csv")
+
+def model_version():
+    registry = ml_registry.registry
+    return f'{registry.version("savings_model")}:{registry.version("savings_scaler")}'
 
 # --- Load test data ---
+# Memory-mapped columnar copy of the CSV, reading only the columns used here
 def load_test_data():
     try:
-        df = pd.read_csv(r"data\external\processed\test_data.csv")
-        required_cols = {"Income", "Desired_Savings_Percentage", "Disposable_Income", "Desired_Savings"}
-        if required_cols.issubset(df.columns):
-            return df
-        else:
-            st.warning("Test data missing required columns.")
-            return None
+        return data_store.read_frame(TEST_DATA_PATH, FEATURES + ["Desired_Savings"])
+    except KeyError:
+        st.warning("Test data missing required columns.")
+        return None
     except FileNotFoundError:
         return None
 
+# --- Test-set predictions, computed once per model version ---
+@st.cache_resource
+def predict_test_set(version, data_version, _model, _scaler, _test_df):
+    # Rows sorted by income so a range filter is two binary searches; the
+    # arrays are shared read-only across reruns and sessions.
+    order = np.argsort(_test_df["Income"].to_numpy(), kind="stable")
+    X = _test_df[FEATURES].to_numpy(dtype=float)[order]
+    y = _test_df["Desired_Savings"].to_numpy(dtype=float)[order]
+    with metrics.track("savings_scaler.transform", rows=len(X)):
+        X_scaled = _scaler.transform(pd.DataFrame(X, columns=FEATURES))
+    with metrics.track("savings_model.predict", rows=len(X)):
+        y_pred = _model.predict(X_scaled)
+    arrays = {"X": X, "income": X[:, 0], "y": y, "y_pred": np.asarray(y_pred, dtype=float)}
+    for arr in arrays.values():
+        arr.setflags(write=False)
+    return arrays
+
+def income_range_slice(income_sorted, income_min, income_max):
+    lo = np.searchsorted(income_sorted, income_min, side="left")
+    hi = np.searchsorted(income_sorted, income_max, side="right")
+    return slice(lo, hi)
+
+def r2(y_true, y_pred):
+    if len(y_true) < 2:
+        return float("nan")
+    ss_res = np.sum((y_true - y_pred) ** 2)
+    ss_tot = np.sum((y_true - y_true.mean()) ** 2)
+    return 1 - ss_res / ss_tot if ss_tot else float("nan")
+
 # --- Classification of savings goal ---
 def classify_savings(savings_pct):
     if savings_pct < 10:
@@ -46,16 +85,16 @@ def monthly_forecast(current_saving):
     return months, forecast
 
 # --- Main App ---
-model, scaler = load_model_scaler()
-test_df = load_test_data()
 
+metrics.page_start("spending_post")
 
 st.title("💡 Personalized Savings Predictor")
 
-# Tabs for better UI
-tabs = st.tabs(["🔮 Predict", "📈 Forecast", "📊 Data & Export"])
+# Tabs for better UI; only the selected one runs
+tabs = ["🔮 Predict", "📈 Forecast", "📊 Data & Export"]
+section = charts.visible_section(tabs, "savings_section")
 
-with tabs[0]:  # Prediction tab
+if section == tabs[0]:  # Prediction tab
     st.subheader("Enter your financial details:")
     with st.form("predict_form"):
         income = st.number_input("Monthly Income (₹)", min_value=0.0, format="%.2f")
@@ -63,41 +102,43 @@ with tabs[0]:  # Prediction tab
         disposable_income = st.number_input("Disposable Income (₹)", min_value=0.0, format="%.2f")
         submitted = st.form_submit_button("Predict Savings")
 
-        if submitted and model and scaler:
-            input_df = pd.DataFrame([{
-                "Income": income,
-                "Desired_Savings_Percentage": savings_pct,
-                "Disposable_Income": disposable_income
-            }])
-            try:
-                input_scaled = scaler.transform(input_df)
-                prediction = model.predict(input_scaled)[0]
-                st.success(f"💰 Recommended Monthly Savings: ₹{prediction:,.2f}")
-
-                # Classification result
-                goal_class = classify_savings((prediction / income) * 100 if income > 0 else 0)
-                st.info(f"🏷️ Savings Goal Classification: **{goal_class}**")
-
-                # Save prediction in session state for forecast tab
-                st.session_state['latest_prediction'] = prediction
-
-            except Exception as e:
-                st.error(f"Prediction error: {e}")
-
-with tabs[1]:  # Forecast tab
+        if submitted:
+            model, scaler = load_model_scaler()
+            if model and scaler:
+                # Flattened forest for single-row predictions when one is published
+                predictor = flat_forest.load_predictor("savings_model")
+                input_df = pd.DataFrame([{
+                    "Income": income,
+                    "Desired_Savings_Percentage": savings_pct,
+                    "Disposable_Income": disposable_income
+                }])
+                try:
+                    with metrics.track("savings_scaler.transform", rows=1):
+                        input_scaled = scaler.transform(input_df)
+                    with metrics.track("savings_model.predict", rows=1):
+                        prediction = predictor.predict(input_scaled)[0]
+                    st.success(f"💰 Recommended Monthly Savings: ₹{prediction:,.2f}")
+
+                    # Classification result
+                    goal_class = classify_savings((prediction / income) * 100 if income > 0 else 0)
+                    st.info(f"🏷️ Savings Goal Classification: **{goal_class}**")
+
+                    # Save prediction in session state for forecast tab
+                    st.session_state['latest_prediction'] = prediction
+
+                except Exception as e:
+                    st.error(f"Prediction error: {e}")
+
+
+if section == tabs[1]:  # Forecast tab
     st.subheader("Monthly Savings Forecast (Next 6 Months)")
     if 'latest_prediction' in st.session_state:
         pred = st.session_state['latest_prediction']
         months, forecast_vals = monthly_forecast(pred)
 
-        fig, ax = plt.subplots()
-        ax.plot(months, forecast_vals, marker='o', linestyle='-', color='green')
-        ax.set_xlabel("Month")
-        ax.set_ylabel("Predicted Savings (₹)")
-        ax.set_title("6-Month Savings Forecast")
-        ax.grid(True)
-        ax.set_xticks(months)
-        st.pyplot(fig)
+        charts.mpl_chart("plot", months, forecast_vals, {"marker": "o", "linestyle": "-", "color": "green"},
+                         xlabel="Month", ylabel="Predicted Savings (₹)", title="6-Month Savings Forecast",
+                         grid=True, xticks=months)
 
         # Show forecast data as table
         forecast_df = pd.DataFrame({
@@ -108,7 +149,9 @@ with tabs[1]:  # Forecast tab
     else:
         st.warning("Please make a prediction first in the 'Predict' tab.")
 
-with tabs[2]:  # Data & Export tab
+if section == tabs[2]:  # Data & Export tab
+    model, scaler = load_model_scaler()
+    test_df = load_test_data()
     if test_df is not None and model and scaler:
         st.subheader("Prediction vs Actual Savings")
         # Filters
@@ -119,47 +162,67 @@ with tabs[2]:  # Data & Export tab
             (float(test_df["Income"].min()), float(test_df["Income"].max())),
             step=1000.0
         )
-        filtered_df = test_df[(test_df["Income"] >= income_min) & (test_df["Income"] <= income_max)]
-
-        X_test = filtered_df[["Income", "Desired_Savings_Percentage", "Disposable_Income"]]
-        y_test = filtered_df["Desired_Savings"]
-
         try:
-            X_scaled = scaler.transform(X_test)
-            y_pred = model.predict(X_scaled)
-
+            preds = predict_test_set(model_version(), os.path.getmtime(TEST_DATA_PATH), model, scaler, test_df)
+        except Exception as e:
+            st.error(f"Prediction error: {e}")
+            st.stop()
+        window = income_range_slice(preds["income"], income_min, income_max)
+        X_test = preds["X"][window]
+        y_test = preds["y"][window]
+        y_pred = preds["y_pred"][window]
+
+        if len(y_test):
             # Scatter plot
-            fig, ax = plt.subplots()
-            ax.scatter(y_test, y_pred, alpha=0.5, color='skyblue', edgecolors='k')
-            ax.plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], 'r--')
-            ax.set_xlabel("Actual Savings")
-            ax.set_ylabel("Predicted Savings")
-            ax.set_title("Prediction vs Actual Savings")
-            st.pyplot(fig)
+            charts.mpl_chart("scatter", y_test, y_pred, {"alpha": 0.5, "color": "skyblue", "edgecolors": "k"},
+                             xlabel="Actual Savings", ylabel="Predicted Savings",
+                             title="Prediction vs Actual Savings", identity_line=True)
 
             # R2 Score
-            r2 = r2_score(y_test, y_pred)
-            st.markdown(f"**R² Score:** {r2:.4f}")
-
-            # Export button
-            if st.button("Export Filtered Predictions to CSV"):
-                export_df = X_test.copy()
-                export_df["Actual_Savings"] = y_test
-                export_df["Predicted_Savings"] = y_pred
-                os.makedirs("exports", exist_ok=True)
-                export_path = r"data\exports\predicted_savings_filtered.csv"
-                export_df.to_csv(export_path, index=False)
-                
+            st.markdown(f"**R² Score:** {r2(y_test, y_pred):.4f}")
+
+            # Export: streamed in chunks from the filtered arrays to data/exports
+            export_columns = {name: X_test[:, i] for i, name in enumerate(FEATURES)}
+            export_columns["Actual_Savings"] = y_test
+            export_columns["Predicted_Savings"] = y_pred
+            export_format = st.radio("Export format", ["csv", "parquet"], horizontal=True)
+            created = False
+            if st.button("Export Filtered Predictions"):
+                try:
+                    export_path, size = exporter.export_columns(
+                        export_columns, exporter.unique_name("predicted_savings_filtered", export_format),
+                        export_format
+                    )
+                except OSError as e:
+                    st.error(f"Export failed: {e}")
+                else:
+                    previous = st.session_state.get("export")
+                    if previous and os.path.exists(previous["path"]):
+                        os.remove(previous["path"])  # one export file per session
+                    st.session_state["export"] = {"path": export_path, "rows": len(y_test), "size": size}
+                    created = True
+
+            last_export = st.session_state.get("export")
+            if last_export and os.path.exists(last_export["path"]):
+                st.caption(f"Exported {last_export['rows']:,} rows ({last_export['size']:,} bytes) "
+                           f"to {os.path.relpath(last_export['path'])}")
+                # The file is read for the download only on the run that wrote
+                # it; "ignore" keeps the click from rerunning and hiding it
+                if created:
+                    with open(last_export["path"], "rb") as f:
+                        st.download_button("Download export", f, file_name=os.path.basename(last_export["path"]),
+                                           mime=exporter.mime_type(last_export["path"]), on_click="ignore")
 
             # Show filtered dataframe
             st.subheader("Filtered Test Data with Predictions")
-            display_df = export_df.copy()
+            display_df = pd.DataFrame(X_test, columns=FEATURES)
+            display_df["Actual_Savings"] = y_test
             display_df["Predicted_Savings"] = y_pred.round(2)
-            st.dataframe(display_df.reset_index(drop=True), height=300)
-
-        except Exception as e:
-            pass
+            st.dataframe(display_df, height=300)
+        else:
+            st.info("No test rows in the selected income range.")
 
     else:
         st.warning("Test data not found or model/scaler not loaded.")
 
+metrics.page_end()
@@ -1,10 +1,15 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import pickle
-import matplotlib.pyplot as plt
+import charts
+import metrics
+from bootstrap import lazy_import
+
+# Only needed once the form is submitted
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+flat_forest = lazy_import("ml.flat_forest")
 
 st.set_page_config(page_title="Spending Predictor", layout="centered")
+metrics.page_start("spending_pre")
 
 st.title("🧠 Spending Prediction")
 st.write("Enter your details to get a personalized spending estimate and compare it to the average.")
@@ -23,9 +28,10 @@ with st.form("user_input"):
 # 🧠 Load Model and Predict
 if submit:
     try:
-        with open("ml/spending_model.pkl", "rb") as f:
-                model, encoder, num_cols = pickle.load(f)
-                cat_cols = ["gender", "education", "country"]
+        # Loaded once per process by the registry, not on every submit;
+        # the flattened forest when one has been exported
+        model, encoder, num_cols = flat_forest.load_predictor("spending_model")
+        cat_cols = ["gender", "education", "country"]
                 
         user_df = pd.DataFrame([{
             "gender": gender,
@@ -37,12 +43,16 @@ if submit:
         }])
 
         # Encode + Combine
-        X_cat = encoder.transform(user_df[cat_cols])
+        with metrics.track("spending_encoder.transform", rows=1):
+            X_cat = encoder.transform(user_df[cat_cols])
+        if hasattr(X_cat, "toarray"):  # sparse encoder from train_spending_stream.py
+            X_cat = X_cat.toarray()
         X_num = user_df[num_cols].values
         X_final = np.hstack([X_cat, X_num])
 
         # Predict
-        predicted_spending = model.predict(X_final)[0]
+        with metrics.track("spending_model.predict", rows=1):
+            predicted_spending = model.predict(X_final)[0]
         st.success(f"🎯 Predicted Monthly Spending: ₹{predicted_spending:.2f}")
 
         # 🎯 Goal-based recommendation
@@ -58,11 +68,10 @@ if submit:
             "Avg Public": income * 0.6  # Mock comparison (60% of income)
         }
 
-        fig, ax = plt.subplots()
-        ax.bar(avg_data.keys(), avg_data.values(), color=["blue", "gray"])
-        ax.set_ylabel("Monthly Spending (₹)")
-        ax.set_title("Your Spending vs Average")
-        st.pyplot(fig)
+        charts.mpl_chart("bar", list(avg_data.keys()), list(avg_data.values()), {"color": ["blue", "gray"]},
+                         ylabel="Monthly Spending (₹)", title="Your Spending vs Average")
         
     except Exception as e:
         st.error(f"Error: {e}")
+
+metrics.page_end()
@@ -1,33 +1,25 @@
 import streamlit as st
-import requests
-import json
-import os
-import re
-from dotenv import load_dotenv
-import plotly.graph_objs as go
 from auth_helpers import require_auth, get_current_user
-from pages.expenses import fetch_income, fetch_budget, fetch_expenses
-from supabase_client import supabase
+from data_access import fetch_page_data
+from bootstrap import lazy_import
+from json_stream import IncrementalObjectParser
+from forecast import forecast_retirement, DEFAULT_RETURN_RATE, DEFAULT_INFLATION
+import charts
+import metrics
+
+metrics.page_start("suggestions")
+
+# requests/sqlite are only needed once suggestions are requested
+llm_cache = lazy_import("llm_cache")
+llm_client = lazy_import("llm_client")
 
 
     
-load_dotenv()
-API_KEY = os.getenv("OPENROUTER_API_KEY")
-
-def get_user_profile(user_id):
-    try:
-        res = supabase.table("user_profile").select("*").eq("user_id", user_id).execute()
-        data = res.data
-        if data and len(data) > 0:
-            return data[0]
-        else:
-            return None
-    except Exception:
-        st.write("excetion no profile data")
-        return None
-
-def format_user_data_for_prompt(income, budget, expenses, profile):
-    from collections import defaultdict
+MODEL = "meta-llama/llama-4-maverick:free"
+# Keys the LLM still produces; the retirement numbers come from forecast.py
+SECTIONS = ["suggested_budget", "narrative"]
+
+def format_user_data_for_prompt(income, budget, category_totals, recent_expenses, profile):
     import datetime
 
     formatted = f"📊 User Monthly Income: ₹{income:.2f}\n\n"
@@ -36,16 +28,12 @@ def format_user_data_for_prompt(income, budget, expenses, profile):
         formatted += f"- {category}: {percent}%\n"
     formatted += "\n"
 
-    category_totals = defaultdict(float)
-    for expense in expenses:
-        category_totals[expense["category"]] += expense["amount"]
-
     formatted += "💸 Expenses This Month:\n"
     for cat, amt in category_totals.items():
         formatted += f"- {cat}: ₹{amt:.2f}\n"
 
     formatted += "\n🧾 Recent Expense Entries (up to 5 shown):\n"
-    for exp in expenses[:5]:
+    for exp in recent_expenses[:5]:
         date = datetime.datetime.fromisoformat(exp["created_at"]).strftime("%Y-%m-%d")
         formatted += f"- {exp['category']}: ₹{exp['amount']} on {date} | Note: {exp['note'] or 'N/A'}\n"
 
@@ -58,22 +46,21 @@ def format_user_data_for_prompt(income, budget, expenses, profile):
 
     return formatted
 
-def get_budget_suggestions(user_data):
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://your-site.streamlit.app",
-        "X-Title": "FinPilot Suggestions Page"
-    }
+def format_forecast_for_prompt(forecast):
+    formatted = "\n📈 Retirement Forecast (computed, do not recalculate):\n"
+    formatted += f"- Projected Savings at Retirement: ₹{forecast.balances[-1]:.2f}\n"
+    formatted += f"- Estimated Amount Needed: ₹{forecast.target:.2f}\n"
+    formatted += f"- Retirement Threat Level: {forecast.threat_level}\n"
+    formatted += f"- Current Annual Savings: ₹{forecast.annual_contribution:.2f}\n"
+    formatted += f"- Annual Savings Needed: ₹{forecast.required_contribution:.2f}\n"
+    return formatted
 
-    prompt = f"""
+def build_suggestions_prompt(user_data):
+    return f"""
 You are a financial AI. Based on the user's income, budget, expenses, and profile, return a JSON object with the following keys:
 
 1. "suggested_budget" (dictionary with category: percent allocation)
-2. "retirement_forecast" (list of [age, amount] points representing savings forecast until retirement)
-3. "retirement_threat_level" (a string describing the risk/threat to the user's retirement, e.g., 'Low', 'Moderate', 'High')
-4. "five_year_goal_plan" (list of objects with "year" and "target_savings" indicating annual savings goals for the next five years to reduce retirement threat)
+2. "narrative" (a short plain-text explanation of the suggested budget and of what the user should change to improve the retirement forecast given below; use the forecast figures as they are)
 
 User Data:
 {user_data}
@@ -81,73 +68,107 @@ User Data:
 Respond ONLY with valid JSON inside triple backticks like ```json ... ```
 """
 
-    payload = {
-        "model": "meta-llama/llama-4-maverick:free",
-        "messages": [{"role": "user", "content": prompt}]
-    }
+def stream_budget_suggestions(user_data):
+    # Yields (section, value) pairs as soon as each top-level key of the
+    # streamed JSON answer is complete. Cached answers are replayed at once.
+    prompt = build_suggestions_prompt(user_data)
+
+    def stream():
+        parser = IncrementalObjectParser()
+        for delta in llm_client.get_client().stream_chat([{"role": "user", "content": prompt}], MODEL):
+            yield from parser.feed(delta)
+        yield from parser.close()
+
+    return llm_cache.get_cache().get_or_stream(MODEL, prompt, stream)
 
-    try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
-        json_text = response.json()["choices"][0]["message"]["content"]
+def render_section(key, value):
+    if key == "suggested_budget":
+        st.subheader("📊 Suggested Budget Allocation")
+        budget_labels = list(value.keys())
+        budget_values = list(value.values())
+        charts.go_chart((("Pie", {"labels": budget_labels, "values": budget_values, "hole": 0.3}),))
+
+    elif key == "retirement_forecast":
+        st.subheader("📈 Retirement Savings Forecast")
+        ages = [pt[0] for pt in value]
+        amounts = [pt[1] for pt in value]
+        charts.go_chart((("Scatter", {"x": ages, "y": amounts, "mode": "lines+markers", "name": "Savings"}),),
+                        xaxis_title="Age", yaxis_title="₹ Savings", template="plotly_white")
+
+    elif key == "retirement_threat_level":
+        st.subheader("⚠️ Retirement Threat Level")
+        st.info(value or "No data available")
+
+    elif key == "five_year_goal_plan":
+        st.subheader("🎯 Five Year Savings Goal Plan")
+        for year_goal in value:
+            st.write(f"- Year {year_goal['year']}: Target Savings ₹{year_goal['target_savings']:.2f}")
 
-        cleaned = re.sub(r"```json|```", "", json_text).strip()
-        return json.loads(cleaned)
+    elif key == "narrative":
+        st.subheader("🗒️ Advisor Notes")
+        st.write(value)
 
-    except Exception as e:
-        return {"error": str(e)}
 def main():
     require_auth()
     user = get_current_user()
     user_id = user["id"]
     
-    # Try to fetch user profile (may return None)
-    profile = get_user_profile(user_id)
-
     st.title("🧠 AI-Powered Financial Suggestions")
 
     with st.spinner("Loading financial data..."):
-        income = fetch_income()
-        budget = fetch_budget()
-        expenses = fetch_expenses()
+        data = fetch_page_data(user_id, ["profile", "income", "latest_budget", "category_totals", "recent_expenses", "savings_history"])
+    for query, error in data.errors.items():
+        st.warning(f"⚠️ Could not load {query.replace('_', ' ')}: {error}")
+
+    profile = data.profile
+    income = data.income
+    budget = data.latest_budget
+    category_totals = data.category_totals
+    recent_expenses = data.recent_expenses
 
     if not profile:
         st.warning("⚠️ No profile found. Please complete your profile first in the 'Profile' page.")
         st.stop()
 
-    user_data = format_user_data_for_prompt(income, budget, expenses, profile)
+    # Retirement numbers are computed locally and shown right away
+    with st.expander("⚙️ Forecast Assumptions"):
+        return_rate = st.slider("Expected Annual Return (%)", 0.0, 15.0, DEFAULT_RETURN_RATE * 100, step=0.5) / 100
+        inflation = st.slider("Expected Inflation (%)", 0.0, 12.0, DEFAULT_INFLATION * 100, step=0.5) / 100
+    forecast = forecast_retirement(profile, income, data.savings_history, return_rate=return_rate, inflation=inflation)
+
+    user_data = format_user_data_for_prompt(income, budget, category_totals, recent_expenses, profile)
+    user_data += format_forecast_for_prompt(forecast)
     st.subheader("📄 Your Financial Summary")
     st.code(user_data, language="markdown")
 
-    if st.button("💡 Generate Smart Suggestions"):
-        with st.spinner("Thinking..."):
-            result = get_budget_suggestions(user_data)
+    render_section("retirement_forecast", forecast.retirement_forecast)
+    render_section(
+        "retirement_threat_level",
+        f"{forecast.threat_level} — projected savings cover {forecast.funded_ratio:.0%} "
+        f"of the estimated ₹{forecast.target:,.0f} needed at retirement."
+    )
+    render_section("five_year_goal_plan", forecast.five_year_goal_plan)
 
-        if "error" in result:
-            st.error(f"❌ Error fetching suggestions: {result['error']}")
+    if st.button("💡 Generate Smart Suggestions"):
+        # One placeholder per section, in display order, so each chart appears
+        # in place as soon as its part of the answer has streamed in
+        sections = {key: st.container() for key in SECTIONS}
+        received = set()
+        try:
+            with st.spinner("Thinking..."):
+                for key, value in stream_budget_suggestions(user_data):
+                    if key in sections:
+                        with sections[key]:
+                            render_section(key, value)
+                        received.add(key)
+        except Exception as e:
+            st.error(f"❌ Error fetching suggestions: {e}")
             return
 
-        st.subheader("📊 Suggested Budget Allocation")
-        budget_labels = list(result["suggested_budget"].keys())
-        budget_values = list(result["suggested_budget"].values())
-        pie = go.Figure(data=[go.Pie(labels=budget_labels, values=budget_values, hole=0.3)])
-        st.plotly_chart(pie, use_container_width=True)
-
-        st.subheader("📈 Retirement Savings Forecast")
-        forecast = result["retirement_forecast"]
-        ages = [pt[0] for pt in forecast]
-        amounts = [pt[1] for pt in forecast]
-        line = go.Figure()
-        line.add_trace(go.Scatter(x=ages, y=amounts, mode="lines+markers", name="Savings"))
-        line.update_layout(xaxis_title="Age", yaxis_title="₹ Savings", template="plotly_white")
-        st.plotly_chart(line, use_container_width=True)
-
-        st.subheader("⚠️ Retirement Threat Level")
-        st.info(result.get("retirement_threat_level", "No data available"))
-
-        st.subheader("🎯 Five Year Savings Goal Plan")
-        goal_plan = result.get("five_year_goal_plan", [])
-        for year_goal in goal_plan:
-            st.write(f"- Year {year_goal['year']}: Target Savings ₹{year_goal['target_savings']:.2f}")
+        if "narrative" not in received:
+            with sections["narrative"]:
+                st.info("No advisor notes returned.")
 
 if __name__ == "__main__":
     main()
+    metrics.page_end()
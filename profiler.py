@@ -0,0 +1,231 @@
+import os
+import sys
+import time
+import pstats
+import argparse
+import cProfile
+import threading
+from collections import Counter
+import streamlit as st
+
+# On-demand profiler for page reruns. Switched on for every rerun with
+# FINPILOT_PROFILE=1, or for one browser session by opening a page with
+# ?profile=1 (?profile=0 turns it off again). Each profiled rerun is saved to
+# PROFILE_DIR as
+#
+#   <time>-<page>.pstats      cProfile output (snakeviz, pstats, this CLI)
+#   <time>-<page>.collapsed   sampled stacks, one "a;b;c count" line each,
+#                             for flamegraph.pl or speedscope
+#
+# The directory is trimmed to PROFILE_MAX_MB, oldest files first. A sidebar
+# panel on profiled reruns, and `python profiler.py summary`, show the top
+# functions across the most recent reruns.
+#
+# cProfile only sees the script thread; the sampler records its wall-clock
+# stacks, so time spent waiting (e.g. on data_access's fetch pool) shows up in
+# the .collapsed file.
+
+ENV_ENABLED = os.getenv("FINPILOT_PROFILE", "0") == "1"
+PROFILE_DIR = os.getenv(
+    "FINPILOT_PROFILE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache", "profiles"),
+)
+PROFILE_MAX_MB = float(os.getenv("FINPILOT_PROFILE_MAX_MB", "50"))
+SAMPLE_INTERVAL = float(os.getenv("FINPILOT_PROFILE_INTERVAL_MS", "5")) / 1000
+SUMMARY_RERUNS = 20
+SUMMARY_TOP = 15
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+_SKIP_PREFIXES = (os.path.dirname(st.__file__), os.path.dirname(threading.__file__))
+_local = threading.local()
+
+
+def _short_path(path):
+    # Repo files relative to the repo, anything else as package/file.py
+    if path.startswith(_ROOT):
+        return os.path.relpath(path, _ROOT)
+    return os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path)) if os.sep in path else path
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame):
+    # Root-first stack, with the Streamlit runner frames above the page dropped
+    codes = []
+    while frame is not None:
+        codes.append(frame.f_code)
+        frame = frame.f_back
+    codes.reverse()
+    start = 0
+    while start < len(codes) - 1 and codes[start].co_filename.startswith(_SKIP_PREFIXES):
+        start += 1
+    return ";".join(_frame_label(c) for c in codes[start:])
+
+
+class RerunProfile:
+    def __init__(self, page, interval=SAMPLE_INTERVAL):
+        self.page = page
+        self.interval = interval
+        self.thread = threading.current_thread()
+        self.profile = cProfile.Profile()
+        self.samples = Counter()
+        self.paths = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._sampler = threading.Thread(target=self._sample, name="finpilot-profiler", daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self._sampler.start()
+        self.profile.enable()
+
+    def _sample(self):
+        ident = self.thread.ident
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(ident)
+            if frame is None:  # script thread gone without stop(): keep what we have
+                self.finish(partial=True)
+                return
+            self.samples[_collapse(frame)] += 1
+
+    def finish(self, partial=False):
+        # Saves the profile once; -> (pstats path, collapsed path)
+        with self._lock:
+            if self.paths is not None:
+                return self.paths
+            if threading.current_thread() is self.thread:
+                self.profile.disable()
+            self.wall = time.perf_counter() - self.started
+            self._stopped.set()
+            self.paths = save(self, partial)
+        return self.paths
+
+
+def save(run, partial=False):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(run.started_at))
+    name = f"{stamp}{int(run.started_at * 1000) % 1000:03d}-{run.page}{'-partial' if partial else ''}"
+    base = os.path.join(PROFILE_DIR, name)
+    run.profile.create_stats()
+    pstats.Stats(run.profile).dump_stats(base + ".pstats")
+    with open(base + ".collapsed", "w", encoding="utf-8") as f:
+        for stack, count in run.samples.most_common():
+            f.write(f"{stack} {count}\n")
+    trim(PROFILE_DIR, PROFILE_MAX_MB)
+    return base + ".pstats", base + ".collapsed"
+
+
+def trim(directory, max_mb):
+    files = [os.path.join(directory, f) for f in os.listdir(directory)]
+    files = sorted((f for f in files if os.path.isfile(f)), key=os.path.getmtime)
+    total = sum(os.path.getsize(f) for f in files)
+    while files and total > max_mb * 1024 * 1024:
+        oldest = files.pop(0)
+        total -= os.path.getsize(oldest)
+        os.remove(oldest)
+
+
+# ---------- Rerun hooks (called from metrics.page_start / page_end) ----------
+
+def requested():
+    if ENV_ENABLED:
+        return True
+    flag = st.query_params.get("profile")
+    if flag is not None:
+        st.session_state["_profile"] = flag == "1"
+    return st.session_state.get("_profile", False)
+
+
+def start(page):
+    previous = getattr(_local, "run", None)
+    if previous is not None:  # last rerun ended early (st.stop, st.rerun, switch_page)
+        previous.finish(partial=True)
+        _local.run = None
+    if not requested():
+        return
+    _local.run = RerunProfile(page)
+    _local.run.start()
+
+
+def stop():
+    run = getattr(_local, "run", None)
+    if run is None:
+        return
+    _local.run = None
+    run.finish()
+    render_panel(run)
+
+
+# ---------- Summary ----------
+
+def recent_profiles(directory=PROFILE_DIR, last=SUMMARY_RERUNS, page=None):
+    if not os.path.isdir(directory):
+        return []
+    paths = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".pstats")]
+    if page:
+        paths = [p for p in paths if f"-{page}." in os.path.basename(p) or f"-{page}-" in os.path.basename(p)]
+    return sorted(paths, key=os.path.getmtime)[-last:]
+
+
+def summary(paths, top=SUMMARY_TOP, sort="tottime"):
+    # Top functions across the given profiles, by own time (or "cumtime")
+    paths = [p for p in paths if os.path.exists(p)]
+    if not paths:
+        return []
+    stats = pstats.Stats(*paths)
+    rows = []
+    for (path, line, func), (cc, calls, tottime, cumtime, _) in stats.stats.items():
+        path = _short_path(path)
+        rows.append({
+            "function": func,
+            "where": f"{path}:{line}" if line else path,
+            "calls": calls,
+            "own ms": round(tottime * 1e3, 2),
+            "cumulative ms": round(cumtime * 1e3, 2),
+            "per rerun ms": round((tottime if sort == "tottime" else cumtime) * 1e3 / len(paths), 2),
+        })
+    key = "own ms" if sort == "tottime" else "cumulative ms"
+    return sorted(rows, key=lambda r: -r[key])[:top]
+
+
+def render_panel(run):
+    with st.sidebar.expander("🔬 Profiler", expanded=False):
+        st.caption(f"This rerun: {run.wall * 1e3:.0f} ms, {sum(run.samples.values())} samples. "
+                   f"Saved {os.path.basename(run.paths[0])} (+ .collapsed) to {PROFILE_DIR}")
+        paths = recent_profiles(page=run.page)
+        st.caption(f"Top functions by own time across the last {len(paths)} {run.page} rerun(s):")
+        st.dataframe(summary(paths), hide_index=True, use_container_width=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Saved rerun profiles")
+    sub = parser.add_subparsers(dest="command", required=True)
+    show = sub.add_parser("summary", help="top functions across recent reruns")
+    show.add_argument("--page", help="only this page's reruns, e.g. analysis")
+    show.add_argument("--last", type=int, default=SUMMARY_RERUNS)
+    show.add_argument("--top", type=int, default=25)
+    show.add_argument("--sort", choices=["tottime", "cumtime"], default="tottime")
+    show.add_argument("--dir", default=PROFILE_DIR)
+    clear = sub.add_parser("clear", help="delete saved profiles")
+    clear.add_argument("--dir", default=PROFILE_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "clear":
+        if os.path.isdir(args.dir):
+            trim(args.dir, 0)
+        return 0
+
+    paths = recent_profiles(args.dir, args.last, args.page)
+    print(f"{len(paths)} rerun profile(s) in {args.dir}\n")
+    print(f"{'own ms':>10} {'cum ms':>10} {'per rerun':>10} {'calls':>8}  function")
+    for r in summary(paths, args.top, args.sort):
+        print(f"{r['own ms']:10.2f} {r['cumulative ms']:10.2f} {r['per rerun ms']:10.2f} {r['calls']:8d}  "
+              f"{r['function']} ({r['where']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import argparse
+from supabase_client import supabase
+
+# Backfill and reconcile for expense_monthly_rollup (sql/003_expense_monthly_rollup.sql).
+# Recomputes (user_id, month, category) totals from the raw expenses rows and
+# compares them with what the rollup holds. Run with a service-role SUPABASE_KEY
+# so row level security does not hide other users' rows.
+#
+#   python rollup.py reconcile [--user USER_ID]        report drift only
+#   python rollup.py reconcile --fix [--user USER_ID]  report and repair
+#   python rollup.py backfill [--user USER_ID]         same as reconcile --fix
+
+PAGE_SIZE = 1000
+TOLERANCE = 0.005
+
+
+def _paged(table, columns, order, user_id=None):
+    # `order` must be a unique key: offset pages over a non-unique order can
+    # repeat or skip rows that tie across a page boundary
+    start = 0
+    while True:
+        query = supabase.table(table).select(columns)
+        if user_id:
+            query = query.eq("user_id", user_id)
+        for column in order:
+            query = query.order(column)
+        resp = query.range(start, start + PAGE_SIZE - 1).execute()
+        rows = resp.data or []
+        yield from rows
+        if len(rows) < PAGE_SIZE:
+            break
+        start += PAGE_SIZE
+
+
+def expected_rollup(user_id=None):
+    totals = {}
+    for row in _paged("expenses", "id, user_id, category, amount, created_at", ["id"], user_id):
+        key = (row["user_id"], row["created_at"][:7], row["category"])
+        total, count = totals.get(key, (0.0, 0))
+        totals[key] = (total + float(row["amount"]), count + 1)
+    return totals
+
+
+def current_rollup(user_id=None):
+    return {
+        (row["user_id"], row["month"], row["category"]): (float(row["total"]), int(row["count"]))
+        for row in _paged("expense_monthly_rollup", "user_id, month, category, total, count",
+                          ["user_id", "month", "category"], user_id)
+    }
+
+
+def find_drift(expected, current):
+    drift = []
+    for key in sorted(set(expected) | set(current)):
+        want = expected.get(key, (0.0, 0))
+        have = current.get(key, (0.0, 0))
+        if abs(want[0] - have[0]) > TOLERANCE or want[1] != have[1]:
+            drift.append((key, want, have))
+    return drift
+
+
+def repair(drift):
+    upserts = []
+    for (user_id, month, category), want, _ in drift:
+        if want[1] == 0:
+            supabase.table("expense_monthly_rollup") \
+                .delete() \
+                .eq("user_id", user_id) \
+                .eq("month", month) \
+                .eq("category", category) \
+                .execute()
+        else:
+            upserts.append({
+                "user_id": user_id,
+                "month": month,
+                "category": category,
+                "total": round(want[0], 2),
+                "count": want[1],
+            })
+    for i in range(0, len(upserts), PAGE_SIZE):
+        supabase.table("expense_monthly_rollup") \
+            .upsert(upserts[i:i + PAGE_SIZE], on_conflict="user_id,month,category") \
+            .execute()
+
+
+def reconcile(user_id=None, fix=False):
+    drift = find_drift(expected_rollup(user_id), current_rollup(user_id))
+    for (uid, month, category), want, have in drift:
+        print(f"{uid} {month} {category}: expected {want[0]:.2f} ({want[1]} rows), "
+              f"rollup has {have[0]:.2f} ({have[1]} rows)")
+    if fix and drift:
+        repair(drift)
+    print(f"{len(drift)} drifted row(s){', repaired' if fix and drift else ''}")
+    return drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill or reconcile the expense monthly rollup")
+    parser.add_argument("command", choices=["backfill", "reconcile"])
+    parser.add_argument("--user", help="limit to one user_id")
+    parser.add_argument("--fix", action="store_true", help="repair drift found by reconcile")
+    args = parser.parse_args()
+
+    drift = reconcile(args.user, fix=args.fix or args.command == "backfill")
+    # Non-zero exit on unrepaired drift so a scheduled reconcile can alert
+    raise SystemExit(1 if drift and not (args.fix or args.command == "backfill") else 0)
+
+
+if __name__ == "__main__":
+    main()
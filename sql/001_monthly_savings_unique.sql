@@ -0,0 +1,12 @@
+-- update_monthly_savings() upserts on (user_id, month) in a single request,
+-- which needs a unique constraint to resolve the conflict against.
+
+-- Drop duplicates left by the old select-then-write path, one row per month stays
+delete from monthly_savings a
+using monthly_savings b
+where a.user_id = b.user_id
+  and a.month = b.month
+  and a.id < b.id;
+
+alter table monthly_savings
+  add constraint monthly_savings_user_month_key unique (user_id, month);
@@ -0,0 +1,21 @@
+-- Per-category sums and counts for one user and month, so pages no longer
+-- download every expense row to add them up in Python.
+-- Called from data_access.fetch_category_summary() via supabase.rpc().
+
+create index if not exists expenses_user_created_at_idx
+  on expenses (user_id, created_at);
+
+create or replace function expense_category_totals(p_user_id uuid, p_month text)
+returns table (category text, total numeric, count bigint)
+language sql
+stable
+as $$
+  select e.category, sum(e.amount) as total, count(*) as count
+  from expenses e
+  where e.user_id = p_user_id
+    and e.created_at >= to_date(p_month, 'YYYY-MM')
+    and e.created_at < to_date(p_month, 'YYYY-MM') + interval '1 month'
+  group by e.category
+$$;
+
+grant execute on function expense_category_totals(uuid, text) to anon, authenticated;
@@ -0,0 +1,41 @@
+-- Running per-category totals for each user and month. The insert trigger in
+-- sql/006 bumps the matching row for every new expense, so reads touch one
+-- row per category instead of every expense.
+-- The migration fills it from the existing expenses before it commits, so
+-- data_access.fetch_category_summary() never reads a half-empty table.
+-- Rows are only written by that trigger and by `python rollup.py reconcile
+-- --fix` (service role); signed-in users can read their own rows but never
+-- change them.
+
+begin;
+
+create table if not exists expense_monthly_rollup (
+  user_id uuid not null,
+  month text not null,
+  category text not null,
+  total numeric not null default 0,
+  count bigint not null default 0,
+  updated_at timestamptz not null default now(),
+  primary key (user_id, month, category)
+);
+
+alter table expense_monthly_rollup enable row level security;
+
+create policy "Users read their own rollup"
+  on expense_monthly_rollup for select
+  using (auth.uid() = user_id);
+
+-- Existing expenses. Inserts wait on the lock until the commit, so none is
+-- missed between the backfill and the table becoming visible.
+lock table expenses in share mode;
+
+insert into expense_monthly_rollup as r (user_id, month, category, total, count)
+select user_id, to_char(created_at at time zone 'UTC', 'YYYY-MM'), category, sum(amount), count(*)
+from expenses
+group by 1, 2, 3
+on conflict (user_id, month, category) do update
+  set total = excluded.total,
+      count = excluded.count,
+      updated_at = now();
+
+commit;
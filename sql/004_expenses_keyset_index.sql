@@ -0,0 +1,7 @@
+-- The expense history pages through a user's rows newest first by
+-- (created_at, id), starting after the last row already shown
+-- (fetch_expense_page() in data_access.py). This index serves every page as a
+-- short range scan, with no sort and no offset to skip over.
+
+create index if not exists expenses_user_created_id_idx
+  on expenses (user_id, created_at desc, id desc);
@@ -0,0 +1,10 @@
+-- Idempotency key for expenses saved through the local write queue
+-- (write_queue.py). Every queued expense gets a client-generated uuid, and
+-- the flush upserts on it with ignore-duplicates, so a batch resent after a
+-- lost response is not stored twice. Rows written any other way keep a null
+-- client_id, which never conflicts.
+
+alter table expenses add column if not exists client_id uuid;
+
+create unique index if not exists expenses_client_id_key
+  on expenses (client_id);
@@ -0,0 +1,63 @@
+-- Keeps expense_monthly_rollup (sql/003) in step with expenses inside the
+-- inserting transaction, instead of a separate apply_expense_rollup() call
+-- from the app after the insert. The rollup can no longer be bumped twice for
+-- one row (two processes flushing the same queued batch), or skipped (a crash
+-- between the insert and the rpc). Only rows actually inserted are counted:
+-- an upsert with ignore-duplicates (write_queue.py) skips stored client_ids
+-- before the trigger sees them.
+--
+-- One statement-level trigger per insert, so a batch of N rows costs one
+-- grouped upsert per (user, month, category) rather than N row triggers.
+--
+-- The rollup is re-synced from expenses under the same lock as the trigger
+-- is created, so rows inserted since sql/003 ran are counted exactly once.
+-- The trigger is now the only writer, so apply_expense_rollup() (created by
+-- earlier versions of sql/003) is dropped in the same transaction: an older
+-- app process still calling it gets an error and leaves the rollup alone
+-- (data_access only logged that), instead of counting the row a second time.
+-- It also let any signed-in user add arbitrary amounts to their own totals.
+
+begin;
+
+drop function if exists apply_expense_rollup(uuid, text, text, numeric, bigint);
+
+create or replace function expenses_rollup_after_insert()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  insert into expense_monthly_rollup as r (user_id, month, category, total, count)
+  select n.user_id, to_char(n.created_at at time zone 'UTC', 'YYYY-MM'), n.category, sum(n.amount), count(*)
+  from new_rows n
+  group by 1, 2, 3
+  on conflict (user_id, month, category) do update
+    set total = r.total + excluded.total,
+        count = r.count + excluded.count,
+        updated_at = now();
+  return null;
+end;
+$$;
+
+-- Held until commit: no insert lands between the trigger and the re-sync
+lock table expenses in share row exclusive mode;
+
+drop trigger if exists expenses_rollup_after_insert on expenses;
+
+create trigger expenses_rollup_after_insert
+  after insert on expenses
+  referencing new table as new_rows
+  for each statement
+  execute function expenses_rollup_after_insert();
+
+insert into expense_monthly_rollup as r (user_id, month, category, total, count)
+select user_id, to_char(created_at at time zone 'UTC', 'YYYY-MM'), category, sum(amount), count(*)
+from expenses
+group by 1, 2, 3
+on conflict (user_id, month, category) do update
+  set total = excluded.total,
+      count = excluded.count,
+      updated_at = now();
+
+commit;
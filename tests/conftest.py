@@ -0,0 +1,22 @@
+import os
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import bootstrap
+import data_access
+from tools.fake_supabase import FakeSupabase
+
+
+@pytest.fixture
+def fake():
+    # Every query goes to an in-process FakeSupabase, with an empty read cache
+    client = FakeSupabase(seed=0)
+    bootstrap.set_supabase(client)
+    data_access.clear_cache()
+    yield client
+    bootstrap.set_supabase(None)
+    data_access.clear_cache()
@@ -0,0 +1,75 @@
+import io
+import json
+import pandas as pd
+import bulk_import
+
+
+def statement(rows):
+    return pd.DataFrame([
+        {"row": i + 2, "date": pd.Timestamp(date), "description": note, "amount": amount, "category": category}
+        for i, (date, note, amount, category) in enumerate(rows)
+    ])
+
+
+def test_import_recomputes_savings_for_each_month(fake):
+    frame = statement([
+        ("2025-01-10", "swiggy", 100.0, "Food"),
+        ("2025-01-20", "uber", 50.0, "Transport"),
+        ("2025-02-03", "rent", 1000.0, "Rent"),
+    ])
+
+    result = bulk_import.import_rows("u1", frame, income=5000.0, batch_size=2)
+
+    assert result.inserted == 3
+    assert result.savings == {"2025-01": 4850.0, "2025-02": 4000.0}
+    saved = {r["month"]: r["amount"] for r in fake.tables["monthly_savings"] if r["user_id"] == "u1"}
+    assert saved == {"2025-01": 4850.0, "2025-02": 4000.0}
+    rollup = {(r["month"], r["category"]): r["total"] for r in fake.tables["expense_monthly_rollup"]}
+    assert rollup == {("2025-01", "Food"): 100.0, ("2025-01", "Transport"): 50.0, ("2025-02", "Rent"): 1000.0}
+
+
+def test_failed_batch_month_is_not_recomputed(fake, monkeypatch):
+    insert = bulk_import.data_access.insert_expenses
+
+    def fail_february(user_id, rows):
+        if any(r["created_at"].startswith("2025-02") for r in rows):
+            raise ConnectionError("timeout")
+        return insert(user_id, rows)
+    monkeypatch.setattr(bulk_import.data_access, "insert_expenses", fail_february)
+    frame = statement([("2025-01-10", "swiggy", 100.0, "Food"), ("2025-02-03", "rent", 1000.0, "Rent")])
+
+    result = bulk_import.import_rows("u1", frame, income=5000.0, batch_size=1)
+
+    assert result.inserted == 1
+    assert result.failed_rows == 1
+    assert list(result.savings) == ["2025-01"]
+
+
+def test_prepare_counts_queued_expenses_against_the_budget(fake):
+    fake.tables["user_budgets"].append({"user_id": "u1", "month": "2025-03",
+                                        "budget_json": json.dumps({"Food": 10, "Savings": 90})})
+    csv = "Date,Description,Amount\n05/03/2025,swiggy,60\n06/03/2025,swiggy lunch,10\n"
+    queued = [{"category": "Food", "amount": 50.0, "created_at": "2025-03-01T09:00:00+00:00"}]
+
+    assert bulk_import.prepare(io.StringIO(csv), "u1", income=1000.0)["status"].tolist() == ["ok", "ok"]
+    preview = bulk_import.prepare(io.StringIO(csv), "u1", income=1000.0, pending=queued)
+    assert preview["status"].tolist() == ["over_budget", "over_budget"]
+    assert preview["remaining"].tolist() == [-10.0, -20.0]
+
+
+def test_prepare_leaves_out_imported_lines(fake):
+    csv = "Date,Description,Amount\n05/03/2025,swiggy,60\n06/03/2025,uber,10\n"
+
+    assert bulk_import.prepare(io.StringIO(csv), "u1", income=1000.0, skip_rows={2})["row"].tolist() == [3]
+
+
+def test_saved_lines_leave_out_failed_batches(fake, monkeypatch):
+    def down(user_id, rows):
+        raise ConnectionError("timeout")
+    frame = statement([("2025-01-10", "swiggy", 100.0, "Food"), ("2025-02-03", "rent", 1000.0, "Rent")])
+    ok = bulk_import.import_rows("u1", frame.iloc[:1], income=5000.0)
+    monkeypatch.setattr(bulk_import.data_access, "insert_expenses", down)
+    failed = bulk_import.import_rows("u1", frame.iloc[1:], income=5000.0)
+
+    assert ok.saved_lines(frame.iloc[:1]) == {2}
+    assert failed.saved_lines(frame.iloc[1:]) == set()
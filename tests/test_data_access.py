@@ -0,0 +1,76 @@
+import time
+import threading
+import data_access
+
+
+def test_read_overlapping_a_write_is_not_cached(fake):
+    fake.tables["user_incomes"].append({"user_id": "u1", "amount": 1000.0})
+    loading, written = threading.Event(), threading.Event()
+    table = fake.table
+
+    def slow_table(name):
+        # The read has fetched the old income and is about to return it
+        query = table(name)
+        if name == "user_incomes" and not loading.is_set():
+            execute = query.execute
+
+            def paused():
+                result = execute()
+                loading.set()
+                written.wait(5)
+                return result
+            query.execute = paused
+        return query
+    fake.table = slow_table
+
+    reader = threading.Thread(target=data_access.fetch_income, args=("u1",))
+    reader.start()
+    loading.wait(5)
+    data_access.upsert_income("u1", 2000.0)
+    written.set()
+    reader.join()
+
+    assert data_access.fetch_income("u1") == 2000.0
+
+
+def test_reads_are_cached_until_invalidated(fake):
+    fake.tables["user_incomes"].append({"user_id": "u1", "amount": 1000.0})
+
+    assert data_access.fetch_income("u1") == 1000.0
+    fake.tables["user_incomes"][0]["amount"] = 1500.0
+    assert data_access.fetch_income("u1") == 1000.0
+    data_access.invalidate("u1", "user_incomes")
+    assert data_access.fetch_income("u1") == 1500.0
+
+
+def test_page_fetch_runs_queries_in_parallel(fake):
+    fake.seed_user("u1", months=2, expenses_per_month=5)
+    fake.latency_ms = 100
+
+    data = data_access.fetch_page_data("u1", ["income", "budget", "category_totals", "savings", "profile"])
+
+    assert data.errors == {}
+    assert data.income == 50000.0
+    assert data.wall_time < 0.3  # five 100 ms queries, not 500 ms
+    assert set(data.timings) == {"income", "budget", "category_totals", "savings", "profile"}
+    assert all(0.09 < t <= data.wall_time for t in data.timings.values())
+
+
+def test_page_fetch_timeout_leaves_returned_data_alone(fake, monkeypatch):
+    release = threading.Event()
+
+    def stuck(user_id, month):
+        release.wait(5)
+        return 123.0
+    monkeypatch.setitem(data_access.PAGE_QUERIES, "income", stuck)
+    fake.seed_user("u1", months=1, expenses_per_month=1)
+
+    data = data_access.fetch_page_data("u1", ["income", "budget"], timeout=0.2)
+    timings = dict(data.timings)
+    release.set()
+    time.sleep(0.1)
+
+    assert isinstance(data.errors["income"], TimeoutError)
+    assert data.income == 0.0
+    assert data.timings == timings
+    assert data.budget
@@ -0,0 +1,29 @@
+import os
+import multiprocessing
+import numpy as np
+import data_store
+
+
+def convert_in_child(csv_path, cache_dir):
+    data_store.CACHE_DIR = cache_dir
+    return data_store.ensure_cached(csv_path)
+
+
+def test_concurrent_conversions_leave_one_complete_file(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "arrow")
+    monkeypatch.setattr(data_store, "CACHE_DIR", cache_dir)
+    csv_path = tmp_path / "data.csv"
+    rng = np.random.default_rng(0)
+    with open(csv_path, "w") as f:
+        f.write("Income,Flag\n")
+        for value in rng.uniform(1000, 90000, 50_000):
+            f.write(f"{value:.2f},{'True' if value > 45000 else 'False'}\n")
+
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        paths = pool.starmap(convert_in_child, [(str(csv_path), cache_dir)] * 4)
+
+    assert len(set(paths)) == 1
+    assert not [f for f in os.listdir(cache_dir) if f.endswith(".tmp")]
+    table = data_store.read_table(str(csv_path), ["Income", "Flag"])
+    assert table.num_rows == 50_000
+    assert data_store._read_meta(data_store._cache_stem(str(csv_path)))["arrow_path"] == paths[0]
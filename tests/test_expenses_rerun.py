@@ -0,0 +1,73 @@
+import os
+import pytest
+from streamlit.testing.v1 import AppTest
+import data_access
+import write_queue
+
+WRITE_OPS = {"insert", "update", "upsert", "delete"}
+READ_RPCS = {"rpc:expense_category_totals"}
+PAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pages", "expenses.py")
+
+
+def writes(client):
+    return {key: n for key, n in client.queries.items()
+            if key[1] in WRITE_OPS or (key[1] == "rpc" and key[0] not in READ_RPCS)}
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    queue = write_queue.WriteQueue(str(tmp_path / "queue.sqlite3"), autostart=False)
+    monkeypatch.setattr(write_queue, "_queue", queue)
+    return queue
+
+
+def test_rerunning_expenses_page_writes_nothing(fake, queue):
+    fake.seed_user("u1", months=3, expenses_per_month=10)
+    at = AppTest.from_file(PAGE, default_timeout=30)
+    at.session_state["user"] = {"id": "u1", "email": "u1@example.com"}
+
+    at.run()
+    assert not at.exception
+    at.run()
+    assert not at.exception
+
+    assert writes(fake) == {}
+    assert fake.query_count("u1") > 0
+
+
+def test_adding_an_expense_writes_only_through_the_queue(fake, queue):
+    fake.seed_user("u1", months=1, expenses_per_month=5)
+    at = AppTest.from_file(PAGE, default_timeout=30)
+    at.session_state["user"] = {"id": "u1", "email": "u1@example.com"}
+    at.run()
+    stored = len(fake.tables["expenses"])
+
+    at.number_input[0].set_value(1.0)
+    next(b for b in at.button if b.label == "Add Expense").click().run()
+    assert not at.exception
+    assert writes(fake) == {}
+    assert [r["amount"] for r in queue.pending("u1")] == [1.0]
+
+    assert queue.flush_once() == 1
+    assert len(fake.tables["expenses"]) == stored + 1
+    data_access.clear_cache()
+    at.run()
+    assert not at.exception
+    assert set(writes(fake)) == {("expenses", "upsert"), ("monthly_savings", "upsert")}
+
+
+def test_history_caption_counts_queued_rows_separately(fake, queue):
+    fake.seed_user("u1", months=1, expenses_per_month=0)
+    queue.enqueue_expense("u1", "Food", 10.0, "")
+    at = AppTest.from_file(PAGE, default_timeout=30)
+    at.session_state["user"] = {"id": "u1", "email": "u1@example.com"}
+
+    at.run()
+    assert not at.exception
+    assert "Page 1 · 1 syncing" in [c.value for c in at.caption]
+
+    queue.flush_once()
+    queue.enqueue_expense("u1", "Rent", 20.0, "")
+    data_access.clear_cache()
+    at.run()
+    assert "Page 1 · expenses 1–1 · 1 syncing" in [c.value for c in at.caption]
@@ -0,0 +1,178 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import llm_client
+from llm_cache import LLMCache, cache_key
+from llm_client import LLMClient, LLMError
+
+
+class Upstream:
+    # Local stand-in for the OpenRouter chat endpoint. `statuses` are answered
+    # in order (then 200s); every request waits `delay` seconds first.
+    def __init__(self):
+        self.requests = []
+        self.statuses = []
+        self.delay = 0.0
+        self.stream_parts = ["Save ", "more."]
+        self._lock = threading.Lock()
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with upstream._lock:
+                    upstream.requests.append(body)
+                    status = upstream.statuses.pop(0) if upstream.statuses else 200
+                time.sleep(upstream.delay)
+                if status != 200:
+                    self._reply(status, "text/plain", b"unavailable")
+                elif body.get("stream"):
+                    events = [{"choices": [{"delta": {"content": part}}]} for part in upstream.stream_parts]
+                    # Raw UTF-8, no charset in Content-Type, like OpenRouter
+                    text = "".join(f"data: {json.dumps(e, ensure_ascii=False)}\n\n" for e in events) + "data: [DONE]\n\n"
+                    self._reply(200, "text/event-stream", (": OPENROUTER PROCESSING\n\n" + text).encode())
+                else:
+                    answer = f"answer to {body['messages'][-1]['content']}"
+                    self._reply(200, "application/json",
+                                json.dumps({"choices": [{"message": {"content": answer}}]}).encode())
+
+            def _reply(self, status, content_type, payload):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/v1/chat/completions"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+
+@pytest.fixture
+def upstream():
+    server = Upstream()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+
+@pytest.fixture
+def client(upstream, monkeypatch):
+    monkeypatch.setattr(llm_client, "BACKOFF_BASE", 0.0)
+    return LLMClient(api_key="test", url=upstream.url, read_timeout=5, max_retries=2)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMCache(str(tmp_path / "llm_cache.sqlite3"), ttl=60, max_entries=100)
+
+
+def ask(client, prompt):
+    return lambda: client.chat([{"role": "user", "content": prompt}], model="test-model")
+
+
+# ---------- Client ----------
+
+def test_chat_retries_server_errors(client, upstream):
+    upstream.statuses = [503, 502]
+
+    assert ask(client, "hi")() == "answer to hi"
+    assert len(upstream.requests) == 3
+    assert client.stats()["retries"] == 2
+
+
+def test_chat_does_not_retry_client_errors(client, upstream):
+    upstream.statuses = [400]
+
+    with pytest.raises(LLMError, match="HTTP 400"):
+        ask(client, "hi")()
+    assert len(upstream.requests) == 1
+
+
+def test_chat_gives_up_after_max_retries(client, upstream):
+    upstream.statuses = [503] * 5
+
+    with pytest.raises(LLMError, match="after 3 attempts"):
+        ask(client, "hi")()
+    assert len(upstream.requests) == 3
+
+
+def test_stream_chat_yields_deltas(client, upstream):
+    parts = list(client.stream_chat([{"role": "user", "content": "tip"}], model="test-model"))
+
+    assert parts == ["Save ", "more."]
+    assert upstream.requests[0]["stream"] is True
+
+
+def test_stream_chat_decodes_utf8(client, upstream):
+    upstream.stream_parts = ["Save ₹500 ", "💰 a month"]
+
+    parts = list(client.stream_chat([{"role": "user", "content": "tip"}], model="test-model"))
+
+    assert "".join(parts) == "Save ₹500 💰 a month"
+
+
+# ---------- Cache ----------
+
+def test_cache_hit_skips_upstream(client, upstream, cache):
+    assert cache.get_or_call("test-model", "hi", ask(client, "hi")) == ("answer to hi", False)
+    assert cache.get_or_call("test-model", "hi", ask(client, "hi")) == ("answer to hi", True)
+    assert len(upstream.requests) == 1
+
+
+def test_cache_entries_expire_after_ttl(client, upstream, tmp_path):
+    cache = LLMCache(str(tmp_path / "ttl.sqlite3"), ttl=0.2)
+
+    cache.get_or_call("test-model", "hi", ask(client, "hi"))
+    time.sleep(0.3)
+    assert cache.get_or_call("test-model", "hi", ask(client, "hi")) == ("answer to hi", False)
+    assert len(upstream.requests) == 2
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = LLMCache(str(tmp_path / "lru.sqlite3"), ttl=60, max_entries=2)
+
+    cache.put(cache_key("m", "a"), "m", "A")
+    time.sleep(0.01)
+    cache.put(cache_key("m", "b"), "m", "B")
+    time.sleep(0.01)
+    assert cache.get(cache_key("m", "a")) == "A"  # now more recent than b
+    time.sleep(0.01)
+    cache.put(cache_key("m", "c"), "m", "C")
+
+    assert cache.get(cache_key("m", "b")) is None
+    assert cache.get(cache_key("m", "a")) == "A"
+    assert cache.get(cache_key("m", "c")) == "C"
+    assert cache.stats()["size"] == 2
+
+
+def test_concurrent_identical_prompts_share_one_call(client, upstream, cache):
+    upstream.delay = 0.3
+    results = []
+
+    def worker():
+        results.append(cache.get_or_call("test-model", "same", ask(client, "same")))
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(upstream.requests) == 1
+    assert [value for value, _ in results] == ["answer to same"] * 5
+    assert sorted(from_cache for _, from_cache in results) == [False, True, True, True, True]
+    assert cache.misses == 1
+
+
+def test_failed_call_is_not_cached(client, upstream, cache):
+    upstream.statuses = [400]
+
+    with pytest.raises(LLMError):
+        cache.get_or_call("test-model", "hi", ask(client, "hi"))
+    assert cache.get_or_call("test-model", "hi", ask(client, "hi")) == ("answer to hi", False)
+    assert len(upstream.requests) == 2
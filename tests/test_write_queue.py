@@ -0,0 +1,146 @@
+import time
+import pytest
+from postgrest.exceptions import APIError
+import data_access
+import write_queue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return write_queue.WriteQueue(str(tmp_path / "queue.sqlite3"), autostart=False)
+
+
+def make_due(queue):
+    # Skip the backoff / claim wait
+    queue._conn.execute("UPDATE pending_expenses SET next_attempt = 0")
+
+
+def next_attempts(queue):
+    return dict(queue._conn.execute("SELECT client_id, next_attempt FROM pending_expenses").fetchall())
+
+
+def rollup(fake, user_id):
+    return {(r["month"], r["category"]): (r["total"], r["count"])
+            for r in fake.tables["expense_monthly_rollup"] if r["user_id"] == user_id}
+
+
+def test_flush_saves_rows_and_rollup(fake, queue):
+    rows = [queue.enqueue_expense("u1", "Food", 10.0, "lunch"), queue.enqueue_expense("u1", "Rent", 500.0, "")]
+
+    assert queue.flush_once() == 2
+    assert queue.pending("u1") == []
+    assert sorted(r["client_id"] for r in fake.tables["expenses"]) == sorted(r["client_id"] for r in rows)
+    month = rows[0]["created_at"][:7]
+    assert rollup(fake, "u1") == {(month, "Food"): (10.0, 1), (month, "Rent"): (500.0, 1)}
+
+
+def test_lost_response_retry_saves_once(fake, queue, monkeypatch):
+    # The first upsert reaches the database but its response never arrives
+    upsert = data_access.upsert_expenses
+    calls = []
+
+    def flaky(user_id, rows):
+        calls.append(len(rows))
+        upsert(user_id, rows)
+        if len(calls) == 1:
+            raise ConnectionError("response lost")
+    monkeypatch.setattr(data_access, "upsert_expenses", flaky)
+
+    row = queue.enqueue_expense("u1", "Food", 25.0, "")
+    assert queue.flush_once() == 0
+    assert queue.stats("u1")["depth"] == 1
+
+    make_due(queue)
+    assert queue.flush_once() == 1
+    assert calls == [1, 1]
+    assert [r["client_id"] for r in fake.tables["expenses"]] == [row["client_id"]]
+    assert rollup(fake, "u1") == {(row["created_at"][:7], "Food"): (25.0, 1)}
+
+
+def test_claimed_rows_are_reclaimed_after_expiry(fake, queue, monkeypatch):
+    monkeypatch.setattr(write_queue, "CLAIM_SECONDS", 0.2)
+    queue.enqueue_expense("u1", "Food", 10.0, "")
+
+    assert len(queue._claim()) == 1
+    assert queue._claim() == []  # held by the first claim
+    time.sleep(0.3)
+    reclaimed = queue._claim()
+    assert len(reclaimed) == 1
+
+    # A second process resending rows the first one already stored
+    data_access.upsert_expenses("u1", [{"client_id": reclaimed[0][0], "category": "Food", "amount": 10.0,
+                                        "note": "", "created_at": "2026-01-05T00:00:00+00:00"}])
+    make_due(queue)
+    assert queue.flush_once() == 1
+    assert len(fake.tables["expenses"]) == 1
+    assert [v[1] for v in rollup(fake, "u1").values()] == [1]
+
+
+def test_backoff_grows_with_attempts(fake, queue, monkeypatch):
+    def down(user_id, rows):
+        raise ConnectionError("timeout")
+    monkeypatch.setattr(data_access, "upsert_expenses", down)
+    monkeypatch.setattr(write_queue.random, "uniform", lambda a, b: b)  # no jitter
+    queue.enqueue_expense("u1", "Food", 10.0, "")
+
+    delays = []
+    for _ in range(4):
+        make_due(queue)
+        before = time.time()
+        queue.flush_once()
+        delays.append(next(iter(next_attempts(queue).values())) - before)
+
+    for attempt, delay in enumerate(delays):
+        assert delay == pytest.approx(write_queue.BACKOFF_BASE * 2 ** attempt, abs=0.1)
+    stats = queue.stats("u1")
+    assert stats["attempts"] == 4
+    assert stats["pending_error"] == "timeout"
+
+
+def test_gives_up_after_max_attempts(fake, queue, monkeypatch):
+    def down(user_id, rows):
+        raise ConnectionError("timeout")
+    monkeypatch.setattr(data_access, "upsert_expenses", down)
+    monkeypatch.setattr(write_queue, "MAX_ATTEMPTS", 3)
+    queue.enqueue_expense("u1", "Food", 10.0, "")
+
+    for _ in range(3):
+        make_due(queue)
+        queue.flush_once()
+
+    assert queue.stats("u1")["depth"] == 0
+    assert [r["amount"] for r in queue.failed("u1")] == [10.0]
+
+
+def test_rejected_row_is_split_out(fake, queue, monkeypatch):
+    upsert = data_access.upsert_expenses
+
+    def check_amount(user_id, rows):
+        if any(r["amount"] <= 0 for r in rows):
+            raise APIError({"code": "23514", "message": "violates check constraint"})
+        return upsert(user_id, rows)
+    monkeypatch.setattr(data_access, "upsert_expenses", check_amount)
+    for amount in [5.0, 6.0, -1.0, 7.0, 8.0]:
+        queue.enqueue_expense("u1", "Food", amount, "")
+
+    assert queue.flush_once() == 4
+    assert sorted(r["amount"] for r in fake.tables["expenses"]) == [5.0, 6.0, 7.0, 8.0]
+    failed = queue.failed("u1")
+    assert [r["amount"] for r in failed] == [-1.0]
+    assert "check constraint" in failed[0]["error"]
+    assert queue.stats("u1")["depth"] == 0
+
+    queue.retry_failed("u1")
+    assert [r["amount"] for r in queue.pending("u1")] == [-1.0]
+    assert queue.failed("u1") == []
+
+
+def test_flush_recomputes_savings_for_the_rows_months(fake, queue):
+    fake.tables["user_incomes"].append({"user_id": "u1", "amount": 1000.0})
+    row = queue.enqueue_expense("u1", "Food", 10.0, "")
+    queue._conn.execute("UPDATE pending_expenses SET payload = json_set(payload, '$.created_at', ?)",
+                        ("2025-03-31T23:59:00+00:00",))
+
+    assert queue.flush_once() == 1
+    assert [(r["month"], r["amount"]) for r in fake.tables["monthly_savings"]] == [("2025-03", 990.0)]
+    assert fake.tables["expenses"][0]["client_id"] == row["client_id"]
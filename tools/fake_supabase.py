@@ -0,0 +1,346 @@
+import copy
+import json
+import time
+import uuid
+import random
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+
+# In-process stand-in for the Supabase/PostgREST client, for load tests and
+# offline benchmarks. Covers the query-builder subset FinPilot uses:
+#
+#   table(name).select(cols).eq/neq/gt/gte/lt/lte(col, v).or_("a.lt.x,...")
+#              .order(col, desc=).limit(n).range(a, b).execute()
+#   table(name).insert(row | rows) / update(values).eq(...) / upsert(rows,
+#              on_conflict="a,b", ignore_duplicates=) / delete().eq(...)
+#   rpc("expense_category_totals", params)
+#   inserts into expenses bump expense_monthly_rollup, as the sql/006 trigger does
+#
+# Every execute() sleeps for latency_ms (+/- jitter_ms) to model the network
+# round trip, and is counted per (table, operation) for reporting.
+#
+#   client = FakeSupabase(latency_ms=40)
+#   bootstrap.set_supabase(client)
+
+TABLES = ["user_incomes", "user_budgets", "expenses", "monthly_savings", "user_profile", "expense_monthly_rollup"]
+
+# Columns filled in on insert when missing, as the database defaults would
+DEFAULTS = {
+    "expenses": lambda: {"id": str(uuid.uuid4()), "created_at": datetime.now(timezone.utc).isoformat()},
+    "user_profile": lambda: {"id": str(uuid.uuid4())},
+}
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _user_of(rows):
+    row = rows[0] if isinstance(rows, list) and rows else rows
+    return row.get("user_id") if isinstance(row, dict) else None
+
+
+COMPARISONS = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+}
+
+
+def _split_top_level(text):
+    # Commas outside parentheses and double quotes
+    parts, depth, quoted, current = [], 0, False, ""
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch in "()":
+            depth += 1 if ch == "(" else -1
+        elif not quoted and ch == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        current += ch
+    return parts + [current]
+
+
+def _condition(text):
+    text = text.strip()
+    for kind in ("and", "or"):
+        if text.startswith(kind + "(") and text.endswith(")"):
+            return _logic(kind, text[len(kind) + 1:-1])
+    column, op, value = text.split(".", 2)
+    value = value[1:-1] if value.startswith('"') and value.endswith('"') else value
+    compare = COMPARISONS[op]
+
+    def test(row):
+        have = row.get(column)
+        if have is None:
+            return False
+        return compare(have, type(have)(value) if isinstance(have, (int, float)) else value)
+    return test
+
+
+def _logic(kind, text):
+    tests = [_condition(part) for part in _split_top_level(text)]
+    combine = any if kind == "or" else all
+    return lambda row: combine(test(row) for test in tests)
+
+
+class _Query:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.op = "select"
+        self.columns = None
+        self.values = None
+        self.on_conflict = None
+        self.filters = []
+        self.orders = []
+        self.bounds = (0, None)
+        self.user_id = None  # for per-user query counts
+
+    # ---- Operations ----
+
+    def select(self, columns="*", count=None):
+        self.op = "select"
+        self.columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, rows):
+        self.op, self.values = "insert", rows
+        self.user_id = _user_of(rows)
+        return self
+
+    def update(self, values):
+        self.op, self.values = "update", values
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False):
+        self.op, self.values = "upsert", rows
+        self.user_id = _user_of(rows)
+        self.ignore_duplicates = ignore_duplicates
+        self.on_conflict = [c.strip() for c in on_conflict.split(",")] if on_conflict else ["id"]
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    # ---- Filters and modifiers ----
+
+    def _filter(self, column, test):
+        self.filters.append((column, test))
+        return self
+
+    def eq(self, column, value):
+        if column == "user_id":
+            self.user_id = value
+        return self._filter(column, lambda v: v == value)
+
+    def neq(self, column, value):
+        return self._filter(column, lambda v: v != value)
+
+    def gt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v > value)
+
+    def gte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v >= value)
+
+    def lt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v < value)
+
+    def lte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v <= value)
+
+    def or_(self, filters, reference_table=None):
+        # PostgREST logic tree, e.g. 'a.lt."x",and(a.eq."x",b.lt.y)'
+        return self._filter(None, _logic("or", filters))
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n):
+        self.bounds = (self.bounds[0], self.bounds[0] + n)
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end + 1)
+        return self
+
+    # ---- Execution ----
+
+    def _matches(self, row):
+        return all(test(row) if column is None else test(row.get(column)) for column, test in self.filters)
+
+    def _project(self, row):
+        return copy.deepcopy(row if self.columns is None else {c: row.get(c) for c in self.columns})
+
+    def execute(self):
+        self.client._round_trip(self.table, self.op, self.user_id)
+        with self.client._lock:
+            rows = self.client.tables.setdefault(self.table, [])
+            if self.op == "select":
+                result = [r for r in rows if self._matches(r)]
+                for column, desc in reversed(self.orders):
+                    result.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+                start, stop = self.bounds
+                return FakeResponse([self._project(r) for r in result[start:stop]])
+            if self.op == "insert":
+                new = self.values if isinstance(self.values, list) else [self.values]
+                inserted = [{**DEFAULTS.get(self.table, dict)(), **copy.deepcopy(r)} for r in new]
+                rows.extend(inserted)
+                self.client._after_insert(self.table, inserted)
+                return FakeResponse(copy.deepcopy(inserted))
+            if self.op == "update":
+                updated = [r for r in rows if self._matches(r)]
+                for r in updated:
+                    r.update(copy.deepcopy(self.values))
+                return FakeResponse(copy.deepcopy(updated))
+            if self.op == "upsert":
+                new = self.values if isinstance(self.values, list) else [self.values]
+                result, inserted = [], []
+                for values in new:
+                    key = tuple(values.get(c) for c in self.on_conflict)
+                    existing = next((r for r in rows if tuple(r.get(c) for c in self.on_conflict) == key), None)
+                    if existing is not None and self.ignore_duplicates:
+                        continue  # like Prefer: resolution=ignore-duplicates, not returned either
+                    if existing is None:
+                        existing = {**DEFAULTS.get(self.table, dict)()}
+                        rows.append(existing)
+                        inserted.append(existing)
+                    existing.update(copy.deepcopy(values))
+                    result.append(copy.deepcopy(existing))
+                self.client._after_insert(self.table, inserted)
+                return FakeResponse(result)
+            if self.op == "delete":
+                removed = [r for r in rows if self._matches(r)]
+                self.client.tables[self.table] = [r for r in rows if not self._matches(r)]
+                return FakeResponse(copy.deepcopy(removed))
+        raise ValueError(f"Unsupported operation {self.op}")
+
+
+class _Rpc:
+    def __init__(self, client, name, params):
+        self.client = client
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        self.client._round_trip(f"rpc:{self.name}", "rpc", self.params.get("p_user_id"))
+        return FakeResponse(getattr(self.client, f"_rpc_{self.name}")(**self.params))
+
+
+class FakeSupabase:
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tables = {name: [] for name in TABLES}
+        self.queries = Counter()          # (table, operation) -> count
+        self.queries_by_user = Counter()  # user_id -> count
+        self._lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def from_(self, name):
+        return _Query(self, name)
+
+    def rpc(self, name, params=None):
+        return _Rpc(self, name, params or {})
+
+    def _round_trip(self, table, op, user_id=None):
+        with self._stats_lock:
+            self.queries[(table, op)] += 1
+            self.queries_by_user[user_id] += 1
+            delay = self.latency_ms + (self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    # ---- Stats ----
+
+    def query_count(self, user_id=None):
+        with self._stats_lock:
+            if user_id is not None:
+                return self.queries_by_user[user_id]
+            return sum(self.queries.values())
+
+    def reset_counts(self):
+        with self._stats_lock:
+            self.queries.clear()
+            self.queries_by_user.clear()
+
+    # ---- Stored procedure (mirroring sql/002) and rollup rows (sql/003) ----
+
+    def _rpc_expense_category_totals(self, p_user_id, p_month):
+        totals = {}
+        with self._lock:
+            for row in self.tables["expenses"]:
+                if row.get("user_id") == p_user_id and str(row.get("created_at", ""))[:7] == p_month:
+                    total, count = totals.get(row["category"], (0.0, 0))
+                    totals[row["category"]] = (total + float(row["amount"]), count + 1)
+        return [{"category": c, "total": t, "count": n} for c, (t, n) in sorted(totals.items())]
+
+    def _bump_rollup(self, user_id, month, category, amount, count=1):
+        with self._lock:
+            rows = self.tables["expense_monthly_rollup"]
+            row = next((r for r in rows if (r["user_id"], r["month"], r["category"]) == (user_id, month, category)), None)
+            if row is None:
+                row = {"user_id": user_id, "month": month, "category": category, "total": 0.0, "count": 0}
+                rows.append(row)
+            row["total"] += float(amount)
+            row["count"] += count
+
+    # ---- Triggers (mirroring sql/006) ----
+
+    def _after_insert(self, table, rows):
+        if table != "expenses":
+            return
+        totals = {}
+        for row in rows:
+            key = (row["user_id"], str(row["created_at"])[:7], row["category"])
+            total, count = totals.get(key, (0.0, 0))
+            totals[key] = (total + float(row["amount"]), count + 1)
+        for (user_id, month, category), (total, count) in totals.items():
+            self._bump_rollup(user_id, month, category, total, count)
+
+    # ---- Seeding ----
+
+    def seed_user(self, user_id, income=50000.0, months=12, expenses_per_month=30, categories=None, today=None):
+        # One user's worth of data: income, a budget and expenses for the last
+        # `months` months (with matching rollup rows), savings history, profile
+        categories = categories or ["Food", "Rent", "Transport", "Entertainment", "Utilities"]
+        budget = {c: round(80 / len(categories), 2) for c in categories}
+        budget["Savings"] = 20
+        today = today or datetime.now(timezone.utc)
+        rng = self._random
+        with self._lock:
+            self.tables["user_incomes"].append({"user_id": user_id, "amount": income})
+            for m in range(months):
+                year, month = divmod(today.year * 12 + today.month - 1 - m, 12)
+                month_key = f"{year:04d}-{month + 1:02d}"
+                self.tables["user_budgets"].append({"user_id": user_id, "month": month_key, "budget_json": json.dumps(budget)})
+                spent = 0.0
+                for i in range(expenses_per_month):
+                    category = rng.choice(categories)
+                    amount = round(rng.uniform(50, 2 * income / expenses_per_month / 2), 2)
+                    day = min(1 + i % 28, today.day if m == 0 else 28)
+                    created = datetime(year, month + 1, day, 12, i % 60, tzinfo=timezone.utc).isoformat()
+                    self.tables["expenses"].append({"id": str(uuid.uuid4()), "user_id": user_id, "category": category,
+                                                    "amount": amount, "note": "", "created_at": created})
+                    self._bump_rollup(user_id, month_key, category, amount)
+                    spent += amount
+                self.tables["monthly_savings"].append({"user_id": user_id, "month": month_key,
+                                                       "amount": round(income - spent, 2),
+                                                       "recorded_on": f"{month_key}-28"})
+            self.tables["user_profile"].append({"id": str(uuid.uuid4()), "user_id": user_id, "name": user_id,
+                                                "age": 30, "country": "India", "total_savings": 0,
+                                                "savings_goal_per_year": 100000})
@@ -0,0 +1,129 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Cold-start benchmark: runs each page once in a fresh interpreter started with
+# -X importtime, against tools/fake_supabase so no network is involved, and
+# reports
+#
+#   first paint   wall time of the page's first AppTest run, imports included
+#   imports       time spent importing modules the page pulled in, with the
+#                 heaviest top-level imports listed
+#
+# Streamlit itself is imported before the page starts and is reported once as
+# the baseline. --budget-ms makes the exit status non-zero when a page's first
+# paint goes over budget, so this can gate CI.
+#
+#   python tools/import_time.py
+#   python tools/import_time.py pages/analysis.py --budget-ms 1500 --top 5
+
+PAGES = [
+    "main.py",
+    "pages/auth.py",
+    "pages/income_budget.py",
+    "pages/expenses.py",
+    "pages/analysis.py",
+    "pages/profile.py",
+    "pages/sugesstions.py",
+    "pages/spending_pre.py",
+    "pages/spending_post.py",
+]
+MARKER = "##page-start##"
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+TEST_USER = {"id": "import-time-user", "email": "import-time@example.com"}
+
+
+def parse_importtime(stderr):
+    # -> (baseline top-level imports, page top-level imports) as {module: µs}
+    baseline, page = {}, {}
+    current = baseline
+    for line in stderr.splitlines():
+        if line.startswith(MARKER):
+            current = page
+            continue
+        match = IMPORT_LINE.match(line)
+        if match and len(match.group(3)) == 1:  # one space: imported directly, not nested
+            current[match.group(4)] = current.get(match.group(4), 0) + int(match.group(2))
+    return baseline, page
+
+
+def run_child(page):
+    from streamlit.testing.v1 import AppTest
+    import bootstrap
+    from tools.fake_supabase import FakeSupabase
+
+    client = FakeSupabase()
+    client.seed_user(TEST_USER["id"])
+    bootstrap.set_supabase(client)
+
+    sys.stderr.write(MARKER + "\n")
+    sys.stderr.flush()
+    started = time.perf_counter()
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=120)
+    at.session_state["user"] = TEST_USER
+    at.run()
+    first_paint = time.perf_counter() - started
+    exception = [e.message for e in at.exception]
+    print(json.dumps({"first_paint_ms": first_paint * 1e3, "exception": exception, "queries": client.query_count()}))
+
+
+def measure(page):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", page],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0 or not proc.stdout.strip():
+        raise RuntimeError(f"{page} failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["baseline"], result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import time and first paint per page")
+    parser.add_argument("pages", nargs="*", default=PAGES)
+    parser.add_argument("--budget-ms", type=float, help="fail if any page's first paint exceeds this")
+    parser.add_argument("--top", type=int, default=5, help="heaviest imports listed per page")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.child)
+        return 0
+
+    over_budget = []
+    baseline_shown = False
+    for page in args.pages:
+        result = measure(page)
+        if not baseline_shown:
+            print(f"Streamlit/runtime baseline (paid once per process): {sum(result['baseline'].values()) / 1e3:.0f} ms of imports\n")
+            baseline_shown = True
+        imports_ms = sum(result["imports"].values()) / 1e3
+        flag = ""
+        if args.budget_ms and result["first_paint_ms"] > args.budget_ms:
+            over_budget.append(page)
+            flag = "  OVER BUDGET"
+        print(f"{page}: first paint {result['first_paint_ms']:.0f} ms, imports {imports_ms:.0f} ms, "
+              f"{result['queries']} queries{flag}")
+        for name, us in sorted(result["imports"].items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f"    {us / 1e3:8.1f} ms  {name}")
+        if result["exception"]:
+            print(f"    exception: {result['exception'][0][:200]}")
+
+    if over_budget:
+        print(f"\n{len(over_budget)} page(s) over the {args.budget_ms:.0f} ms budget: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import os
+import sys
+import time
+import logging
+import tempfile
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+import bootstrap
+import data_access
+from tools.fake_supabase import FakeSupabase
+
+# Multi-user load test against tools/fake_supabase.
+#
+# Every virtual user is a Streamlit AppTest session that walks
+#
+#   main.py -> pages/expenses.py (view, then add an expense) -> pages/analysis.py
+#   -> pages/profile.py
+#
+# --iterations times. AppTest is not thread-safe (it swaps the global Runtime
+# instance on every run), so --concurrency sessions run at once as worker
+# processes, each with its own seeded fake and its own share of the users, and
+# each warmed up with one unrecorded session so first-import cost stays out of
+# the numbers. The fake adds --latency-ms (+/- --jitter-ms) to every query.
+# Reported per page: p50/p95/max rerun latency and queries per rerun, plus
+# totals and the data_access cache hit rate.
+#
+#   python tools/loadtest.py --users 200 --concurrency 8 --latency-ms 40
+#   python tools/loadtest.py --users 20 --iterations 3 --cache-ttl 0
+
+SCENARIO = [
+    ("main.py", None),
+    ("pages/expenses.py", None),
+    ("pages/expenses.py", "add_expense"),
+    ("pages/analysis.py", None),
+    ("pages/profile.py", None),
+]
+
+
+def add_expense(at):
+    at.number_input[0].set_value(1.0)
+    next(b for b in at.button if b.label == "Add Expense").click()
+
+
+ACTIONS = {"add_expense": add_expense}
+SCENARIO_LABELS = [(page if action is None else f"{page} [{action}]", None) for page, action in SCENARIO]
+
+
+def run_user(user_id, client, samples, errors, iterations, timeout):
+    at = None
+    for _ in range(iterations):
+        for page, action in SCENARIO:
+            label = page if action is None else f"{page} [{action}]"
+            if action is None:
+                if at is None:
+                    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=timeout)
+                    at.session_state["user"] = {"id": user_id, "email": f"{user_id}@example.com"}
+                else:
+                    at.switch_page(page)
+            else:
+                ACTIONS[action](at)
+            before = client.query_count(user_id)
+            started = time.perf_counter()
+            try:
+                at.run()
+                if at.exception:
+                    errors[label].append(at.exception[0].message)
+            except Exception as e:  # timeouts and the like
+                errors[label].append(repr(e))
+            samples[label].append((time.perf_counter() - started, client.query_count(user_id) - before))
+
+
+def run_worker(user_ids, options):
+    # One worker process: its own fake and caches, users run one after another
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    # The expense write queue is per process too, or workers would flush
+    # each other's rows into their own fakes
+    os.environ["FINPILOT_WRITE_QUEUE"] = os.path.join(tempfile.mkdtemp(prefix="finpilot-load-"), "write_queue.sqlite3")
+    client = FakeSupabase(latency_ms=options["latency_ms"], jitter_ms=options["jitter_ms"], seed=0)
+    for user_id in user_ids + ["warmup-user"]:
+        client.seed_user(user_id, expenses_per_month=options["expenses_per_month"])
+    bootstrap.set_supabase(client)
+    if options["cache_ttl"] is not None:
+        data_access._cache = data_access.TTLCache(maxsize=data_access.CACHE_MAXSIZE, ttl=max(options["cache_ttl"], 1e-9))
+
+    run_user("warmup-user", client, defaultdict(list), defaultdict(list), 1, options["timeout"])
+    data_access.clear_cache()
+    data_access._stats.update(hits=0, misses=0, invalidations=0)
+    client.reset_counts()
+
+    samples, errors = defaultdict(list), defaultdict(list)
+    for user_id in user_ids:
+        run_user(user_id, client, samples, errors, options["iterations"], options["timeout"])
+    stats = data_access.cache_stats()
+    return dict(samples), dict(errors), client.query_count(), stats["hits"], stats["misses"]
+
+
+def report(samples, errors, wall, queries, hits, misses):
+    print(f"{'page':38} {'reruns':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'queries/rerun':>14} {'errors':>6}")
+    total = 0
+    for label, _ in SCENARIO_LABELS:
+        if label not in samples:
+            continue
+        seconds = np.array([s for s, _ in samples[label]]) * 1e3
+        counts = np.array([q for _, q in samples[label]])
+        total += len(seconds)
+        print(f"{label:38} {len(seconds):6d} {np.percentile(seconds, 50):8.1f} {np.percentile(seconds, 95):8.1f} "
+              f"{seconds.max():8.1f} {counts.mean():14.2f} {len(errors.get(label, [])):6d}")
+    lookups = hits + misses
+    print(f"\n{total:,} reruns in {wall:.1f}s ({total / wall:.1f} reruns/s), {queries:,} queries, "
+          f"data_access cache hit rate {hits / lookups if lookups else 0:.0%}")
+    for label, messages in errors.items():
+        if messages:
+            print(f"{label}: {len(messages)} error(s), first: {messages[0][:300]}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulated multi-user load through the main pages")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4, help="sessions running at once (worker processes)")
+    parser.add_argument("--iterations", type=int, default=1, help="scenario passes per user")
+    parser.add_argument("--latency-ms", type=float, default=30.0, help="simulated query round trip")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--expenses-per-month", type=int, default=30, help="seeded history per user")
+    parser.add_argument("--cache-ttl", type=float, help="override FINPILOT_CACHE_TTL (0 disables reuse)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-rerun timeout in seconds")
+    args = parser.parse_args(argv)
+
+    users = [f"load-user-{i:04d}" for i in range(args.users)]
+    options = {k: getattr(args, k) for k in
+               ("latency_ms", "jitter_ms", "expenses_per_month", "cache_ttl", "timeout", "iterations")}
+    shares = [users[i::args.concurrency] for i in range(args.concurrency) if users[i::args.concurrency]]
+
+    print(f"{args.users} users, {len(shares)} concurrent, {args.iterations} iteration(s), "
+          f"{args.latency_ms:.0f}+/-{args.jitter_ms:.0f} ms per query\n")
+    samples, errors = defaultdict(list), defaultdict(list)
+    queries = hits = misses = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(shares)) as pool:
+        for w_samples, w_errors, w_queries, w_hits, w_misses in pool.map(run_worker, shares, [options] * len(shares)):
+            for label, values in w_samples.items():
+                samples[label].extend(values)
+            for label, values in w_errors.items():
+                errors[label].extend(values)
+            queries += w_queries
+            hits += w_hits
+            misses += w_misses
+    report(samples, errors, time.perf_counter() - started, queries, hits, misses)
+    return 1 if any(errors.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import uuid
+import random
+import sqlite3
+import threading
+from datetime import datetime, timezone
+import data_access
+
+# Write-behind queue for expense inserts. enqueue_expense() stores the row in a
+# local SQLite database (WAL, so it survives restarts) and returns at once; a
+# background thread sends queued rows to Supabase in batches of up to
+# BATCH_SIZE. Each row carries a client_id generated here, and the flush
+# upserts on it (sql/005), so a batch retried after a lost response is not
+# saved twice. Batches that fail on a timeout or outage are retried with
+# exponential backoff, up to MAX_ATTEMPTS times. A batch the database rejects
+# (bad value, violated constraint) is split in halves until the bad rows are
+# on their own; those move to failed_expenses, where the page shows them for
+# the user to retry or discard, and the rest of the batch is saved. After
+# each successful batch, savings are recomputed for the months it touched; the
+# category rollup is bumped by the insert trigger (sql/006) in the same
+# transaction as the rows, for the rows actually inserted only.
+#
+# Rows are claimed for CLAIM_SECONDS before they are sent, so several app
+# processes can share one queue file without normally sending the same rows
+# at once. A claim can still run out while a slow request is in flight (the
+# request timeout is longer); the other process then resends rows that are
+# already stored, which the client_id upsert and the trigger both ignore.
+
+QUEUE_PATH = os.getenv(
+    "FINPILOT_WRITE_QUEUE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache", "write_queue.sqlite3"),
+)
+BATCH_SIZE = int(os.getenv("FINPILOT_WRITE_BATCH", "100"))
+FLUSH_INTERVAL = float(os.getenv("FINPILOT_WRITE_INTERVAL", "2"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+CLAIM_SECONDS = 30.0
+MAX_ATTEMPTS = int(os.getenv("FINPILOT_WRITE_MAX_ATTEMPTS", "20"))
+# SQLSTATE classes for a row the database refuses: data exceptions (22) and
+# integrity constraint violations (23). Sending it again cannot succeed.
+REJECTED_SQLSTATE_CLASSES = ("22", "23")
+
+
+def is_rejected(error):
+    # Rejected rows, as opposed to timeouts, network errors or an outage,
+    # which a later retry can get past
+    return (isinstance(error, data_access.postgrest_exceptions.APIError)
+            and str(error.code or "")[:2] in REJECTED_SQLSTATE_CLASSES)
+
+
+class WriteQueue:
+    def __init__(self, path=QUEUE_PATH, batch_size=BATCH_SIZE, interval=FLUSH_INTERVAL, autostart=True):
+        # autostart=False: no flush thread, the caller runs flush_once() itself
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.autostart = autostart
+        self.flushed = 0
+        self.retries = 0
+        self.last_flush = None   # wall time of the last successful batch
+        self.last_lag = None     # seconds from enqueue to confirmed write, oldest row of that batch
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending_expenses ("
+            " client_id TEXT PRIMARY KEY,"
+            " user_id TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " enqueued_at REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt REAL NOT NULL,"
+            " last_error TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pending_expenses_due ON pending_expenses (next_attempt)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS failed_expenses ("
+            " client_id TEXT PRIMARY KEY,"
+            " user_id TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " enqueued_at REAL NOT NULL,"
+            " attempts INTEGER NOT NULL,"
+            " failed_at REAL NOT NULL,"
+            " error TEXT)"
+        )
+
+    # ---- Producer side ----
+
+    def enqueue_expense(self, user_id, category, amount, note):
+        # -> the row as it will be stored, for optimistic display
+        now = time.time()
+        row = {
+            "client_id": str(uuid.uuid4()),
+            "category": category,
+            "amount": amount,
+            "note": note,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO pending_expenses (client_id, user_id, payload, enqueued_at, next_attempt)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (row["client_id"], user_id, json.dumps(row), now, now),
+            )
+        self.start()
+        self._wake.set()
+        return row
+
+    def pending(self, user_id):
+        # Queued rows for the user, newest first
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM pending_expenses WHERE user_id = ? ORDER BY enqueued_at DESC", (user_id,)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def failed(self, user_id):
+        # Rows given up on, newest first, each with the error that stopped it
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload, error FROM failed_expenses WHERE user_id = ? ORDER BY enqueued_at DESC", (user_id,)
+            ).fetchall()
+        return [{**json.loads(payload), "error": error} for payload, error in rows]
+
+    def retry_failed(self, user_id):
+        # Back into the queue with a fresh attempt count, e.g. after a fix
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pending_expenses (client_id, user_id, payload, enqueued_at, next_attempt)"
+                    " SELECT client_id, user_id, payload, enqueued_at, ? FROM failed_expenses WHERE user_id = ?",
+                    (now, user_id),
+                )
+                self._conn.execute("DELETE FROM failed_expenses WHERE user_id = ?", (user_id,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.start()
+        self._wake.set()
+
+    def discard_failed(self, user_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM failed_expenses WHERE user_id = ?", (user_id,))
+
+    def stats(self, user_id=None):
+        where, args = ("WHERE user_id = ?", (user_id,)) if user_id else ("", ())
+        with self._lock:
+            depth, oldest, attempts, error = self._conn.execute(
+                f"SELECT COUNT(*), MIN(enqueued_at), MAX(attempts), MAX(last_error) FROM pending_expenses {where}",
+                args,
+            ).fetchone()
+            failed = self._conn.execute(f"SELECT COUNT(*) FROM failed_expenses {where}", args).fetchone()[0]
+        return {
+            "depth": depth,
+            "failed": failed,
+            "oldest_age": time.time() - oldest if oldest else 0.0,
+            "attempts": attempts or 0,
+            "pending_error": error,
+            "flushed": self.flushed,
+            "retries": self.retries,
+            "last_flush_age": time.time() - self.last_flush if self.last_flush else None,
+            "last_lag": self.last_lag,
+            "last_error": self.last_error,
+        }
+
+    # ---- Flushing ----
+
+    def start(self):
+        if not self.autostart:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="finpilot-write-queue", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                while self.flush_once():
+                    pass
+            except Exception as e:  # keep the thread alive whatever happens
+                self.last_error = repr(e)
+
+    def _claim(self):
+        # Due rows, pushed CLAIM_SECONDS into the future in the same
+        # transaction; a process that dies mid-flush leaves them to be retried
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT client_id, user_id, payload, enqueued_at, attempts FROM pending_expenses"
+                    " WHERE next_attempt <= ? ORDER BY enqueued_at LIMIT ?",
+                    (now, self.batch_size),
+                ).fetchall()
+                self._conn.executemany("UPDATE pending_expenses SET next_attempt = ? WHERE client_id = ?",
+                                       [(now + CLAIM_SECONDS, r[0]) for r in rows])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _retry_later(self, rows, error):
+        exhausted = [r for r in rows if r[4] + 1 >= MAX_ATTEMPTS]
+        if exhausted:
+            self._fail(exhausted, f"gave up after {MAX_ATTEMPTS} attempts: {error}")
+            rows = [r for r in rows if r[4] + 1 < MAX_ATTEMPTS]
+        now = time.time()
+        with self._lock:
+            for client_id, _, _, _, attempts in rows:
+                delay = min(BACKOFF_BASE * 2 ** attempts, BACKOFF_MAX) * random.uniform(0.5, 1.0)
+                self._conn.execute(
+                    "UPDATE pending_expenses SET attempts = attempts + 1, next_attempt = ?, last_error = ?"
+                    " WHERE client_id = ?",
+                    (now + delay, error[:500], client_id),
+                )
+        self.retries += len(rows)
+        self.last_error = error
+
+    def _fail(self, rows, error):
+        # Out of the queue into failed_expenses, in one transaction
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO failed_expenses"
+                    " (client_id, user_id, payload, enqueued_at, attempts, failed_at, error)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(client_id, user_id, payload, enqueued_at, attempts + 1, now, error[:500])
+                     for client_id, user_id, payload, enqueued_at, attempts in rows],
+                )
+                self._conn.executemany("DELETE FROM pending_expenses WHERE client_id = ?", [(r[0],) for r in rows])
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.last_error = error
+
+    def _send(self, user_id, rows):
+        # Upserts the rows; -> the ones confirmed written. Rows that fail are
+        # handed to _retry_later, or _fail once rejected on their own.
+        try:
+            data_access.upsert_expenses(user_id, [json.loads(r[2]) for r in rows])
+            return rows
+        except Exception as e:
+            if not is_rejected(e):
+                self._retry_later(rows, str(e))
+                return []
+            if len(rows) == 1:
+                self._fail(rows, str(e))
+                return []
+        middle = len(rows) // 2
+        return self._send(user_id, rows[:middle]) + self._send(user_id, rows[middle:])
+
+    def flush_once(self):
+        # Sends one batch of due rows; -> number of rows confirmed written
+        rows = self._claim()
+        by_user = {}
+        for row in rows:
+            by_user.setdefault(row[1], []).append(row)
+
+        confirmed = 0
+        for user_id, user_rows in by_user.items():
+            user_rows = self._send(user_id, user_rows)
+            if not user_rows:
+                continue
+            with self._lock:
+                self._conn.executemany("DELETE FROM pending_expenses WHERE client_id = ?",
+                                       [(r[0],) for r in user_rows])
+            confirmed += len(user_rows)
+            self.flushed += len(user_rows)
+            self.last_flush = time.time()
+            self.last_lag = self.last_flush - min(r[3] for r in user_rows)
+            try:
+                # The rows' own months: one queued late on the last day of a
+                # month can be saved after midnight
+                for month in sorted({json.loads(r[2])["created_at"][:7] for r in user_rows}):
+                    data_access.update_monthly_savings(user_id, month=month)
+            except Exception as e:  # rows are saved; savings catch up on the next write
+                self.last_error = f"after saving: {e}"
+        return confirmed
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = WriteQueue()
+            if _queue.stats()["depth"]:
+                _queue.start()  # rows left over from a previous run
+        return _queue